@@ -0,0 +1,78 @@
+"""analyze_quadrants: per-region float64 loop vs vectorized luminance reduce.
+
+"end-to-end" includes PNG decode; "analysis" times only the grid statistics
+on an already-decoded image.
+
+Run with: uv run python benchmarks/bench_analyze_quadrants.py
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from mcp_server_bedrock_image.tools.compose import _grid_stats, analyze_quadrants
+
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}
+RUNS = 3
+
+
+def _legacy_stats(arr: np.ndarray) -> list[dict]:
+    h, w = arr.shape[:2]
+    qh, qw = h // 3, w // 3
+    quadrants = []
+    for row in range(3):
+        for col in range(3):
+            region = arr[row * qh : (row + 1) * qh, col * qw : (col + 1) * qw]
+            gray = np.mean(region, axis=2)
+            quadrants.append(
+                {"complexity": float(np.std(gray)), "brightness": float(np.mean(gray))}
+            )
+    return quadrants
+
+
+def _legacy_analyze(image_path: str) -> list[dict]:
+    return _legacy_stats(np.array(Image.open(image_path).convert("RGB")))
+
+
+def _vectorized_stats(img: Image.Image) -> list[dict]:
+    return _grid_stats(np.asarray(img.convert("L")), 3, 3)
+
+
+def _best_of(fn, *args) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(
+        f"{'size':>6} {'end-to-end legacy/new':>24} {'analysis legacy/new':>22} "
+        f"{'speedup':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (w, h) in SIZES.items():
+            path = os.path.join(tmp, f"{label}.png")
+            pixels = rng.integers(0, 256, size=(h // 8, w // 8, 3), dtype=np.uint8)
+            Image.fromarray(pixels).resize((w, h)).save(path, compress_level=1)
+            img = Image.open(path).convert("RGB")
+            arr = np.array(img)
+
+            e2e_legacy = _best_of(_legacy_analyze, path)
+            e2e_new = _best_of(analyze_quadrants, path)
+            legacy = _best_of(_legacy_stats, arr)
+            new = _best_of(_vectorized_stats, img)
+            print(
+                f"{label:>6} {e2e_legacy:>10.0f}ms / {e2e_new:>6.0f}ms "
+                f"{legacy:>10.0f}ms / {new:>5.0f}ms {legacy / new:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""End-to-end tool throughput against a local fake Bedrock server.
+
+Starts fake_bedrock.py in a separate process for each payload size and
+drives generate_image_core through the real client, response parser and
+save path, in both auth modes and at several concurrency levels. Reports
+throughput, p50/p99 tool latency, failed calls, peak RSS and CPU time per
+request of this (client) process, followed by the mean time per stage of a
+call from the server's metrics.
+
+Run with: uv run python benchmarks/bench_bedrock_client.py
+          uv run python benchmarks/bench_bedrock_client.py --sizes 20 \\
+              --concurrency 8 --latency 1 --throttle-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+from mcp_server_bedrock_image import server
+from mcp_server_bedrock_image.bedrock_client import BedrockImageClient
+from mcp_server_bedrock_image.limiter import RateLimiter
+from mcp_server_bedrock_image.metrics import METRICS
+from mcp_server_bedrock_image.retry import RetryPolicy
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_bedrock.py")
+MODES = ("bearer", "boto3")
+SIZES_MB = (1, 5, 20)
+CONCURRENCY = (1, 4, 16)
+REQUESTS = 32
+STAGES = ("serialize", "queue_wait", "network", "parse", "decode", "write")
+
+
+class PeakRSS:
+    """Samples this process's resident set size in a background thread."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, _rss())
+            if self._stop.wait(self.interval):
+                return
+
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Not Linux: fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_fake_server(args: argparse.Namespace, image_mb: float):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            FAKE_SERVER,
+            f"--image-mb={image_mb}",
+            f"--latency={args.latency}",
+            f"--jitter={args.jitter}",
+            f"--throttle-rate={args.throttle_rate}",
+            f"--error-rate={args.error_rate}",
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return proc, proc.stdout.readline().strip()
+
+
+def make_client(mode: str, url: str, concurrency: int) -> BedrockImageClient:
+    options = dict(
+        max_workers=concurrency,
+        pool_size=concurrency,
+        limiter=RateLimiter(rate=0, max_in_flight=concurrency),
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.5),
+        coalesce=False,
+    )
+    if mode == "bearer":
+        return BedrockImageClient(
+            auth_mode="bearer", bearer_token="bench", endpoint=url, **options
+        )
+    client = boto3.client(
+        "bedrock-runtime",
+        endpoint_url=url,
+        region_name="us-east-1",
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        config=Config(
+            max_pool_connections=concurrency, retries={"total_max_attempts": 1}
+        ),
+    )
+    return BedrockImageClient(auth_mode="boto3", boto3_client=client, **options)
+
+
+async def run_level(requests: int, concurrency: int, output_dir: str) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await server.tool_generate_image_core(
+                    prompt=f"benchmark {i}",
+                    negative_prompt=None,
+                    aspect_ratio=None,
+                    seed=None,
+                    filename=f"bench_{i}",
+                    output_format=None,
+                    quality=None,
+                    effort=None,
+                    output_dir=output_dir,
+                )
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            os.remove(os.path.join(output_dir, f"bench_{i}.png"))
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    with PeakRSS() as rss:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / wall,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        if latencies
+        else 0.0,
+        "failures": failures,
+        "rss_mb": rss.peak / 1e6,
+        "cpu_ms": cpu / requests * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES_MB)), help="MB")
+    parser.add_argument("--concurrency", default=",".join(map(str, CONCURRENCY)))
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="Per level")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model time")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server.RESULT_CACHE = False
+    server.SAVE_METADATA = False
+    model_id = server.MODELS["core"]
+    print(
+        f"{'mode':>6} {'size':>6} {'conc':>5} {'req/s':>7} {'p50':>8} {'p99':>8} "
+        f"{'failed':>7} {'peak RSS':>9} {'CPU/req':>8}"
+    )
+    with tempfile.TemporaryDirectory() as out:
+        for image_mb in map(float, args.sizes.split(",")):
+            proc, url = start_fake_server(args, image_mb)
+            try:
+                for mode in args.modes.split(","):
+                    METRICS.reset()
+                    for concurrency in map(int, args.concurrency.split(",")):
+                        server._bedrock = make_client(mode, url, concurrency)
+                        result = asyncio.run(run_level(args.requests, concurrency, out))
+                        server._bedrock.close()
+                        print(
+                            f"{mode:>6} {image_mb:>4.0f}MB {concurrency:>5} "
+                            f"{result['throughput']:>7.2f} "
+                            f"{result['p50'] * 1000:>6.0f}ms "
+                            f"{result['p99'] * 1000:>6.0f}ms "
+                            f"{result['failures']:>7} "
+                            f"{result['rss_mb']:>7.0f}MB "
+                            f"{result['cpu_ms']:>6.1f}ms"
+                        )
+                    metrics = METRICS.snapshot().get(model_id, {})
+                    stages = {
+                        stage: metrics[f"stage_seconds.{stage}"]["mean"]
+                        for stage in STAGES
+                        if f"stage_seconds.{stage}" in metrics
+                    }
+                    means = "  ".join(
+                        f"{stage} {mean * 1000:.1f}ms" for stage, mean in stages.items()
+                    )
+                    print(f"{'':>13} mean per call: {means}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Cold-start cost of importing the server, measured with -X importtime.
+
+Reports the total import time, the share spent in this package's own modules
+(tool registration, config), and whether NumPy/Pillow/boto3 were pulled in.
+Each run uses a fresh interpreter; the best of RUNS is shown.
+
+Run with: uv run python benchmarks/bench_import_time.py
+"""
+
+import subprocess
+import sys
+
+MODULE = "mcp_server_bedrock_image.server"
+PACKAGE = MODULE.split(".")[0]
+HEAVY = ("numpy", "PIL", "boto3", "botocore", "requests")
+RUNS = 5
+
+
+def import_times(module: str = MODULE) -> dict[str, tuple[int, int]]:
+    """Map module name -> (self_us, cumulative_us) for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    runs = [import_times() for _ in range(RUNS)]
+    best = min(runs, key=lambda t: t[MODULE][1])
+    own = sum(s for name, (s, _) in best.items() if name.startswith(PACKAGE))
+    print(f"total import:   {best[MODULE][1] / 1000:8.1f}ms")
+    print(f"package itself: {own / 1000:8.1f}ms")
+    print(f"mcp framework:  {best.get('mcp', (0, 0))[1] / 1000:8.1f}ms")
+    loaded = [name for name in HEAVY if name in best]
+    print(f"heavy imports:  {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Logo placement: 3x3 grid cells vs summed-area-table window search.
+
+"analysis" scores placement on an already-decoded image at full resolution;
+"thumbnail" uses the default 1024px analysis size that compose_branded uses.
+The window search scores every logo-sized window at the default stride.
+
+Run with: uv run python benchmarks/bench_logo_placement.py
+"""
+
+import time
+
+import numpy as np
+from PIL import Image
+
+from mcp_server_bedrock_image.tools.compose import (
+    ANALYSIS_MAX_SIDE,
+    find_best_logo_position,
+    find_best_logo_quadrant,
+)
+
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}
+LOGO_SCALE = 0.08
+RUNS = 3
+
+
+def _best_of(fn, *args, **kwargs) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(
+        f"{'size':>6} {'windows':>9} {'grid full/thumb':>18} {'window full/thumb':>20}"
+    )
+    for label, (w, h) in SIZES.items():
+        pixels = rng.integers(0, 256, size=(h // 8, w // 8, 3), dtype=np.uint8)
+        img = Image.fromarray(pixels).resize((w, h))
+        logo_w = int(w * LOGO_SCALE)
+        logo = (logo_w, logo_w // 2)
+        stride = max(1, min(logo) // 4)
+        windows = ((w - logo[0] - 20) // stride + 2) * (
+            (h - logo[1] - 20) // stride + 2
+        )
+
+        grid_full = _best_of(find_best_logo_quadrant, img)
+        grid_thumb = _best_of(find_best_logo_quadrant, img, max_side=ANALYSIS_MAX_SIDE)
+        window_full = _best_of(find_best_logo_position, img, logo)
+        window_thumb = _best_of(
+            find_best_logo_position, img, logo, max_side=ANALYSIS_MAX_SIDE
+        )
+        print(
+            f"{label:>6} {windows:>9} {grid_full:>8.0f}ms / {grid_thumb:>4.0f}ms "
+            f"{window_full:>10.0f}ms / {window_thumb:>4.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
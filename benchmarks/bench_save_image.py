@@ -0,0 +1,48 @@
+"""Peak memory of save_image: whole-string decode vs chunked decode-to-disk.
+
+Run with: uv run python benchmarks/bench_save_image.py
+"""
+
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+
+from mcp_server_bedrock_image.image_utils import save_image
+
+SIZES_MB = (1, 5, 20)
+
+
+def _legacy_save(base64_data: str, output_dir: str) -> None:
+    with open(os.path.join(output_dir, "legacy.png"), "wb") as f:
+        f.write(base64.b64decode(base64_data))
+
+
+def _measure(fn, *args) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, elapsed * 1000
+
+
+def main() -> None:
+    print(
+        f"{'size':>6} {'legacy peak':>12} {'chunked peak':>13} {'legacy':>9} {'chunked':>9}"
+    )
+    with tempfile.TemporaryDirectory() as out:
+        for mb in SIZES_MB:
+            data = base64.b64encode(os.urandom(mb * 1_000_000)).decode()
+            legacy_peak, legacy_ms = _measure(_legacy_save, data, out)
+            chunked_peak, chunked_ms = _measure(save_image, data, out)
+            print(
+                f"{mb:>4}MB {legacy_peak:>10.1f}MB {chunked_peak:>11.1f}MB "
+                f"{legacy_ms:>7.1f}ms {chunked_ms:>7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Local stand-in for the Bedrock runtime ``/model/{id}/invoke`` endpoint.
+
+Answers every invoke with ``{"images": [<base64>], "seeds": [...]}`` after a
+configurable delay. A share of requests can be throttled (429
+ThrottlingException) or failed (500 InternalServerException), with the error
+type in ``x-amzn-ErrorType`` so boto3 and bearer clients classify them as
+they would real Bedrock errors. Payloads are random bytes behind a PNG
+signature, encoded once at startup, so serving costs little CPU.
+
+Used by bench_bedrock_client.py; it can also be run on its own:
+
+    uv run python benchmarks/fake_bedrock.py --port 8999 --image-mb 5 --latency 0.5
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+WRITE_CHUNK_BYTES = 1 << 20
+_INVOKE_PATH = re.compile(r"^/model/([^/]+)/invoke$")
+
+
+class FakeBedrock(ThreadingHTTPServer):
+    """HTTP server with fixed response payload and failure injection."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        image_mb: float = 1,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+    ):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        image = PNG_SIGNATURE + os.urandom(max(int(image_mb * 1_000_000), 0))
+        self.payload = base64.b64encode(image)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def outcome(self) -> int:
+        """HTTP status for the next request: 200, 429 or 500."""
+        draw = random.random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return 500
+        return 200
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeBedrock
+
+    def do_POST(self):
+        match = _INVOKE_PATH.match(self.path.split("?", 1)[0])
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if match is None:
+            self._error(404, "UnknownOperationException", "Not found")
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._error(400, "ValidationException", "Malformed request body")
+            return
+
+        server = self.server
+        time.sleep(max(server.latency + random.uniform(0, server.jitter), 0))
+        status = server.outcome()
+        if status == 429:
+            self._error(429, "ThrottlingException", "Too many requests")
+            return
+        if status == 500:
+            self._error(500, "InternalServerException", "Injected failure")
+            return
+
+        seed = request.get("seed") or random.randrange(1 << 32)
+        head = b'{"images": ["'
+        tail = json.dumps(
+            {"seeds": [seed], "finish_reasons": [None], "model": unquote(match[1])}
+        ).encode()
+        tail = b'"], ' + tail[1:]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header(
+            "Content-Length", str(len(head) + len(server.payload) + len(tail))
+        )
+        self.end_headers()
+        self.wfile.write(head)
+        view = memoryview(server.payload)
+        for start in range(0, len(view), WRITE_CHUNK_BYTES):
+            self.wfile.write(view[start : start + WRITE_CHUNK_BYTES])
+        self.wfile.write(tail)
+
+    def _error(self, status: int, error_type: str, message: str) -> None:
+        body = json.dumps({"message": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header(
+            "x-amzn-ErrorType", f"{error_type}:http://internal.amazon.com/"
+        )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--image-mb", type=float, default=1, help="Decoded size")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay")
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeBedrock(
+        args.host,
+        args.port,
+        image_mb=args.image_mb,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+    )
+    # The first line tells a parent process where to connect
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,130 @@
 """Bedrock runtime client with dual auth: boto3 (STS/IAM) and Bearer token (API key)."""
 
+import asyncio
+import base64
+import hashlib
 import json
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import boto3
 import requests
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
 
-from .config import AUTH_MODE, AWS_REGION, BEARER_TOKEN, BEDROCK_ENDPOINT
+from .config import (
+    AUTH_MODE,
+    AWS_REGION,
+    BEARER_TOKEN,
+    BEDROCK_ENDPOINT,
+    COALESCE,
+    CONNECT_TIMEOUT,
+    MAX_WORKERS,
+    POOL_SIZE,
+    READ_TIMEOUT,
+)
+from .limiter import ModelLimiter, RateLimiter
+from .metrics import METRICS
+from .response_stream import ImageSink, parse_image_response
+from .retry import RetryPolicy, error_code, is_throttling_error
+
+# Bytes read per base64 chunk when replaying a shared result into a sink; a
+# multiple of 3 so every chunk encodes without padding
+REPLAY_CHUNK_BYTES = 3 << 18
+
+
+class _Flight:
+    """One in-flight invocation that identical concurrent calls attach to.
+
+    The leader publishes its result or error; followers replay it. The
+    leader doesn't return until every follower is done reading its output,
+    so files it streamed can't be moved away underneath them.
+    """
+
+    def __init__(self):
+        self.followers = 0
+        self.result: dict[str, Any] | None = None
+        self.error: BaseException | None = None
+        self._done = False
+        self._cond = threading.Condition()
+
+    def publish(self, result=None, error=None) -> None:
+        with self._cond:
+            self.result, self.error, self._done = result, error, True
+            self._cond.notify_all()
+
+    def wait(self) -> dict[str, Any]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def release(self) -> None:
+        with self._cond:
+            self.followers -= 1
+            self._cond.notify_all()
+
+    def wait_for_followers(self) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self.followers == 0)
+
+
+class _AsyncFlight:
+    """``_Flight`` for ainvoke_model, whose callers wait on the event loop
+    rather than on a worker thread."""
+
+    def __init__(self):
+        self.followers = 0
+        self._outcome = asyncio.get_running_loop().create_future()
+        self._idle = asyncio.Event()
+
+    def publish(self, result=None, error=None) -> None:
+        if isinstance(error, asyncio.CancelledError):
+            # Only the leader was cancelled; its followers still want a result
+            self._outcome.set_result(None)
+        elif error is not None:
+            self._outcome.set_exception(error)
+            self._outcome.exception()  # followers re-raise it; don't log it
+        else:
+            self._outcome.set_result(result)
+
+    async def wait(self) -> dict[str, Any] | None:
+        """The leader's result, or None if it was cancelled before getting
+        one and the caller should send the request itself."""
+        return await asyncio.shield(self._outcome)
+
+    def release(self) -> None:
+        self.followers -= 1
+        if self.followers == 0:
+            self._idle.set()
+
+    async def wait_for_followers(self) -> None:
+        if self.followers:
+            await self._idle.wait()
+
+
+def default_endpoint(region: str) -> str:
+    """Bedrock runtime URL for ``region``; BEDROCK_ENDPOINT for AWS_REGION."""
+    if region == AWS_REGION:
+        return BEDROCK_ENDPOINT
+    return f"https://bedrock-runtime.{region}.amazonaws.com"
+
+
+class _CountingStream:
+    """File-like wrapper counting the bytes read from a response body."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes = 0
+
+    def read(self, size: int | None = None) -> bytes:
+        data = self._stream.read() if size is None else self._stream.read(size)
+        self.bytes += len(data)
+        return data
 
 
 class BedrockImageClient:
@@ -25,46 +143,482 @@ class BedrockImageClient:
         bearer_token: str | None = None,
         endpoint: str | None = None,
         region: str | None = None,
+        max_workers: int | None = None,
+        pool_size: int | None = None,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        session: requests.Session | None = None,
+        limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        coalesce: bool | None = None,
     ):
         self.auth_mode = auth_mode or AUTH_MODE
         self.region = region or AWS_REGION
+        self._max_workers = max_workers or MAX_WORKERS
+        self._executor: ThreadPoolExecutor | None = None
+        self.pool_size = pool_size or POOL_SIZE
+        self.timeout = (
+            connect_timeout or CONNECT_TIMEOUT,
+            read_timeout or READ_TIMEOUT,
+        )
+        self.limiter = limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.coalesce = COALESCE if coalesce is None else coalesce
+        self._flights: dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._async_flights: dict[str, _AsyncFlight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self._connect(boto3_client, bearer_token, endpoint, session)
 
+    def _connect(self, boto3_client, bearer_token, endpoint, session) -> None:
         if self.auth_mode == "boto3":
             self._boto3_client = boto3_client or boto3.client(
-                "bedrock-runtime", region_name=self.region
+                "bedrock-runtime",
+                region_name=self.region,
+                endpoint_url=endpoint,
+                config=Config(
+                    max_pool_connections=self.pool_size,
+                    connect_timeout=self.timeout[0],
+                    read_timeout=self.timeout[1],
+                    tcp_keepalive=True,
+                    # Retries are handled by RetryPolicy in invoke_model
+                    retries={"total_max_attempts": 1},
+                ),
             )
         elif self.auth_mode == "bearer":
             self._bearer_token = bearer_token or BEARER_TOKEN
-            self._endpoint = endpoint or BEDROCK_ENDPOINT
+            self._endpoint = endpoint or default_endpoint(self.region)
             if not self._bearer_token:
                 raise ValueError(
                     "Bearer token required. Set AWS_BEARER_TOKEN_BEDROCK env var "
                     "or pass bearer_token parameter."
                 )
+            self._session = session or self._build_session()
         else:
             raise ValueError(
                 f"Invalid auth_mode: '{self.auth_mode}'. Must be 'boto3' or 'bearer'."
             )
 
-    def invoke_model(self, model_id: str, body: dict) -> dict[str, Any]:
-        """Invoke a Bedrock image model and return parsed JSON response."""
-        if self.auth_mode == "boto3":
-            return self._invoke_boto3(model_id, body)
-        return self._invoke_bearer(model_id, body)
+    def invoke_model(
+        self,
+        model_id: str,
+        body: dict,
+        open_sink: Callable[[int], ImageSink] | None = None,
+        coalesce: bool | None = None,
+    ) -> dict[str, Any]:
+        """Invoke a Bedrock image model and return parsed JSON response.
+
+        Calls are admitted through the per-model limiter, which backs off
+        when Bedrock reports throttling. Retryable errors are re-sent with
+        the same serialized body until the retry policy gives up; the number
+        of retries is reported under the ``"retries"`` key of the response.
+
+        With ``open_sink``, the response is parsed incrementally and each
+        base64 image is streamed into ``open_sink(i)`` instead of being held
+        in memory; ``images`` then holds the sinks' ``close()`` results.
+
+        Concurrent calls with the same model and body share one Bedrock
+        request: later callers wait for the first and get a copy of its
+        result, marked ``"coalesced": True``. Only reproducible calls are
+        shared, since an unseeded call is expected to give a fresh image:
+        by default those with a nonzero ``seed``, or as ``coalesce`` says.
+
+        Stage timings, payload sizes and error counts are recorded in
+        ``metrics.METRICS`` under the model ID.
+        """
+        payload = self._serialize(model_id, body)
+        if not self._coalesces(body, coalesce):
+            return self._invoke(model_id, payload, open_sink)
+
+        key = self._flight_key(model_id, payload, open_sink)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leading = True
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+                leading = False
+
+        if not leading:
+            try:
+                return self._follow(flight.wait(), open_sink)
+            finally:
+                flight.release()
+
+        try:
+            result = self._invoke(model_id, payload, open_sink)
+        except BaseException as e:
+            self._land(key)
+            flight.publish(error=e)
+            raise
+        self._land(key)
+        flight.publish(result=result)
+        flight.wait_for_followers()
+        return result
+
+    async def ainvoke_model(
+        self,
+        model_id: str,
+        body: dict,
+        open_sink: Callable[[int], ImageSink] | None = None,
+        coalesce: bool | None = None,
+    ) -> dict[str, Any]:
+        """Async variant of invoke_model that keeps the event loop free.
+
+        Blocking work (serializing, the boto3/requests call, replaying a
+        shared result) runs on a bounded thread pool, so concurrent tool
+        calls overlap instead of serializing on the loop. Waiting for the
+        model's limiter, retry backoff and callers waiting on a coalesced
+        request wait on the loop, without holding a worker thread, so a
+        throttled model cannot starve the others of workers.
+        """
+        payload = await self._run(self._serialize, model_id, body)
+        if not self._coalesces(body, coalesce):
+            return await self._ainvoke(model_id, payload, open_sink)
+
+        key = self._flight_key(model_id, payload, open_sink)
+        while (flight := self._async_flights.get(key)) is not None:
+            flight.followers += 1
+            self.coalesced += 1
+            try:
+                result = await flight.wait()
+                if result is not None:
+                    return await self._run(self._follow, result, open_sink)
+            finally:
+                flight.release()
+            # The leader was cancelled: lead a new request, or follow the
+            # caller that got here first
+            self.coalesced -= 1
+
+        flight = self._async_flights[key] = _AsyncFlight()
+        self.leaders += 1
+        try:
+            result = await self._ainvoke(model_id, payload, open_sink)
+        except BaseException as e:
+            del self._async_flights[key]
+            flight.publish(error=e)
+            raise
+        del self._async_flights[key]
+        flight.publish(result=result)
+        await flight.wait_for_followers()
+        return result
 
-    def _invoke_boto3(self, model_id: str, body: dict) -> dict[str, Any]:
-        response = self._boto3_client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body),
+    def coalesce_stats(self) -> dict[str, Any]:
+        """Calls that led a Bedrock request vs. ones that shared another's."""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights) + len(self._async_flights),
+        }
+
+    def _coalesces(self, body: dict, coalesce: bool | None) -> bool:
+        # Seed 0 asks Bedrock for a random seed
+        if coalesce is None:
+            coalesce = bool(body.get("seed"))
+        return self.coalesce and coalesce
+
+    @staticmethod
+    def _serialize(model_id: str, body: dict) -> bytes:
+        with METRICS.timer(model_id, "serialize"):
+            payload = json.dumps(body, sort_keys=True).encode("utf-8")
+        METRICS.inc("requests", model=model_id)
+        METRICS.observe("request_bytes", len(payload), model=model_id)
+        return payload
+
+    @staticmethod
+    def _flight_key(
+        model_id: str, payload: bytes, open_sink: Callable[[int], ImageSink] | None
+    ) -> str:
+        return hashlib.sha256(
+            b"%s\0%d\0%s" % (model_id.encode(), open_sink is not None, payload)
+        ).hexdigest()
+
+    def _land(self, key: str) -> None:
+        # Stop new callers joining a flight whose outcome is being published
+        with self._flights_lock:
+            del self._flights[key]
+
+    @staticmethod
+    def _follow(
+        result: dict[str, Any], open_sink: Callable[[int], ImageSink] | None
+    ) -> dict[str, Any]:
+        result = {**result, "coalesced": True}
+        if open_sink is None:
+            return result
+        images = []
+        for i, path in enumerate(result.get("images", [])):
+            sink = open_sink(i)
+            try:
+                with open(path, "rb") as f:
+                    while chunk := f.read(REPLAY_CHUNK_BYTES):
+                        sink.write(base64.b64encode(chunk))
+            except BaseException:
+                sink.abort()
+                raise
+            images.append(sink.close())
+        result["images"] = images
+        return result
+
+    def _invoke(
+        self,
+        model_id: str,
+        payload: bytes,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._attempt(model_id, payload, deadline, open_sink)
+            except Exception as e:
+                delay = self._retry_delay(model_id, e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            result["retries"] = attempt - 1
+            return result
+
+    async def _ainvoke(
+        self,
+        model_id: str,
+        payload: bytes,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        """_invoke with admission and the backoff between attempts on the
+        event loop."""
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._aattempt(model_id, payload, deadline, open_sink)
+            except Exception as e:
+                delay = self._retry_delay(model_id, e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            result["retries"] = attempt - 1
+            return result
+
+    def _retry_delay(
+        self, model_id: str, error: Exception, attempt: int, deadline: float
+    ) -> float | None:
+        """Backoff before retrying after ``error``, or None to give up."""
+        delay = self.retry_policy.next_delay(
+            error, attempt, deadline - time.monotonic()
+        )
+        if delay is not None:
+            METRICS.inc("retries", model=model_id)
+        return delay
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def pool_stats(self) -> dict[str, Any]:
+        """Report connection reuse for the bearer-mode HTTP pool.
+
+        ``connections`` counts sockets opened per host and ``requests`` counts
+        requests sent over them, so ``reused`` staying near ``requests`` means
+        keep-alive is working.
+        """
+        stats: dict[str, Any] = {"auth_mode": self.auth_mode, "pools": []}
+        if self.auth_mode != "bearer":
+            return stats
+        adapter = self._session.get_adapter(self._endpoint)
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            return stats
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            stats["pools"].append(
+                {
+                    "host": pool.host,
+                    "connections": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "reused": max(pool.num_requests - pool.num_connections, 0),
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "maxsize": self.pool_size,
+                }
+            )
+        return stats
+
+    def region_stats(self) -> dict[str, dict[str, Any]]:
+        """Per-region admission state; a single region for this client."""
+        return {self.region: {"limits": self.limiter.stats()}}
+
+    def close(self) -> None:
+        """Release pooled connections and worker threads."""
+        if self.auth_mode == "bearer":
+            self._session.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, pool_block=True
         )
-        return json.loads(response["body"].read().decode("utf-8"))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
-    def _invoke_bearer(self, model_id: str, body: dict) -> dict[str, Any]:
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="bedrock"
+            )
+        return self._executor
+
+    def _attempt(
+        self,
+        model_id: str,
+        payload: bytes,
+        deadline: float,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        limiter = self.limiter.get(model_id)
+        with limiter.acquire(timeout=max(deadline - time.monotonic(), 0)) as waited:
+            return self._send(limiter, waited, model_id, payload, deadline, open_sink)
+
+    async def _aattempt(
+        self,
+        model_id: str,
+        payload: bytes,
+        deadline: float,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        """_attempt that waits for admission on the event loop, so only
+        admitted requests occupy the thread pool.
+
+        The slot is released when the send finishes rather than when the
+        awaiting task does: cancelling the task cannot stop a request already
+        on the wire, so it must keep counting against ``max_in_flight``.
+        """
+        limiter = self.limiter.get(model_id)
+        waited = await limiter.aadmit(timeout=max(deadline - time.monotonic(), 0))
+        try:
+            sent = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(),
+                self._send,
+                limiter,
+                waited,
+                model_id,
+                payload,
+                deadline,
+                open_sink,
+            )
+        except BaseException:
+            limiter.release()
+            raise
+
+        def release(future: asyncio.Future) -> None:
+            limiter.release()
+            if not future.cancelled():
+                future.exception()  # retrieved here if the awaiting task is gone
+
+        sent.add_done_callback(release)
+        return await asyncio.shield(sent)
+
+    def _send(
+        self,
+        limiter: ModelLimiter,
+        waited: float,
+        model_id: str,
+        payload: bytes,
+        deadline: float,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        """One admitted request; its outcome adjusts ``limiter``."""
+        METRICS.stage(model_id, "queue_wait", waited)
+        try:
+            if self.auth_mode == "boto3":
+                result = self._invoke_boto3(model_id, payload, open_sink)
+            else:
+                read_timeout = min(self.timeout[1], deadline - time.monotonic())
+                result = self._invoke_bearer(
+                    model_id,
+                    payload,
+                    (self.timeout[0], max(read_timeout, 1)),
+                    open_sink,
+                )
+        except Exception as e:
+            METRICS.inc("errors", model=model_id, error=error_code(e))
+            if is_throttling_error(e):
+                METRICS.inc("throttles", model=model_id)
+                limiter.on_throttle()
+            raise
+        limiter.on_success()
+        return result
+
+    def _invoke_boto3(
+        self,
+        model_id: str,
+        payload: bytes,
+        open_sink: Callable[[int], ImageSink] | None = None,
+    ) -> dict[str, Any]:
+        with METRICS.timer(model_id, "network"):
+            response = self._boto3_client.invoke_model(
+                modelId=model_id,
+                body=payload,
+            )
+        return self._read_response(model_id, response["body"], open_sink)
+
+    def _invoke_bearer(
+        self,
+        model_id: str,
+        payload: bytes,
+        timeout: tuple[float, float],
+        open_sink: Callable[[int], ImageSink] | None = None,
+    ) -> dict[str, Any]:
         url = f"{self._endpoint}/model/{model_id}/invoke"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self._bearer_token}",
         }
-        response = requests.post(url, json=body, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        with METRICS.timer(model_id, "network"):
+            response = self._session.post(
+                url,
+                data=payload,
+                headers=headers,
+                timeout=timeout,
+                stream=open_sink is not None,
+            )
+        try:
+            # Closing also returns a streamed error response's connection to
+            # the pool, which would otherwise stay checked out
+            response.raise_for_status()
+            if open_sink is None:
+                with METRICS.timer(model_id, "parse"):
+                    result = response.json()
+                METRICS.observe("response_bytes", len(response.content), model=model_id)
+                return result
+            response.raw.decode_content = True
+            return self._read_response(model_id, response.raw, open_sink)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _read_response(
+        model_id: str,
+        stream,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        counted = _CountingStream(stream)
+        with METRICS.timer(model_id, "parse"):
+            if open_sink is not None:
+                result = parse_image_response(counted, open_sink)
+            else:
+                result = json.loads(counted.read().decode("utf-8"))
+        METRICS.observe("response_bytes", counted.bytes, model=model_id)
+        return result
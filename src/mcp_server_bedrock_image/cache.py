@@ -0,0 +1,105 @@
+"""Content-addressed on-disk cache for deterministic Bedrock results."""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from .config import RESULT_CACHE_DIRECTORY, RESULT_CACHE_MAX_BYTES
+
+# Body fields holding base64 input images; hashed before keying so the key
+# stays small and depends only on the image content.
+IMAGE_FIELDS = ("image", "style_image")
+
+
+def cache_key(model_id: str, body: dict) -> str:
+    """SHA-256 over the model ID and the canonicalized request body."""
+    canonical = dict(body)
+    for field in IMAGE_FIELDS:
+        value = canonical.get(field)
+        if isinstance(value, str):
+            canonical[field] = "sha256:" + hashlib.sha256(value.encode()).hexdigest()
+    payload = json.dumps(
+        {"model": model_id, "body": canonical},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of saved output files keyed by ``cache_key``.
+
+    Each entry is ``<key>.json`` (seeds and file list) plus one copy of every
+    output image. Hits refresh the entry's mtime; ``put`` evicts the least
+    recently used entries once the directory exceeds ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str = RESULT_CACHE_DIRECTORY,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        """Return ``{"paths": [...], "seeds": [...]}`` for a hit, else None."""
+        index = os.path.join(self.directory, f"{key}.json")
+        try:
+            with open(index) as f:
+                entry = json.load(f)
+            paths = [os.path.join(self.directory, name) for name in entry["files"]]
+            for path in (index, *paths):
+                os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"paths": paths, "seeds": entry.get("seeds", [])}
+
+    def put(self, key: str, paths: list[str], seeds: list[int]) -> None:
+        """Copy saved outputs into the cache and evict down to ``max_bytes``."""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for i, path in enumerate(paths):
+            name = f"{key}_{i}{os.path.splitext(path)[1]}"
+            shutil.copyfile(path, os.path.join(self.directory, name))
+            files.append(name)
+        tmp = os.path.join(self.directory, f"{key}.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"files": files, "seeds": seeds}, f)
+        os.replace(tmp, os.path.join(self.directory, f"{key}.json"))
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries: dict[str, list] = {}
+            for name in os.listdir(self.directory):
+                key = name.split("_", 1)[0].split(".", 1)[0]
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entry = entries.setdefault(key, [0.0, 0, []])
+                entry[0] = max(entry[0], stat.st_mtime)
+                entry[1] += stat.st_size
+                entry[2].append(name)
+            total = sum(size for _, size, _ in entries.values())
+            for _, size, names in sorted(entries.values()):
+                if total <= self.max_bytes:
+                    break
+                for name in names:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -1,3 +1,4 @@
+import json
 import os
 
 AWS_REGION = os.environ.get("AWS_REGION", "us-west-2")
@@ -6,6 +7,57 @@ IMAGE_STORAGE_DIRECTORY = os.environ.get(
 )
 SAVE_METADATA = os.environ.get("SAVE_METADATA", "true").lower() == "true"
 
+# Default encoding of saved images: png, jpeg, webp or avif. Quality (1-100)
+# and effort (0-9, higher = smaller/slower) apply when set; Bedrock returns
+# png/jpeg/webp natively, anything else is transcoded locally.
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "png").lower()
+OUTPUT_QUALITY = (
+    int(os.environ["OUTPUT_QUALITY"]) if os.environ.get("OUTPUT_QUALITY") else None
+)
+OUTPUT_EFFORT = (
+    int(os.environ["OUTPUT_EFFORT"]) if os.environ.get("OUTPUT_EFFORT") else None
+)
+
+# Server transport: "stdio" (one process per client), or "streamable-http" /
+# "sse" to serve many clients from one long-running process on HOST:PORT
+TRANSPORT = os.environ.get("MCP_TRANSPORT", "stdio")
+HOST = os.environ.get("MCP_HOST", "127.0.0.1")
+PORT = int(os.environ.get("MCP_PORT", "8000"))
+# Host names (comma-separated) clients may use to reach an HTTP transport
+# bound to a non-loopback address; other Host headers are refused (DNS
+# rebinding protection). Empty with a wildcard bind such as 0.0.0.0 turns
+# the check off, since such a server can be reached under any name.
+ALLOWED_HOSTS = [
+    h.strip() for h in os.environ.get("MCP_ALLOWED_HOSTS", "").split(",") if h.strip()
+]
+
+# Create the Bedrock client and import the imaging libraries in the background
+# at startup, so the first tool call doesn't pay for them
+WARMUP = os.environ.get("WARMUP", "false").lower() == "true"
+
+# Port for a Prometheus text endpoint at /metrics on MCP_HOST (0 disables it)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Async job mode: concurrent jobs, and finished jobs kept for status/result
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", "1000"))
+
+# SQLite record of jobs, so queued/interrupted jobs resume after a restart
+JOB_STORE = os.environ.get("JOB_STORE", "true").lower() == "true"
+JOB_DATABASE = os.environ.get(
+    "JOB_DATABASE", os.path.join(IMAGE_STORAGE_DIRECTORY, "jobs.db")
+)
+# Seconds a server process holds its unfinished jobs without renewing them
+# before another process sharing the database takes them over
+JOB_LEASE = float(os.environ.get("JOB_LEASE", "60"))
+
+# On-disk cache of deterministic results (seeded generations, pure edits)
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "true").lower() == "true"
+RESULT_CACHE_DIRECTORY = os.environ.get(
+    "RESULT_CACHE_DIRECTORY", os.path.join(IMAGE_STORAGE_DIRECTORY, ".cache")
+)
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(1 << 30)))
+
 # Authentication mode: "boto3" (STS/IAM credentials) or "bearer" (Bedrock API key)
 AUTH_MODE = os.environ.get("BEDROCK_AUTH_MODE", "boto3")
 BEARER_TOKEN = os.environ.get("AWS_BEARER_TOKEN_BEDROCK", "")
@@ -16,6 +68,66 @@ BEDROCK_ENDPOINT = os.environ.get(
     f"https://bedrock-runtime.{AWS_REGION}.amazonaws.com",
 )
 
+# Regions to send calls to, most preferred first. With more than one, each
+# call goes to the region with rate-limit headroom and the lowest recent
+# latency, failing over to the next on throttling or server errors.
+# BEDROCK_REGION_ENDPOINTS overrides the endpoint per region, and a region is
+# passed over for BEDROCK_REGION_COOLDOWN seconds after it throttles or fails.
+REGIONS = [
+    region.strip()
+    for region in os.environ.get("BEDROCK_REGIONS", AWS_REGION).split(",")
+    if region.strip()
+]
+REGION_ENDPOINTS = json.loads(os.environ.get("BEDROCK_REGION_ENDPOINTS", "{}"))
+REGION_COOLDOWN = float(os.environ.get("BEDROCK_REGION_COOLDOWN", "10"))
+
+# Check input images against each model's limits before upload: reject bad
+# input locally, downscale oversized images, drop metadata, and re-encode
+# lossless files of at least PREFLIGHT_REENCODE_BYTES when that shrinks them
+PREFLIGHT = os.environ.get("PREFLIGHT", "true").lower() == "true"
+PREFLIGHT_REENCODE_BYTES = int(os.environ.get("PREFLIGHT_REENCODE_BYTES", str(1 << 20)))
+
+# Memory budget for memoized base64 encodings of input images
+INPUT_CACHE_MAX_BYTES = int(os.environ.get("INPUT_CACHE_MAX_BYTES", str(256 << 20)))
+
+# Worker threads used by BedrockImageClient.ainvoke_model to run blocking calls
+MAX_WORKERS = int(os.environ.get("BEDROCK_MAX_WORKERS", "8"))
+
+# Longest side used for logo placement analysis in compose_branded; placement
+# scores don't need full resolution.
+ANALYSIS_MAX_SIDE = 1024
+
+# Worker processes used by compose_branded_batch (defaults to the CPU count)
+COMPOSE_MAX_WORKERS = int(os.environ.get("COMPOSE_MAX_WORKERS", os.cpu_count() or 1))
+
+# Inputs too large for upscale_fast are upscaled as tiles that overlap by
+# UPSCALE_TILE_OVERLAP pixels; larger inputs than UPSCALE_MAX_TILES tiles
+# can cover are rejected
+UPSCALE_TILE_OVERLAP = int(os.environ.get("UPSCALE_TILE_OVERLAP", "64"))
+UPSCALE_MAX_TILES = int(os.environ.get("UPSCALE_MAX_TILES", "16"))
+
+# HTTP connection pooling and timeouts (seconds) for Bedrock calls
+POOL_SIZE = int(os.environ.get("BEDROCK_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("BEDROCK_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("BEDROCK_READ_TIMEOUT", "120"))
+
+# Retries for throttling/5xx/connection errors with full-jitter backoff.
+# BEDROCK_CALL_DEADLINE caps the total seconds spent on one invocation.
+MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.environ.get("BEDROCK_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.environ.get("BEDROCK_RETRY_MAX_DELAY", "20"))
+CALL_DEADLINE = float(os.environ.get("BEDROCK_CALL_DEADLINE", "300"))
+
+# Share one Bedrock request between identical concurrent calls
+COALESCE = os.environ.get("BEDROCK_COALESCE", "true").lower() == "true"
+
+# Per-model admission control: sustained requests/second (0 disables the
+# token bucket) and max concurrent requests. BEDROCK_MODEL_LIMITS overrides
+# either value per MODELS key, e.g. {"ultra": {"rate": 0.5, "max_in_flight": 1}}
+MODEL_RATE_LIMIT = float(os.environ.get("BEDROCK_RATE_LIMIT", "2"))
+MODEL_MAX_IN_FLIGHT = int(os.environ.get("BEDROCK_MAX_IN_FLIGHT", "4"))
+MODEL_LIMITS = json.loads(os.environ.get("BEDROCK_MODEL_LIMITS", "{}"))
+
 # Stability AI model IDs on Bedrock
 MODELS = {
     "ultra": "stability.stable-image-ultra-v1:1",
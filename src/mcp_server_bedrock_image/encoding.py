@@ -0,0 +1,164 @@
+"""Output image encoding: format selection and local transcoding."""
+
+import os
+import time
+import uuid
+import warnings
+from typing import TYPE_CHECKING
+
+from .config import OUTPUT_EFFORT, OUTPUT_FORMAT, OUTPUT_QUALITY
+
+FORMATS = ("png", "jpeg", "webp", "avif")
+# Formats Bedrock's Stability models can return directly
+BEDROCK_FORMATS = ("png", "jpeg", "webp")
+# Per MODELS key, for models that return fewer formats
+NATIVE_FORMATS = {
+    "sd35": ("png", "jpeg"),
+    "remove_background": ("png", "webp"),
+}
+EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp", "avif": ".avif"}
+_ALIASES = {"jpg": "jpeg"}
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class OutputEncoding:
+    """How saved images are encoded.
+
+    ``quality`` (1-100) applies to jpeg/webp/avif. ``effort`` (0-9) trades
+    encode time for size: PNG compression level, WebP method, AVIF speed,
+    JPEG optimized Huffman tables. Unset values fall back to the
+    OUTPUT_FORMAT/OUTPUT_QUALITY/OUTPUT_EFFORT settings.
+    """
+
+    def __init__(
+        self,
+        format: str | None = None,
+        quality: int | None = None,
+        effort: int | None = None,
+    ):
+        fmt = (format or OUTPUT_FORMAT).lower()
+        self.format = _ALIASES.get(fmt, fmt)
+        if self.format not in FORMATS:
+            raise ValueError(
+                f"Invalid output format: '{format}'. "
+                f"Must be one of {', '.join(FORMATS)}."
+            )
+        if self.format == "avif" and not _can_write("avif"):
+            available = ", ".join(f for f in FORMATS if _can_write(f))
+            raise ValueError(
+                "Output format 'avif' is not supported by the installed Pillow. "
+                f"Available formats: {available}."
+            )
+        self.quality = quality if quality is not None else OUTPUT_QUALITY
+        self.effort = effort if effort is not None else OUTPUT_EFFORT
+        if self.quality is not None and not 1 <= self.quality <= 100:
+            raise ValueError(f"Invalid quality: {self.quality}. Must be 1-100.")
+        if self.effort is not None and not 0 <= self.effort <= 9:
+            raise ValueError(f"Invalid effort: {self.effort}. Must be 0-9.")
+
+    def request_format(self, model_key: str | None = None) -> str:
+        """Format to ask the model (a MODELS key) for.
+
+        The target format when the model can produce it as-is; otherwise PNG,
+        a lossless source for the local re-encode.
+        """
+        native = NATIVE_FORMATS.get(model_key, BEDROCK_FORMATS)
+        if self.format in native and not self.needs_transcode(self.format):
+            return self.format
+        return "png"
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.format]
+
+    def path_for(self, path: str) -> str:
+        """``path`` with its extension swapped for this format's, if different."""
+        if _format_of(path) == self.format:
+            return path
+        return os.path.splitext(path)[0] + self.extension
+
+    def needs_transcode(self, source_format: str) -> bool:
+        return (
+            source_format != self.format
+            or self.quality is not None
+            or self.effort is not None
+        )
+
+    def finish(self, path: str) -> dict:
+        """Bring a saved image to this encoding, re-encoding only if needed.
+
+        The result replaces ``path`` (with this encoding's extension).
+        Returns the file report: path, format, bytes and encode_s.
+        """
+        source_format = _format_of(path)
+        if not self.needs_transcode(source_format):
+            return _report(path, self.format, 0.0)
+        from PIL import Image
+
+        with Image.open(path) as img:
+            report = self.save(img, self.path_for(path))
+        if os.path.abspath(path) != report["path"]:
+            os.remove(path)
+        return report
+
+    def save(self, img: "Image.Image", path: str) -> dict:
+        """Encode ``img`` to ``path`` atomically and return the file report."""
+        start = time.perf_counter()
+        if self.format == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        parent = os.path.dirname(path) or "."
+        os.makedirs(parent, exist_ok=True)
+        tmp = os.path.join(parent, f".{os.path.basename(path)}.{uuid.uuid4().hex}.part")
+        try:
+            img.save(tmp, self.format.upper(), **self._save_options())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return _report(path, self.format, time.perf_counter() - start)
+
+    def _save_options(self) -> dict:
+        effort = self.effort
+        if self.format == "png":
+            if effort is None:
+                return {}
+            return {"compress_level": effort, "optimize": effort >= 9}
+        if self.format == "jpeg":
+            return {
+                "quality": self.quality or 90,
+                "optimize": effort is None or effort >= 5,
+            }
+        if self.format == "webp":
+            method = 4 if effort is None else round(effort * 6 / 9)
+            return {"quality": self.quality or 90, "method": method}
+        speed = 6 if effort is None else 10 - round(effort * 10 / 9)
+        return {"quality": self.quality or 75, "speed": speed}
+
+
+def _can_write(format: str) -> bool:
+    """Whether the installed Pillow can encode ``format``."""
+    if format in ("png", "jpeg"):
+        return True
+    from PIL import features
+
+    with warnings.catch_warnings():
+        # Pillow before 11.2 has no AVIF feature and warns about the name
+        warnings.simplefilter("ignore")
+        return bool(features.check(format))
+
+
+def _format_of(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return _ALIASES.get(ext, ext)
+
+
+def _report(path: str, fmt: str, encode_s: float) -> dict:
+    return {
+        "path": os.path.abspath(path),
+        "format": fmt,
+        "bytes": os.path.getsize(path),
+        "encode_s": round(encode_s, 4),
+    }
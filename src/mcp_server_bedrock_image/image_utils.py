@@ -1,21 +1,140 @@
 import base64
+import hashlib
 import json
+import mmap
 import os
+import shutil
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime, timezone
 
+from .config import INPUT_CACHE_MAX_BYTES
+
+# Base64 characters decoded per write. A multiple of 4, so each slice of a
+# well-formed string decodes on its own.
+DECODE_CHUNK_CHARS = 1 << 20
+
+
+class Base64StreamDecoder:
+    """Incremental base64 decoder for input split at arbitrary boundaries."""
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, data: str | bytes) -> bytes:
+        """Decode as much of ``data`` as forms whole 4-character groups."""
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        if self._pending:
+            data = self._pending + data
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable], validate=True) if usable else b""
+
+    def flush(self) -> bytes:
+        """Finish decoding; raises ValueError if the input was truncated."""
+        if self._pending:
+            raise ValueError("Truncated base64 image data")
+        return b""
+
+
+def _iter_chunks(base64_data: str) -> Iterator[str]:
+    for start in range(0, len(base64_data), DECODE_CHUNK_CHARS):
+        yield base64_data[start : start + DECODE_CHUNK_CHARS]
+
 
 def save_image(
     base64_data: str,
     output_dir: str,
     filename: str | None = None,
+    extension: str = ".png",
+) -> str:
+    """Decode base64 image and save it (as PNG by default). Returns absolute path."""
+    return save_image_stream(_iter_chunks(base64_data), output_dir, filename, extension)
+
+
+def save_image_stream(
+    chunks: Iterable[str | bytes],
+    output_dir: str,
+    filename: str | None = None,
+    extension: str = ".png",
+) -> str:
+    """Decode base64 chunks straight to disk as ``<filename><extension>``.
+
+    Only one chunk is decoded at a time. Output goes to a temp file in
+    output_dir that is renamed into place once complete, so readers never see
+    a partial image. Returns absolute path.
+    """
+    sink = ImageFileSink(output_dir, filename, extension)
+    try:
+        for chunk in chunks:
+            sink.write(chunk)
+    except BaseException:
+        sink.abort()
+        raise
+    return sink.close()
+
+
+class ImageFileSink:
+    """Write-side of save_image_stream: feed base64 chunks, then close or abort.
+
+    ``decode_s`` and ``write_s`` accumulate the time spent base64-decoding
+    and writing to disk.
+    """
+
+    def __init__(
+        self, output_dir: str, filename: str | None = None, extension: str = ".png"
+    ):
+        os.makedirs(output_dir, exist_ok=True)
+        fname = f"{filename or uuid.uuid4()}{extension}"
+        self.path = os.path.join(output_dir, fname)
+        self._tmp = os.path.join(output_dir, f".{fname}.{uuid.uuid4().hex}.part")
+        self._file = open(self._tmp, "xb")
+        self._decoder = Base64StreamDecoder()
+        self.decode_s = 0.0
+        self.write_s = 0.0
+
+    def write(self, chunk: str | bytes) -> None:
+        start = time.perf_counter()
+        data = self._decoder.feed(chunk)
+        decoded = time.perf_counter()
+        self._file.write(data)
+        self.decode_s += decoded - start
+        self.write_s += time.perf_counter() - decoded
+
+    def close(self) -> str:
+        """Finish the image and move it into place. Returns absolute path."""
+        try:
+            start = time.perf_counter()
+            self._file.write(self._decoder.flush())
+            self._file.close()
+            os.replace(self._tmp, self.path)
+            self.write_s += time.perf_counter() - start
+        except BaseException:
+            self.abort()
+            raise
+        return os.path.abspath(self.path)
+
+    def abort(self) -> None:
+        """Discard the partial image."""
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def copy_image(
+    source_path: str,
+    output_dir: str,
+    filename: str | None = None,
 ) -> str:
-    """Decode base64 image and save as PNG. Returns absolute path."""
+    """Copy an existing image into output_dir. Returns absolute path."""
     os.makedirs(output_dir, exist_ok=True)
-    fname = f"{filename or uuid.uuid4()}.png"
+    fname = f"{filename or uuid.uuid4()}{os.path.splitext(source_path)[1]}"
     path = os.path.join(output_dir, fname)
-    with open(path, "wb") as f:
-        f.write(base64.b64decode(base64_data))
+    shutil.copyfile(source_path, path)
     return os.path.abspath(path)
 
 
@@ -32,3 +151,107 @@ def save_metadata(
     with open(path, "w") as f:
         json.dump(metadata, f, indent=2)
     return os.path.abspath(path)
+
+
+# EncodedImageCache variant under which a file's digest is kept
+_DIGEST = "\0digest"
+
+
+class EncodedImageCache:
+    """Memoized content digests and base64 encodings of local input images.
+
+    Entries are keyed by (path, mtime, size), so an edited file is re-read.
+    Files are mapped with mmap rather than read into a bytes copy. Encodings
+    and digests share one LRU within ``max_bytes``, so digests of files no
+    longer used are evicted along with their encodings.
+    """
+
+    def __init__(self, max_bytes: int = INPUT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Encodings, and digests under the _DIGEST variant, in LRU order
+        self._encoded: OrderedDict[tuple, tuple[str, dict | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, path: str) -> str:
+        """SHA-256 hex digest of the file contents."""
+        key = (*self._key(path), _DIGEST)
+        with self._lock:
+            entry = self._encoded.get(key)
+            if entry is not None:
+                self._encoded.move_to_end(key)
+                return entry[0]
+        digest = self._map(path, lambda data: hashlib.sha256(data).hexdigest())
+        self._store(key, (digest, None))
+        return digest
+
+    def b64(self, path: str) -> str:
+        """Base64 encoding of the file contents."""
+        return self._encode(path, None, lambda data: (None, None))[0]
+
+    def prepared_b64(
+        self,
+        path: str,
+        variant: str,
+        prepare: Callable[[bytes], tuple[bytes | None, dict]],
+    ) -> tuple[str, dict]:
+        """Base64 of the file as rewritten by ``prepare``, with its report.
+
+        ``prepare(data)`` returns replacement bytes, or None to send the file
+        as it is, plus a report dict. Results are memoized per ``variant``.
+        """
+        return self._encode(path, variant, prepare)
+
+    def _encode(self, path: str, variant: str | None, prepare) -> tuple:
+        key = (*self._key(path), variant)
+        with self._lock:
+            entry = self._encoded.get(key)
+            if entry is not None:
+                self._encoded.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        def encode(data) -> tuple[str, dict | None]:
+            replacement, report = prepare(data)
+            source = data if replacement is None else replacement
+            return base64.b64encode(source).decode(), report
+
+        entry = self._map(path, encode)
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key: tuple, entry: tuple[str, dict | None]) -> None:
+        """Add an entry, evicting the least recently used past ``max_bytes``."""
+        if len(entry[0]) > self.max_bytes:
+            return
+        with self._lock:
+            if key not in self._encoded:
+                self._encoded[key] = entry
+                self.size += len(entry[0])
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._encoded.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._encoded),
+            "bytes": self.size,
+        }
+
+    @staticmethod
+    def _key(path: str) -> tuple:
+        st = os.stat(path)
+        return os.path.realpath(path), st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _map(path: str, fn):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return fn(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return fn(data)
@@ -0,0 +1,511 @@
+"""In-process job scheduler for long-running tool calls.
+
+Agents submit work and get a job ID back immediately, then poll for the
+result or cancel. Jobs wait in a priority queue (higher priority first,
+FIFO within a priority) and run on a fixed number of worker tasks.
+
+With a ``JobStore``, every state change is written to SQLite, so queued and
+interrupted jobs are resumed after a restart and finished results are still
+served from the record. Several server processes can share one database:
+each unfinished job is owned by one process, which renews a lease on it
+while it lives. Another process only takes a job over once its owner has
+exited or stopped renewing the lease.
+"""
+
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .config import JOB_DATABASE, JOB_HISTORY, JOB_LEASE, JOB_WORKERS
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = (
+    "id",
+    "tool",
+    "args",
+    "priority",
+    "idempotency_key",
+    "status",
+    "result",
+    "error",
+    "attempts",
+    "created_at",
+    "started_at",
+    "finished_at",
+)
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+
+
+class Job:
+    def __init__(
+        self,
+        tool: str,
+        args: dict,
+        priority: int = 0,
+        idempotency_key: str | None = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.args = args
+        self.priority = priority
+        self.idempotency_key = idempotency_key
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: str | None = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.done = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def describe(self) -> dict[str, Any]:
+        """Status report without the result payload."""
+        info = {
+            "job_id": self.id,
+            "tool": self.tool,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.started_at is not None:
+            end = self.finished_at or time.time()
+            info["elapsed_s"] = round(end - self.started_at, 3)
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class JobStore:
+    """SQLite record of jobs, their arguments, status and results.
+
+    Unfinished jobs saved here are owned by this store's ``owner`` under a
+    lease of ``lease`` seconds, which ``renew`` extends.
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_DATABASE,
+        lease: float = JOB_LEASE,
+        owner: str | None = None,
+    ):
+        self.path = path
+        self.lease = lease
+        self.owner = owner or f"{_boot_id()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                args TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                idempotency_key TEXT,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                lease REAL
+            )"""
+        )
+        # Databases written before jobs had owners
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for name, kind in (("owner", "TEXT"), ("lease", "REAL")):
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_key ON jobs (idempotency_key)"
+        )
+        self._db.commit()
+
+    def save(self, job: Job) -> bool:
+        """Write the job as owned by this store.
+
+        Returns False, without writing, if another live owner holds the job.
+        """
+        now = time.time()
+        lease = None if job.status in FINISHED else now + self.lease
+        row = (
+            job.id,
+            job.tool,
+            json.dumps(job.args),
+            job.priority,
+            job.idempotency_key,
+            job.status,
+            None if job.result is None else json.dumps(job.result),
+            job.error,
+            job.attempts,
+            job.created_at,
+            job.started_at,
+            job.finished_at,
+            self.owner,
+            lease,
+        )
+        columns = (*_COLUMNS, "owner", "lease")
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns[1:])
+        with self._db:
+            cursor = self._db.execute(
+                f"INSERT INTO jobs ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT (id) DO UPDATE SET {updates} "
+                "WHERE jobs.owner IS NULL OR jobs.owner = excluded.owner "
+                "OR jobs.lease < ?",
+                (*row, now),
+            )
+        return cursor.rowcount > 0
+
+    def load(self, job_id: str) -> Job | None:
+        return self._one(f"{_SELECT} WHERE id = ?", (job_id,))
+
+    def find(self, idempotency_key: str) -> Job | None:
+        """Latest job with this key that hasn't failed or been cancelled."""
+        return self._one(
+            f"{_SELECT} WHERE idempotency_key = ? AND status IN (?, ?, ?) "
+            "ORDER BY created_at DESC LIMIT 1",
+            (idempotency_key, QUEUED, RUNNING, SUCCEEDED),
+        )
+
+    def unfinished(self) -> list[Job]:
+        """Queued and running jobs nobody holds: their owner has released
+        them, exited, or let the lease lapse."""
+        now = time.time()
+        cursor = self._db.execute(
+            f"SELECT {', '.join(_COLUMNS)}, owner, lease FROM jobs "
+            "WHERE status IN (?, ?) "
+            "ORDER BY created_at",
+            (QUEUED, RUNNING),
+        )
+        return [
+            _from_row(row[:-2])
+            for row in cursor.fetchall()
+            if _orphaned(*row[-2:], now)
+        ]
+
+    def claim(self, job_id: str) -> bool:
+        """Take over an unfinished job nobody holds; False if another owner
+        holds it (or just claimed it first)."""
+        row = self._db.execute(
+            "SELECT owner, lease FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        now = time.time()
+        if row is None or not _orphaned(*row, now):
+            return False
+        # Only succeeds if the row still has the owner that was seen as gone
+        with self._db:
+            cursor = self._db.execute(
+                "UPDATE jobs SET owner = ?, lease = ? WHERE id = ? "
+                "AND status IN (?, ?) AND (owner IS NULL OR owner = ? "
+                "OR lease < ?)",
+                (self.owner, now + self.lease, job_id, QUEUED, RUNNING, row[0], now),
+            )
+        return cursor.rowcount > 0
+
+    def renew(self) -> None:
+        """Extend the lease on every unfinished job this store owns."""
+        with self._db:
+            self._db.execute(
+                "UPDATE jobs SET lease = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time() + self.lease, self.owner, QUEUED, RUNNING),
+            )
+
+    def release(self) -> None:
+        """Give up this store's unfinished jobs so the next process resumes
+        them straight away."""
+        with self._db:
+            self._db.execute(
+                "UPDATE jobs SET owner = NULL, lease = NULL "
+                "WHERE owner = ? AND status IN (?, ?)",
+                (self.owner, QUEUED, RUNNING),
+            )
+
+    def prune(self, keep: int) -> None:
+        """Delete all but the ``keep`` most recently finished jobs."""
+        with self._db:
+            self._db.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs "
+                "WHERE status IN (?, ?, ?) ORDER BY finished_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (*FINISHED, keep),
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _one(self, query: str, params: tuple) -> Job | None:
+        row = self._db.execute(query, params).fetchone()
+        return _from_row(row) if row else None
+
+
+@functools.cache
+def _boot_id() -> str:
+    """Identifies this boot of this machine, so owners that share it can be
+    checked for a live process."""
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return "host-" + socket.gethostname()
+
+
+def _orphaned(owner: str | None, lease: float | None, now: float) -> bool:
+    """Whether a job's owner is gone or its lease has expired."""
+    if owner is None or lease is None or lease < now:
+        return True
+    boot, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if boot != _boot_id() or boot.startswith("host-") or not pid.isdigit():
+        # Another machine or boot, or no /proc to check: wait for the lease
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # exists, but belongs to another user
+    return False
+
+
+def _from_row(row: tuple) -> Job:
+    values = dict(zip(_COLUMNS, row))
+    job = Job(
+        values["tool"],
+        json.loads(values["args"]),
+        values["priority"],
+        values["idempotency_key"],
+    )
+    job.id = values["id"]
+    job.status = values["status"]
+    job.result = json.loads(values["result"]) if values["result"] else None
+    job.error = values["error"]
+    job.attempts = values["attempts"]
+    job.created_at = values["created_at"]
+    job.started_at = values["started_at"]
+    job.finished_at = values["finished_at"]
+    if job.status in FINISHED:
+        job.done.set()
+    return job
+
+
+class JobScheduler:
+    """Priority queue of jobs drained by ``workers`` concurrent worker tasks.
+
+    ``runner(tool, args)`` performs a job. Workers start on the first submit
+    or resume, inside the running event loop. The most recent ``history``
+    finished jobs are kept for status/result lookups.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str, dict], Awaitable[Any]],
+        workers: int = JOB_WORKERS,
+        history: int = JOB_HISTORY,
+        store: JobStore | None = None,
+    ):
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.history = history
+        self.store = store
+        self._jobs: dict[str, Job] = {}
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._queue: asyncio.PriorityQueue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._heartbeat: asyncio.Task | None = None
+        self._seq = itertools.count()
+
+    def submit(
+        self,
+        tool: str,
+        args: dict,
+        priority: int = 0,
+        idempotency_key: str | None = None,
+    ) -> Job:
+        """Queue a call to ``tool`` and return its job without waiting for it.
+
+        A submit whose ``idempotency_key`` matches a queued, running or
+        succeeded job returns that job instead of running the call again.
+        """
+        if idempotency_key is not None:
+            existing = self._find(idempotency_key)
+            if existing is not None:
+                return existing
+        job = Job(tool, args, priority, idempotency_key)
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    def resume(self) -> list[Job]:
+        """Re-queue jobs the store recorded as queued or interrupted whose
+        owner is gone or whose lease has expired.
+
+        Each job is claimed atomically, so when several processes resume at
+        once only one of them runs it. Called again on every lease renewal,
+        so jobs of a process that dies later are taken over too.
+        """
+        if self.store is None:
+            return []
+        jobs = [
+            job
+            for job in self.store.unfinished()
+            if job.id not in self._jobs and self.store.claim(job.id)
+        ]
+        for job in jobs:
+            job.status = QUEUED
+            self._save(job)
+            self._enqueue(job)
+        return jobs
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: '{job_id}'")
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Job:
+        """Wait up to ``timeout`` seconds for the job to finish."""
+        job = self.get(job_id)
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except TimeoutError:
+                pass
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        job = self.get(job_id)
+        if job.id not in self._jobs and job.status not in FINISHED:
+            raise ValueError(f"Job '{job_id}' belongs to another server process")
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        elif job.status == RUNNING and job._task is not None:
+            job._task.cancel()
+        return job
+
+    def stats(self) -> dict[str, Any]:
+        counts = dict.fromkeys((QUEUED, RUNNING, *FINISHED), 0)
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "persistent": self.store is not None, **counts}
+
+    async def close(self) -> None:
+        """Stop the workers. Running jobs stay recorded as running and are
+        released, so a persistent scheduler resumes them on the next start."""
+        tasks = [*self._workers, *filter(None, [self._heartbeat])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._queue = None
+        if self.store is not None:
+            self.store.release()
+
+    def _find(self, idempotency_key: str) -> Job | None:
+        for job in self._jobs.values():
+            if job.idempotency_key == idempotency_key and job.status in (
+                QUEUED,
+                RUNNING,
+                SUCCEEDED,
+            ):
+                return job
+        return self.store.find(idempotency_key) if self.store is not None else None
+
+    def _enqueue(self, job: Job) -> None:
+        self._start()
+        self._jobs[job.id] = job
+        self._queue.put_nowait((-job.priority, next(self._seq), job.id))
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        if self.store is not None:
+            self._heartbeat = asyncio.create_task(self._renew(), name="job-lease")
+
+    async def _renew(self) -> None:
+        """Keep this process's leases alive and adopt orphaned jobs."""
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            try:
+                self.store.renew()
+                self.resume()
+            except sqlite3.Error as e:
+                logger.warning("Could not renew job leases: %s", e)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == QUEUED:
+                await self._execute(job)
+            self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.attempts += 1
+        self._save(job)
+        job._task = asyncio.create_task(self.runner(job.tool, job.args))
+        try:
+            job.result = await job._task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise  # the worker itself is being shut down
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = f"{e}"
+            self._finish(job, FAILED)
+        else:
+            self._finish(job, SUCCEEDED)
+        finally:
+            job._task = None
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        job.done.set()
+        self._save(job)
+        self._finished[job.id] = None
+        while len(self._finished) > self.history:
+            old, _ = self._finished.popitem(last=False)
+            self._jobs.pop(old, None)
+        if self.store is not None:
+            self.store.prune(self.history)
+
+    def _save(self, job: Job) -> None:
+        if self.store is not None:
+            self.store.save(job)
@@ -0,0 +1,249 @@
+"""Per-model admission control: token bucket + max in-flight with AIMD backoff."""
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
+
+from .config import MODEL_LIMITS, MODEL_MAX_IN_FLIGHT, MODEL_RATE_LIMIT, MODELS
+
+# Floor for the adaptive rate so a throttled model keeps trickling requests
+MIN_RATE = 0.05
+
+
+class ModelLimiter:
+    """Admission control for a single Bedrock model ID.
+
+    A request must hold one of ``limit`` in-flight slots and, when ``rate`` is
+    positive, consume one token from a bucket refilled at ``rate`` per second.
+    Throttles halve both the slot limit and the rate (multiplicative decrease);
+    successes grow them back towards the configured maximums (additive increase).
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        rate: float = MODEL_RATE_LIMIT,
+        max_in_flight: int = MODEL_MAX_IN_FLIGHT,
+        clock=time.monotonic,
+    ):
+        self.model_id = model_id
+        self.max_rate = rate
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate = rate
+        self.limit = float(self.max_in_flight)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._tokens = float(self.max_in_flight)
+        self._updated = clock()
+        # Event-loop callers of aacquire waiting for a slot
+        self._wakeups: list[asyncio.Future] = []
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.throttles = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def acquire(self, timeout: float | None = None) -> Iterator[float]:
+        """Block until the request may proceed; yields seconds spent queued.
+
+        Raises TimeoutError if admission takes longer than ``timeout``.
+        """
+        start = self._clock()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    delay = self._admission_delay()
+                    if delay == 0:
+                        break
+                    if deadline is not None:
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                f"Timed out waiting for capacity on {self.model_id}"
+                            )
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self.waiting -= 1
+            waited = self._admit(start)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aacquire(self, timeout: float | None = None) -> AsyncIterator[float]:
+        """``acquire`` for event-loop callers: waits on the loop instead of
+        blocking a thread."""
+        waited = await self.aadmit(timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    async def aadmit(self, timeout: float | None = None) -> float:
+        """Wait on the event loop for a slot and take it, returning the seconds
+        waited. The caller must ``release`` the slot once its request is done,
+        which lets it outlive the awaiting task."""
+        loop = asyncio.get_running_loop()
+        start = self._clock()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    delay = self._admission_delay()
+                    if delay == 0:
+                        waited = self._admit(start)
+                        break
+                    if deadline is not None:
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                f"Timed out waiting for capacity on {self.model_id}"
+                            )
+                        delay = remaining if delay is None else min(delay, remaining)
+                    wakeup = loop.create_future()
+                    self._wakeups.append(wakeup)
+                try:
+                    await asyncio.wait_for(wakeup, delay)
+                except TimeoutError:
+                    pass
+                finally:
+                    with self._cond:
+                        if wakeup in self._wakeups:
+                            self._wakeups.remove(wakeup)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+        return waited
+
+    def on_success(self) -> None:
+        """Additively grow the slot limit and rate after a successful call."""
+        with self._cond:
+            self.limit = min(float(self.max_in_flight), self.limit + 1 / self.limit)
+            if self.max_rate > 0:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+            self._notify()
+
+    def on_throttle(self) -> None:
+        """Halve the slot limit and rate after a throttling response."""
+        with self._cond:
+            self.throttles += 1
+            self.limit = max(1.0, self.limit / 2)
+            if self.max_rate > 0:
+                self.rate = max(min(MIN_RATE, self.max_rate), self.rate / 2)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "limit": int(self.limit),
+                "rate": round(self.rate, 3),
+                "admitted": self.admitted,
+                "throttles": self.throttles,
+                "avg_wait_s": round(self.total_wait / self.admitted, 4)
+                if self.admitted
+                else 0.0,
+                "max_wait_s": round(self.max_wait, 4),
+            }
+
+    def _admit(self, start: float) -> float:
+        """Take a slot (and token); returns seconds spent queued. Call with
+        ``_cond`` held."""
+        if self.max_rate > 0:
+            self._tokens -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        waited = self._clock() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self) -> None:
+        """Give back a slot taken by ``aadmit``."""
+        with self._cond:
+            self.in_flight -= 1
+            self._notify()
+
+    def _notify(self) -> None:
+        """Wake waiting threads and event-loop callers. Call with ``_cond``
+        held."""
+        self._cond.notify_all()
+        for wakeup in self._wakeups:
+            wakeup.get_loop().call_soon_threadsafe(_resolve, wakeup)
+        self._wakeups.clear()
+
+    def _admission_delay(self) -> float | None:
+        """Seconds until a request could be admitted: 0 now, None if slot-bound."""
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.max_rate <= 0:
+            return 0
+        now = self._clock()
+        capacity = float(self.max_in_flight)
+        self._tokens = min(capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+def _resolve(wakeup: asyncio.Future) -> None:
+    if not wakeup.done():
+        wakeup.set_result(None)
+
+
+class RateLimiter:
+    """Registry of ModelLimiters keyed by Bedrock model ID.
+
+    Limiters are pre-built for every entry in ``config.MODELS`` using the
+    global defaults plus any per-key override from ``BEDROCK_MODEL_LIMITS``.
+    Unknown model IDs get a limiter with the defaults on first use.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = None,
+        max_in_flight: int | None = None,
+        overrides: dict[str, dict] | None = None,
+    ):
+        self.rate = MODEL_RATE_LIMIT if rate is None else rate
+        self.max_in_flight = max_in_flight or MODEL_MAX_IN_FLIGHT
+        overrides = MODEL_LIMITS if overrides is None else overrides
+        self.overrides = overrides
+        self._lock = threading.Lock()
+        self._limiters: dict[str, ModelLimiter] = {}
+        for key, model_id in MODELS.items():
+            limits = overrides.get(key, {})
+            self._limiters[model_id] = ModelLimiter(
+                model_id,
+                rate=limits.get("rate", self.rate),
+                max_in_flight=limits.get("max_in_flight", self.max_in_flight),
+            )
+
+    def get(self, model_id: str) -> ModelLimiter:
+        with self._lock:
+            limiter = self._limiters.get(model_id)
+            if limiter is None:
+                limiter = ModelLimiter(
+                    model_id, rate=self.rate, max_in_flight=self.max_in_flight
+                )
+                self._limiters[model_id] = limiter
+            return limiter
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-model queue depth, in-flight count, adaptive limits and wait times."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {lim.model_id: lim.stats() for lim in limiters}
@@ -0,0 +1,227 @@
+"""Process-wide latency histograms and counters for Bedrock calls.
+
+Every Bedrock invocation records, per model ID:
+
+- ``stage_seconds`` histograms for each stage of the call: ``input_encode``
+  (base64 of input files), ``serialize`` (JSON body), ``queue_wait`` (rate
+  limiter admission), ``network`` (until the response headers arrive),
+  ``parse`` (reading the body, which includes ``decode`` and ``write`` of
+  the streamed images), ``encode`` (local transcode) and ``metadata_write``
+- ``request_bytes`` / ``response_bytes`` histograms
+- ``requests``, ``errors`` (by error code), ``throttles`` and ``retries``
+  counters
+
+``snapshot()`` groups them by model for the ``server_stats`` tool and
+``prometheus()`` renders them in the Prometheus text format, together with
+gauges from registered collectors (cache hits, queue depths, jobs).
+"""
+
+import bisect
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+PREFIX = "bedrock_image_"
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+# 1 KiB to 64 MiB in powers of 4
+BYTES_BUCKETS = tuple(1024 * 4**i for i in range(9))
+
+# A collector returns (name, labels, value) gauges read at scrape time
+Collector = Callable[[], Iterable[tuple[str, dict[str, str], float]]]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets: tuple[float, ...] = SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters and histograms."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self._collectors: list[Collector] = []
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                buckets = BYTES_BUCKETS if name.endswith("_bytes") else SECONDS_BUCKETS
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def stage(self, model: str, stage: str, seconds: float) -> None:
+        self.observe("stage_seconds", seconds, model=model, stage=stage)
+
+    @contextmanager
+    def timer(self, model: str, stage: str) -> Iterator[None]:
+        """Record the time spent in the block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(model, stage, time.perf_counter() - start)
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Metrics grouped by model: counters as numbers, histograms as
+        count/sum/mean/p50/p95/max. Other label values are appended to the
+        name, e.g. ``stage_seconds.network`` or ``errors.ThrottlingException``.
+        """
+        with self._lock:
+            items = [*self._counters.items()]
+            items += [(key, h.summary()) for key, h in self._histograms.items()]
+        models: dict[str, dict[str, Any]] = {}
+        for (name, labels), value in sorted(items, key=lambda item: item[0]):
+            labels = dict(labels)
+            model = labels.pop("model", "")
+            models.setdefault(model, {})[".".join([name, *labels.values()])] = value
+        return models
+
+    def prometheus(self) -> str:
+        """All metrics and collector gauges in the Prometheus text format."""
+        lines: list[str] = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, h.buckets, list(h.counts), h.count, h.sum)
+                for key, h in self._histograms.items()
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+        for (name, labels), buckets, counts, count, total in histograms:
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip((*buckets, math.inf), counts):
+                cumulative += n
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{metric}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        gauges = [gauge for collector in self._collectors for gauge in collector()]
+        for name, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_labels(tuple(labels.items()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+METRICS = Metrics()
+
+
+def serve_metrics(host: str, port: int, metrics: Metrics = METRICS):
+    """Serve ``GET /metrics`` from a daemon thread; returns the HTTP server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # no access log for every scrape
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics", daemon=True).start()
+    return httpd
@@ -0,0 +1,283 @@
+"""Pre-flight checks and shrinking of input images before they are uploaded.
+
+Each Stability model accepts inputs within pixel-count, side-length and
+aspect-ratio limits, in PNG, JPEG or WebP. ``prepare_image`` checks an input
+against its model's limits and rejects it locally when no resize can fix it
+(too small, too elongated, not an image). Otherwise it rewrites the image
+only when that is needed or pays off:
+
+- oversized images are scaled down to fit, after applying EXIF rotation
+- CMYK and palette images are converted to RGB(A), 16-bit grayscale is
+  scaled down to 8-bit
+- EXIF, XMP, ICC and text metadata are dropped
+- large lossless files are re-encoded as lossless WebP if that is smaller
+
+JPEG and WebP sources are re-encoded at high quality in their own format,
+anything else as lossless WebP. When metadata is the only problem, its
+segments are cut out of the file instead, leaving the pixels untouched.
+The report lists the original and uploaded size and what was changed.
+"""
+
+import io
+import math
+from typing import TYPE_CHECKING, Any
+
+from .config import PREFLIGHT_REENCODE_BYTES
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+ACCEPTED_FORMATS = ("png", "jpeg", "webp")
+ACCEPTED_MODES = ("RGB", "RGBA", "L", "LA")
+# Info keys that carry metadata rather than pixels
+METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "icc_profile", "comment")
+LOSSY_FORMATS = ("jpeg", "webp")
+LOSSY_QUALITY = 95
+_ORIENTATION = 0x0112
+
+
+class InputLimits:
+    """Size limits a model places on an input image."""
+
+    def __init__(
+        self,
+        min_side: int = 64,
+        max_side: int | None = None,
+        min_pixels: int = 0,
+        max_pixels: int = 9_437_184,
+        max_aspect: float = 2.5,
+    ):
+        self.min_side = min_side
+        self.max_side = max_side
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+        self.max_aspect = max_aspect
+
+    def check(self, width: int, height: int) -> None:
+        """Raise ValueError for sizes that downscaling cannot fix."""
+        if min(width, height) < self.min_side or width * height < self.min_pixels:
+            raise ValueError(
+                f"Image is too small: {width}x{height}. Each side must be at "
+                f"least {self.min_side}px and the image at least "
+                f"{self.min_pixels} pixels."
+            )
+        if max(width, height) / min(width, height) > self.max_aspect:
+            raise ValueError(
+                f"Unsupported aspect ratio: {width}x{height}. Must be between "
+                f"1:{self.max_aspect} and {self.max_aspect}:1."
+            )
+
+    def fit(self, width: int, height: int) -> tuple[int, int]:
+        """Largest size with the same aspect ratio that is within the limits."""
+        scale = min(1.0, math.sqrt(self.max_pixels / (width * height)))
+        if self.max_side:
+            scale = min(scale, self.max_side / max(width, height))
+        if scale >= 1:
+            return width, height
+        return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+# Published Bedrock input limits per MODELS key; edits share the default
+LIMITS = {
+    "upscale_fast": InputLimits(
+        min_side=32, max_side=1536, min_pixels=1024, max_pixels=1_048_576
+    ),
+    "upscale_creative": InputLimits(min_pixels=4096, max_pixels=1_048_576),
+}
+DEFAULT_LIMITS = InputLimits()
+
+
+def prepare_image(
+    data: bytes, limits: InputLimits = DEFAULT_LIMITS
+) -> tuple[bytes | None, dict[str, Any]]:
+    """Check and shrink one input image.
+
+    Returns the bytes to upload, or None when the original can be sent
+    unchanged, and a report: ``bytes`` (original), ``sent_bytes``,
+    ``saved_bytes`` and ``changes``. Raises ValueError for invalid input.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        img = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Not a usable input image: {e}") from e
+    source_format = (img.format or "").lower()
+    orientation = img.getexif().get(_ORIENTATION, 1)
+    # EXIF orientations 5-8 turn the image by 90 degrees once applied
+    turned = orientation in (5, 6, 7, 8)
+    width, height = img.size[::-1] if turned else img.size
+    limits.check(width, height)
+
+    changes = []
+    target = limits.fit(width, height)
+    # PNG text chunks show up in info as str values
+    metadata = any(key in img.info for key in METADATA_KEYS) or any(
+        isinstance(value, str) for value in img.info.values()
+    )
+    lossless = source_format not in LOSSY_FORMATS
+    rewrite = (
+        source_format not in ACCEPTED_FORMATS
+        or img.mode not in ACCEPTED_MODES
+        or target != (width, height)
+    )
+    # Without other changes, metadata is cut out of the file losslessly; a
+    # rotation still has to be applied to the pixels
+    stripped = None
+    if metadata and not rewrite and orientation == 1:
+        stripped = _strip_metadata(data, source_format)
+    rewrite = rewrite or (metadata and stripped is None)
+    unchanged = data if stripped is None else stripped
+    if not rewrite and not (lossless and len(unchanged) >= PREFLIGHT_REENCODE_BYTES):
+        return _unchanged(data, stripped)
+
+    try:
+        if source_format == "jpeg" and target != (width, height):
+            # Decode at a reduced DCT scale, no smaller than the target
+            img.draft("RGB", target[::-1] if turned else target)
+        img.load()
+        img = ImageOps.exif_transpose(img)
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Not a usable input image: {e}") from e
+    if img.mode not in ACCEPTED_MODES:
+        source_mode = img.mode
+        img = to_8bit(img)
+        if img.mode not in ACCEPTED_MODES:
+            has_alpha = "A" in img.getbands() or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        changes.append(f"converted {source_mode} to {img.mode}")
+    if target != (width, height):
+        changes.append(f"resized {width}x{height} to {target[0]}x{target[1]}")
+    if img.size != target:
+        img = img.resize(target, Image.Resampling.LANCZOS)
+    if metadata:
+        changes.append("stripped metadata")
+
+    out = io.BytesIO()
+    if source_format == "jpeg":
+        sent_format = "jpeg"
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(out, "JPEG", quality=LOSSY_QUALITY)
+    elif source_format == "webp":
+        sent_format = "webp"
+        img.save(out, "WEBP", quality=LOSSY_QUALITY, method=4)
+    else:
+        # For lossless WebP, quality is encoder effort; 0 is about as fast
+        # as PNG and usually smaller
+        sent_format = "webp"
+        img.save(out, "WEBP", lossless=True, quality=0, method=1)
+    encoded = out.getvalue()
+    if not rewrite and len(encoded) >= len(unchanged):
+        return _unchanged(data, stripped)
+    if sent_format != source_format:
+        changes.append(f"re-encoded {source_format or 'image'} as {sent_format}")
+    return encoded, _report(len(data), len(encoded), changes)
+
+
+def to_8bit(img: "Image.Image") -> "Image.Image":
+    """Scale 16-bit grayscale ("I;16*", or "I" holding values above 255) to
+    8-bit "L"; other images are returned as they are.
+
+    ``convert`` alone clips every value above 255, turning such images white.
+    """
+    if img.mode == "I" and img.getextrema()[1] <= 255:
+        return img.convert("L")
+    if img.mode == "I" or img.mode.startswith("I;16"):
+        return img.convert("I").point(lambda v: v / 256).convert("L")
+    return img
+
+
+def _unchanged(
+    data: bytes, stripped: bytes | None
+) -> tuple[bytes | None, dict[str, Any]]:
+    """Result for an input whose pixels are sent as they are."""
+    if stripped is None:
+        return None, _report(len(data), len(data), [])
+    return stripped, _report(len(data), len(stripped), ["stripped metadata"])
+
+
+def _strip_metadata(data: bytes, source_format: str) -> bytes | None:
+    """``data`` without its metadata segments, or None if the format is not
+    handled or the file cannot be walked."""
+    strip = {"jpeg": _strip_jpeg, "png": _strip_png, "webp": _strip_webp}.get(
+        source_format
+    )
+    try:
+        return strip(data) if strip else None
+    except IndexError:
+        return None
+
+
+def _strip_jpeg(data: bytes) -> bytes | None:
+    # Drop APP1-APP13 (EXIF, XMP, ICC, Photoshop), APP15 and comments; JFIF
+    # (APP0) and Adobe (APP14, which sets the color transform) stay
+    kept = [data[:2]]
+    pos = 2
+    while pos < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:
+            # Entropy-coded data escapes 0xFF, so the first EOI ends the
+            # image; anything after it (such as MPF previews) is dropped
+            end = data.find(b"\xff\xd9", pos)
+            if end < 0:
+                return None
+            kept.append(data[pos : end + 2])
+            return b"".join(kept)
+        end = pos + 2 + int.from_bytes(data[pos + 2 : pos + 4], "big")
+        if end > len(data):
+            return None
+        if not (0xE1 <= marker <= 0xED or marker in (0xEF, 0xFE)):
+            kept.append(data[pos:end])
+        pos = end
+    return None
+
+
+def _strip_png(data: bytes) -> bytes | None:
+    kept = [data[:8]]
+    pos = 8
+    while pos + 12 <= len(data):
+        end = pos + 12 + int.from_bytes(data[pos : pos + 4], "big")
+        kind = data[pos + 4 : pos + 8]
+        if end > len(data):
+            return None
+        if kind not in (b"tEXt", b"zTXt", b"iTXt", b"iCCP", b"eXIf"):
+            kept.append(data[pos:end])
+        if kind == b"IEND":
+            return b"".join(kept)
+        pos = end
+    return None
+
+
+def _strip_webp(data: bytes) -> bytes | None:
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        size = int.from_bytes(data[pos + 4 : pos + 8], "little")
+        end = pos + 8 + size + size % 2
+        kind = data[pos : pos + 4]
+        if end > len(data):
+            return None
+        if kind == b"VP8X":
+            # Clear the ICC, EXIF and XMP flags along with their chunks
+            chunks.append(data[pos : pos + 8] + bytes([data[pos + 8] & ~0x2C]))
+            chunks.append(data[pos + 9 : end])
+        elif kind not in (b"ICCP", b"EXIF", b"XMP "):
+            chunks.append(data[pos:end])
+        pos = end
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + len(body).to_bytes(4, "little") + body
+
+
+def _report(original: int, sent: int, changes: list[str]) -> dict[str, Any]:
+    return {
+        "bytes": original,
+        "sent_bytes": sent,
+        "saved_bytes": original - sent,
+        "changes": changes,
+    }
@@ -0,0 +1,264 @@
+"""Bedrock client that spreads calls over several regions.
+
+Each region gets its own ``BedrockImageClient`` with its own connection pool
+and per-model rate limiter, since Bedrock quotas are per region. Every
+attempt goes to the region that is not cooling down, has free slots under
+its limiter, and has the lowest recent latency for the model. A throttled or
+failed attempt is re-sent to the next region straight away; backoff only
+starts once every region has been tried.
+"""
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .bedrock_client import BedrockImageClient
+from .config import REGION_COOLDOWN, REGION_ENDPOINTS, REGIONS
+from .limiter import RateLimiter
+from .metrics import METRICS
+from .response_stream import ImageSink
+from .retry import RetryPolicy, is_retryable_error, is_throttling_error
+
+# Weight of the newest sample in the per-model latency average
+EWMA_ALPHA = 0.3
+
+
+class Region:
+    """One region's client plus the routing state kept for it."""
+
+    def __init__(self, name: str, client: BedrockImageClient):
+        self.name = name
+        self.client = client
+        self.latency: dict[str, float] = {}
+        self.cooling_until = 0.0
+        self.requests = 0
+        self.successes = 0
+        self.throttles = 0
+        self.errors = 0
+        self.failovers = 0
+
+    def headroom(self, model_id: str) -> int:
+        """Free in-flight slots for the model, net of queued callers."""
+        limiter = self.client.limiter.get(model_id)
+        return int(limiter.limit) - limiter.in_flight - limiter.waiting
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "throttles": self.throttles,
+            "errors": self.errors,
+            "failovers": self.failovers,
+            "cooling_s": round(max(self.cooling_until - time.monotonic(), 0), 3),
+            "latency_ewma_s": {m: round(v, 4) for m, v in self.latency.items()},
+            "limits": self.client.limiter.stats(),
+        }
+
+
+class MultiRegionClient(BedrockImageClient):
+    """Drop-in ``BedrockImageClient`` routing each call across ``regions``.
+
+    Coalescing and metrics work as in the base client; async requests run on
+    the thread pool of their region's client. The region clients make single
+    attempts; retries, failover and the call
+    deadline are handled here with ``retry_policy``. ``max_workers`` and the
+    settings of ``limiter`` apply to each region client. Pass ``clients`` to
+    supply the per-region clients directly, e.g. pointed at local endpoints.
+    """
+
+    def __init__(
+        self,
+        regions: list[str] | None = None,
+        endpoints: dict[str, str] | None = None,
+        clients: dict[str, BedrockImageClient] | None = None,
+        cooldown: float = REGION_COOLDOWN,
+        **options,
+    ):
+        self._regions = list(clients or regions or REGIONS)
+        self._endpoints = REGION_ENDPOINTS if endpoints is None else endpoints
+        self._clients = clients
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        super().__init__(**options)
+        self.region = self._regions[0]
+
+    def _connect(self, boto3_client, bearer_token, endpoint, session) -> None:
+        clients = self._clients or {
+            name: BedrockImageClient(
+                auth_mode=self.auth_mode,
+                bearer_token=bearer_token,
+                endpoint=self._endpoints.get(name),
+                region=name,
+                max_workers=self._max_workers,
+                pool_size=self.pool_size,
+                connect_timeout=self.timeout[0],
+                read_timeout=self.timeout[1],
+                # Same limits, tracked separately since quotas are per region
+                limiter=RateLimiter(
+                    rate=self.limiter.rate,
+                    max_in_flight=self.limiter.max_in_flight,
+                    overrides=self.limiter.overrides,
+                ),
+                retry_policy=RetryPolicy(max_attempts=1),
+                coalesce=False,
+            )
+            for name in self._regions
+        }
+        self.regions = [Region(name, clients[name]) for name in self._regions]
+        # Admission is per region; the base client's limiter isn't used
+        self.limiter = None
+
+    def _invoke(
+        self,
+        model_id: str,
+        payload: bytes,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempts = 0
+        rounds = 0
+        tried: set[str] = set()
+        while True:
+            region = self._route(model_id, tried)
+            attempts += 1
+            start = time.monotonic()
+            try:
+                result = region.client._attempt(model_id, payload, deadline, open_sink)
+            except Exception as e:
+                delay = self._after_error(model_id, region, e, tried, rounds, deadline)
+                if delay is None:
+                    raise
+                if not tried:
+                    rounds += 1
+                    time.sleep(delay)
+                continue
+            return self._answer(region, model_id, result, attempts, start)
+
+    async def _ainvoke(
+        self,
+        model_id: str,
+        payload: bytes,
+        open_sink: Callable[[int], ImageSink] | None,
+    ) -> dict[str, Any]:
+        """_invoke with admission and the backoff between rounds on the
+        event loop."""
+        deadline = time.monotonic() + self.retry_policy.deadline
+        attempts = 0
+        rounds = 0
+        tried: set[str] = set()
+        while True:
+            region = self._route(model_id, tried)
+            attempts += 1
+            start = time.monotonic()
+            try:
+                result = await region.client._aattempt(
+                    model_id, payload, deadline, open_sink
+                )
+            except Exception as e:
+                delay = self._after_error(model_id, region, e, tried, rounds, deadline)
+                if delay is None:
+                    raise
+                if not tried:
+                    rounds += 1
+                    await asyncio.sleep(delay)
+                continue
+            return self._answer(region, model_id, result, attempts, start)
+
+    def _after_error(
+        self,
+        model_id: str,
+        region: Region,
+        error: Exception,
+        tried: set[str],
+        rounds: int,
+        deadline: float,
+    ) -> float | None:
+        """Record a failed attempt and decide what comes next.
+
+        Adds the region to ``tried``. A retryable error with regions left to
+        try returns 0 to fail over at once. Otherwise ``tried`` is cleared
+        and the backoff before the next round is returned, or None to give
+        up.
+        """
+        self._on_error(region, error)
+        tried.add(region.name)
+        retryable = is_retryable_error(error) and time.monotonic() < deadline
+        if retryable and len(tried) < len(self.regions):
+            with self._lock:
+                region.failovers += 1
+            METRICS.inc("failovers", model=model_id, region=region.name)
+            return 0.0
+        delay = self._retry_delay(model_id, error, rounds + 1, deadline)
+        if delay is not None:
+            tried.clear()
+        return delay
+
+    def _answer(
+        self,
+        region: Region,
+        model_id: str,
+        result: dict[str, Any],
+        attempts: int,
+        start: float,
+    ) -> dict[str, Any]:
+        self._on_success(region, model_id, time.monotonic() - start)
+        result["retries"] = attempts - 1
+        result["region"] = region.name
+        return result
+
+    def _route(self, model_id: str, exclude: set[str]) -> Region:
+        """Best region not in ``exclude``: not cooling down, with headroom,
+        then fastest; regions without a latency sample yet go first."""
+        now = time.monotonic()
+        candidates = [r for r in self.regions if r.name not in exclude]
+        with self._lock:
+            region = min(
+                candidates,
+                key=lambda r: (
+                    r.cooling_until > now,
+                    r.headroom(model_id) <= 0,
+                    r.latency.get(model_id, 0.0),
+                ),
+            )
+            region.requests += 1
+        return region
+
+    def _on_success(self, region: Region, model_id: str, seconds: float) -> None:
+        with self._lock:
+            region.successes += 1
+            previous = region.latency.get(model_id)
+            region.latency[model_id] = (
+                seconds
+                if previous is None
+                else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+            )
+
+    def _on_error(self, region: Region, error: Exception) -> None:
+        with self._lock:
+            if is_throttling_error(error):
+                region.throttles += 1
+            else:
+                region.errors += 1
+            if is_retryable_error(error):
+                region.cooling_until = time.monotonic() + self.cooldown
+
+    def region_stats(self) -> dict[str, dict[str, Any]]:
+        """Routing counters, cooldown, latency averages and limits per region."""
+        with self._lock:
+            return {region.name: region.stats() for region in self.regions}
+
+    def pool_stats(self) -> dict[str, Any]:
+        pools = []
+        for region in self.regions:
+            for pool in region.client.pool_stats()["pools"]:
+                pools.append({"region": region.name, **pool})
+        return {"auth_mode": self.auth_mode, "pools": pools}
+
+    def close(self) -> None:
+        for region in self.regions:
+            region.client.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,188 @@
+"""Incremental parser for Bedrock image responses.
+
+Bedrock returns ``{"images": ["<base64>", ...], "seeds": [...], ...}``. Loading
+that with ``json.loads`` keeps the raw bytes, the decoded text and every
+base64 string in memory at once. ``parse_image_response`` instead reads the
+body in fixed-size chunks and hands each ``images[*]`` string to a sink as it
+arrives. Only the small fields such as ``seeds`` and ``finish_reasons`` are
+materialized.
+"""
+
+import json
+import re
+from collections.abc import Callable
+from typing import Any, Protocol
+
+READ_CHUNK_BYTES = 1 << 16
+
+_WHITESPACE = b" \t\r\n"
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_SCALAR_END = re.compile(rb"[\s,\]}]")
+_ESCAPES = {
+    b'"': b'"',
+    b"\\": b"\\",
+    b"/": b"/",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+}
+
+
+class ImageSink(Protocol):
+    def write(self, chunk: bytes) -> None: ...
+
+    def close(self) -> Any: ...
+
+    def abort(self) -> None: ...
+
+
+class _Reader:
+    """Chunked byte reader with single-byte lookahead."""
+
+    def __init__(self, stream, chunk_size: int):
+        self._read = stream.read
+        self._chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        data = self._read(self._chunk_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> bytes:
+        """Next non-whitespace byte without consuming it."""
+        while True:
+            while self.pos < len(self.buf):
+                byte = self.buf[self.pos : self.pos + 1]
+                if byte not in _WHITESPACE:
+                    return byte
+                self.pos += 1
+            if not self.fill():
+                raise ValueError("Unexpected end of Bedrock response")
+
+    def expect(self, byte: bytes) -> None:
+        if self.peek() != byte:
+            raise ValueError(f"Malformed Bedrock response: expected {byte!r}")
+        self.pos += 1
+
+
+def _read_string(reader: _Reader, emit: Callable[[bytes], None]) -> None:
+    """Stream the JSON string at the cursor to ``emit`` with escapes resolved."""
+    reader.expect(b'"')
+    while True:
+        match = _STRING_SPECIAL.search(reader.buf, reader.pos)
+        if match is None:
+            if reader.pos < len(reader.buf):
+                emit(reader.buf[reader.pos :])
+            reader.pos = len(reader.buf)
+            if not reader.fill():
+                raise ValueError("Unterminated string in Bedrock response")
+            continue
+        if match.start() > reader.pos:
+            emit(reader.buf[reader.pos : match.start()])
+        reader.pos = match.end()
+        if match.group() == b'"':
+            return
+        while len(reader.buf) - reader.pos < 5 and reader.fill():
+            pass
+        code = reader.buf[reader.pos : reader.pos + 1]
+        if code == b"u":
+            char = chr(int(reader.buf[reader.pos + 1 : reader.pos + 5], 16))
+            emit(char.encode("utf-8", "surrogatepass"))
+            reader.pos += 5
+        elif code in _ESCAPES:
+            emit(_ESCAPES[code])
+            reader.pos += 1
+        else:
+            raise ValueError("Invalid escape in Bedrock response")
+
+
+def _read_raw_value(reader: _Reader) -> bytes:
+    """Return the raw JSON text of the (small) value at the cursor."""
+    start = reader.peek()
+    if start == b'"':
+        text = bytearray()
+        _read_string(reader, text.extend)
+        value = text.decode("utf-8", "surrogatepass")
+        # Re-join any surrogate pairs produced by \uXXXX escapes
+        value = value.encode("utf-16", "surrogatepass").decode("utf-16")
+        return json.dumps(value).encode()
+    if start in (b"[", b"{"):
+        close = b"]" if start == b"[" else b"}"
+        raw = bytearray(start)
+        reader.pos += 1
+        first = True
+        while reader.peek() != close:
+            if not first:
+                reader.expect(b",")
+                raw.extend(b",")
+            first = False
+            if start == b"{":
+                raw.extend(_read_raw_value(reader))
+                reader.expect(b":")
+                raw.extend(b":")
+            raw.extend(_read_raw_value(reader))
+        reader.pos += 1
+        raw.extend(close)
+        return bytes(raw)
+    raw = bytearray()
+    while True:
+        match = _SCALAR_END.search(reader.buf, reader.pos)
+        if match is not None:
+            raw.extend(reader.buf[reader.pos : match.start()])
+            reader.pos = match.start()
+            return bytes(raw)
+        raw.extend(reader.buf[reader.pos :])
+        reader.pos = len(reader.buf)
+        if not reader.fill():
+            return bytes(raw)
+
+
+def _read_images(reader: _Reader, open_sink: Callable[[int], ImageSink]) -> list:
+    results = []
+    reader.expect(b"[")
+    while reader.peek() != b"]":
+        if results:
+            reader.expect(b",")
+        sink = open_sink(len(results))
+        try:
+            _read_string(reader, sink.write)
+        except BaseException:
+            sink.abort()
+            raise
+        results.append(sink.close())
+    reader.pos += 1
+    return results
+
+
+def parse_image_response(
+    stream,
+    open_sink: Callable[[int], ImageSink],
+    chunk_size: int = READ_CHUNK_BYTES,
+) -> dict[str, Any]:
+    """Parse a Bedrock image response from a file-like ``stream``.
+
+    ``open_sink(i)`` is called for the i-th entry of ``images``; its base64
+    text is written to the sink in chunks and ``images`` in the returned dict
+    holds each sink's ``close()`` result (e.g. a saved file path). All other
+    top-level fields are parsed normally.
+    """
+    reader = _Reader(stream, chunk_size)
+    result: dict[str, Any] = {}
+    reader.expect(b"{")
+    while reader.peek() != b"}":
+        if result:
+            reader.expect(b",")
+        key = json.loads(_read_raw_value(reader))
+        reader.expect(b":")
+        if key == "images" and reader.peek() == b"[":
+            result[key] = _read_images(reader, open_sink)
+        else:
+            result[key] = json.loads(_read_raw_value(reader))
+    return result
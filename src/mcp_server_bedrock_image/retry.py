@@ -0,0 +1,101 @@
+"""Error classification and full-jitter retry policy for Bedrock calls."""
+
+import random
+
+import requests
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+from .config import CALL_DEADLINE, MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+}
+
+# Transient server-side failures that are safe to re-send unchanged
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    "InternalServerException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """True if a boto3 or HTTP error means Bedrock rejected the call for rate."""
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def error_code(exc: BaseException) -> str:
+    """Short label for an error: the AWS error code, HTTP status or class name."""
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") or type(exc).__name__
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return f"HTTP{status}"
+    return type(exc).__name__
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """True for throttling, 5xx and connection-level failures.
+
+    Validation, auth and other client errors are fatal: re-sending the same
+    body cannot succeed.
+    """
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return error.get("Code") in RETRYABLE_ERROR_CODES or status >= 500
+    if isinstance(exc, (BotoConnectionError, HTTPClientError, ConnectionResetError)):
+        return True
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError):
+        status = getattr(exc.response, "status_code", None)
+        return status in RETRYABLE_STATUS_CODES
+    return False
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff bounded by attempts and a call deadline.
+
+    The n-th retry sleeps ``uniform(0, min(max_delay, base_delay * 2**(n-1)))``
+    seconds. No retry is scheduled if the sleep would overrun ``deadline``
+    seconds measured from the first attempt.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        deadline: float = CALL_DEADLINE,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered sleep before retry number ``attempt`` (1-based)."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def next_delay(
+        self, exc: BaseException, attempt: int, remaining: float
+    ) -> float | None:
+        """Seconds to wait before retrying, or None if the error should surface."""
+        if attempt >= self.max_attempts or not is_retryable_error(exc):
+            return None
+        delay = self.backoff(attempt)
+        if delay >= remaining:
+            return None
+        return delay
@@ -1,14 +1,45 @@
 """FastMCP server exposing Stability AI image tools on AWS Bedrock."""
 
+import argparse
+import asyncio
 import base64
-from typing import Optional
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Annotated, Any, Optional
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
 from pydantic import Field
 
-from .config import IMAGE_STORAGE_DIRECTORY, MODELS, SAVE_METADATA
-from .image_utils import save_image, save_metadata
-from .tools.compose import compose_branded_image
+from .cache import ResultCache, cache_key
+from .config import (
+    ALLOWED_HOSTS,
+    ANALYSIS_MAX_SIDE,
+    HOST,
+    IMAGE_STORAGE_DIRECTORY,
+    JOB_STORE,
+    METRICS_PORT,
+    MODELS,
+    PORT,
+    PREFLIGHT,
+    REGIONS,
+    RESULT_CACHE,
+    SAVE_METADATA,
+    TRANSPORT,
+    WARMUP,
+)
+from .encoding import EXTENSIONS, OutputEncoding
+from .image_utils import EncodedImageCache, ImageFileSink, copy_image, save_metadata
+from .jobs import SUCCEEDED, JobScheduler, JobStore
+from .metrics import METRICS, serve_metrics
+from .preflight import DEFAULT_LIMITS, LIMITS, prepare_image
+from .tools.batch import run_batch
 from .tools.edit import (
     build_outpaint_body,
     build_recolor_body,
@@ -17,8 +48,23 @@ from .tools.edit import (
     build_style_transfer_body,
 )
 from .tools.generate import build_generate_body, parse_generate_response
+from .tools.pipeline import (
+    LOCAL_TOOLS,
+    MODEL_TOOLS,
+    Step,
+    compose_step,
+    parse_pipeline,
+    run_pipeline,
+    save_output,
+    to_base64,
+)
 from .tools.upscale import build_upscale_creative_body, build_upscale_fast_body
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from .tools.tiling import TilePlan
+
 INSTRUCTIONS = """# Bedrock Image Generation MCP Server
 
 Generate and manipulate images using Stability AI models on AWS Bedrock.
@@ -27,45 +73,269 @@ Generate and manipulate images using Stability AI models on AWS Bedrock.
 
 - generate_image: High-quality image generation (Stable Image Ultra)
 - generate_image_core: Faster generation (Stable Image Core)
+- generate_batch: Many generations in one call, run concurrently
 - remove_background: Remove image background
 - style_transfer: Apply style from a reference image
 - search_and_recolor: Recolor specific elements
 - outpaint: Extend image in any direction
 - search_and_replace: Replace objects in an image
-- upscale_fast: 4x resolution enhancement
+- upscale_fast: 4x resolution enhancement, tiled for large images
 - upscale_creative: Up to 4K creative upscale
 - compose_branded: Overlay logo with composition-aware placement
+- compose_branded_batch: Brand many images with one logo on all CPU cores
+- run_pipeline: Chain the tools above in one call, passing images in memory
+- submit_job / job_status / job_result / cancel_job: Run any of the above in
+  the background and poll for the result instead of blocking
+- server_stats: Per-model latency by stage, payload sizes, errors and caches
 """
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastMCP) -> AsyncIterator[None]:
+    """Resume jobs left queued or running by a previous process."""
+    global _resumed
+    if not _resumed and JOB_STORE:
+        _resumed = True
+        resumed = _get_jobs().resume()
+        if resumed:
+            logger.info("Resumed %d unfinished job(s)", len(resumed))
+    yield
+
+
 mcp = FastMCP(
     "mcp-server-bedrock-image",
     instructions=INSTRUCTIONS,
+    lifespan=_lifespan,
     dependencies=["boto3", "pillow", "numpy", "pydantic"],
 )
 
 _bedrock = None
+_bedrock_options: dict = {}
+_bedrock_lock = threading.Lock()
+_cache = None
+_encoder = None
+_jobs = None
+_resumed = False
+
+# Models whose output depends only on the input image, so they are cacheable
+# without an explicit seed
+DETERMINISTIC_MODELS = {"remove_background", "upscale_fast"}
+
+# Per-call output encoding, shared by every tool that saves images
+OutputFormat = Annotated[
+    Optional[str],
+    Field(description="'png', 'jpeg', 'webp' or 'avif' (default: OUTPUT_FORMAT)"),
+]
+OutputQuality = Annotated[
+    Optional[int], Field(description="Quality 1-100 for jpeg/webp/avif")
+]
+OutputEffort = Annotated[
+    Optional[int],
+    Field(description="Compression effort 0-9; higher is smaller but slower"),
+]
 
 
 def _get_bedrock():
-    """Lazy-init BedrockImageClient so import doesn't require AWS credentials."""
+    """Lazy-init BedrockImageClient so import doesn't require AWS credentials.
+
+    boto3 and requests are only imported here, keeping them off the startup
+    path; the lock lets the warm-up thread and tool calls race safely. With
+    several BEDROCK_REGIONS, calls are routed and failed over across them.
+    """
     global _bedrock
     if _bedrock is None:
-        from .bedrock_client import BedrockImageClient
+        with _bedrock_lock:
+            if _bedrock is None:
+                if len(REGIONS) > 1:
+                    from .regions import MultiRegionClient
+
+                    _bedrock = MultiRegionClient(REGIONS, **_bedrock_options)
+                else:
+                    from .bedrock_client import BedrockImageClient
 
-        _bedrock = BedrockImageClient()
+                    _bedrock = BedrockImageClient(**_bedrock_options)
     return _bedrock
 
 
-def _read_image_as_b64(path: str) -> str:
-    """Read a local image file and return base64-encoded string."""
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
+def _warm_up() -> None:
+    """Import the heavy modules and build the Bedrock client ahead of use."""
+    try:
+        from .tools import compose  # noqa: F401  (NumPy and Pillow)
+
+        _get_bedrock()
+    except Exception as e:
+        # Missing credentials etc. surface again on the first real call
+        logger.warning("Warm-up failed: %s", e)
+
+
+def _get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+def _get_encoder() -> EncodedImageCache:
+    global _encoder
+    if _encoder is None:
+        _encoder = EncodedImageCache()
+    return _encoder
+
+
+def _get_jobs() -> JobScheduler:
+    global _jobs
+    if _jobs is None:
+        _jobs = JobScheduler(_run_tool, store=JobStore() if JOB_STORE else None)
+    return _jobs
+
+
+async def _run_tool(tool: str, args: dict):
+    return await mcp._tool_manager.get_tool(tool).run(args)
 
 
 def _output_dir() -> str:
     return IMAGE_STORAGE_DIRECTORY
 
 
+def _is_cacheable(model_key: str, body: dict) -> bool:
+    # Only reproducible calls are cached or coalesced; seed 0 asks Bedrock
+    # for a random seed
+    return bool(body.get("seed")) or model_key in DETERMINISTIC_MODELS
+
+
+def _cached_copies(key: str, output_dir: str, filename: str | None) -> dict | None:
+    """Cache hit for ``key`` with its images copied to ``output_dir``."""
+    hit = _get_cache().get(key)
+    if hit:
+        hit["paths"] = [
+            copy_image(p, output_dir=output_dir, filename=filename)
+            for p in hit["paths"]
+        ]
+    return hit
+
+
+async def _map_inputs(
+    fn: Callable[[str], Any], inputs: dict[str, str] | None
+) -> dict[str, Any]:
+    """Apply ``fn`` to each input path off the event loop."""
+    if not inputs:
+        return {}
+    return await asyncio.to_thread(
+        lambda: {name: fn(path) for name, path in inputs.items()}
+    )
+
+
+async def _invoke_and_save(
+    model_key: str,
+    body: dict | Callable[[dict[str, str]], dict],
+    inputs: dict[str, str] | None = None,
+    output_dir: str | None = None,
+    filename: str | None = None,
+    encoding: OutputEncoding | None = None,
+) -> tuple[list[str], list[int], dict]:
+    """Invoke a model and save its images.
+
+    ``body`` is either the request body or, for tools with input images, a
+    function building it from ``inputs`` (name -> local path) resolved to
+    base64. The cache key is built from the input files' content digests, so
+    a cache hit never reads or encodes the inputs.
+
+    Deterministic requests are served from the result cache when possible.
+    Bedrock is asked for the output format directly when the model supports it;
+    otherwise (or when quality/effort are set) the image is re-encoded
+    locally. The cache holds Bedrock's output, before any re-encode.
+
+    With PREFLIGHT on, inputs are checked and shrunk to the model's limits
+    first (see preflight.py); invalid inputs raise ValueError before any
+    network call.
+
+    Returns (paths, seeds, info) where info holds retries, cache status, a
+    per-file report of format, size and encode time and, after pre-flight,
+    a per-input report of bytes saved.
+    """
+    model_id = MODELS[model_key]
+    out = output_dir or _output_dir()
+    encoding = encoding or OutputEncoding()
+    base = body if callable(body) else lambda _: body
+
+    request_format = encoding.request_format(model_key)
+
+    def build(images: dict[str, str]) -> dict:
+        return {**base(images), "output_format": request_format}
+
+    encoder = _get_encoder()
+
+    key = None
+    if RESULT_CACHE:
+        key_body = build(await _map_inputs(encoder.digest, inputs))
+        if _is_cacheable(model_key, key_body):
+            key = cache_key(model_id, key_body)
+            hit = await asyncio.to_thread(_cached_copies, key, out, filename)
+            if hit:
+                files = await asyncio.to_thread(_finish_files, encoding, hit["paths"])
+                return (
+                    [f["path"] for f in files],
+                    hit["seeds"],
+                    {"retries": 0, "cached": True, "files": files},
+                )
+
+    reports = {}
+    with METRICS.timer(model_id, "input_encode"):
+        if PREFLIGHT and inputs:
+            limits = LIMITS.get(model_key, DEFAULT_LIMITS)
+            prepared = await _map_inputs(
+                lambda path: encoder.prepared_b64(
+                    path, model_key, lambda data: prepare_image(data, limits)
+                ),
+                inputs,
+            )
+            images = {name: b64 for name, (b64, _) in prepared.items()}
+            reports = {name: report for name, (_, report) in prepared.items()}
+        else:
+            images = await _map_inputs(encoder.b64, inputs)
+    request = build(images)
+    sinks: list[ImageFileSink] = []
+
+    def open_sink(_: int) -> ImageFileSink:
+        sink = ImageFileSink(out, filename, EXTENSIONS[request_format])
+        sinks.append(sink)
+        return sink
+
+    response = await _get_bedrock().ainvoke_model(
+        model_id=model_id,
+        body=request,
+        open_sink=open_sink,
+        coalesce=_is_cacheable(model_key, request),
+    )
+    for sink in sinks:
+        METRICS.stage(model_id, "decode", sink.decode_s)
+        METRICS.stage(model_id, "write", sink.write_s)
+    paths, seeds = parse_generate_response(response)
+    if key and paths:
+        await asyncio.to_thread(_get_cache().put, key, paths, seeds)
+    files = await asyncio.to_thread(_finish_files, encoding, paths)
+    for file in files:
+        if file["encode_s"]:
+            METRICS.stage(model_id, "encode", file["encode_s"])
+    info = {"retries": response.get("retries", 0), "cached": False, "files": files}
+    if reports:
+        info["inputs"] = reports
+    return [f["path"] for f in files], seeds, info
+
+
+def _finish_files(encoding: OutputEncoding, paths: list[str]) -> list[dict]:
+    return [encoding.finish(path) for path in paths]
+
+
+def _save_metadata(
+    model_key: str, metadata: dict, output_dir: str, filename: str | None
+) -> None:
+    with METRICS.timer(MODELS[model_key], "metadata_write"):
+        save_metadata(metadata, output_dir=output_dir, filename=filename)
+
+
 @mcp.tool(name="generate_image")
 async def tool_generate_image(
     prompt: str = Field(
@@ -81,6 +351,9 @@ async def tool_generate_image(
     filename: Optional[str] = Field(
         default=None, description="Output filename without extension"
     ),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
@@ -92,12 +365,17 @@ async def tool_generate_image(
         aspect_ratio=aspect_ratio,
         seed=seed,
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["ultra"], body=body)
-    images, seeds = parse_generate_response(response)
+    paths, seeds, info = await _invoke_and_save(
+        "ultra",
+        body,
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
+    )
     out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
     if SAVE_METADATA:
-        save_metadata(
+        _save_metadata(
+            "ultra",
             {
                 "prompt": prompt,
                 "negative_prompt": negative_prompt,
@@ -107,7 +385,7 @@ async def tool_generate_image(
             output_dir=out,
             filename=filename,
         )
-    return {"status": "success", "paths": paths, "seeds": seeds}
+    return {"status": "success", "paths": paths, "seeds": seeds, **info}
 
 
 @mcp.tool(name="generate_image_core")
@@ -117,6 +395,9 @@ async def tool_generate_image_core(
     aspect_ratio: Optional[str] = Field(default=None, description="Aspect ratio"),
     seed: Optional[int] = Field(default=None, description="Seed"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
@@ -128,37 +409,101 @@ async def tool_generate_image_core(
         aspect_ratio=aspect_ratio,
         seed=seed,
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["core"], body=body)
-    images, seeds = parse_generate_response(response)
+    paths, seeds, info = await _invoke_and_save(
+        "core",
+        body,
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
+    )
     out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
     if SAVE_METADATA:
-        save_metadata(
+        _save_metadata(
+            "core",
             {"prompt": prompt, "model": "core", "seeds": seeds},
             output_dir=out,
             filename=filename,
         )
-    return {"status": "success", "paths": paths, "seeds": seeds}
+    return {"status": "success", "paths": paths, "seeds": seeds, **info}
+
+
+@mcp.tool(name="generate_batch")
+async def tool_generate_batch(
+    prompts: list[dict] = Field(
+        description=(
+            "Prompt specs, each {prompt, negative_prompt?, aspect_ratio?, seed?, "
+            "filename?}"
+        )
+    ),
+    model: str = Field(default="core", description="'core' or 'ultra'"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
+    output_dir: Optional[str] = Field(
+        default=None, description="Override output directory"
+    ),
+    ctx: Context = None,
+) -> dict:
+    """Generate many images concurrently and return a manifest.
+
+    Items run in parallel under the server's rate limits; a failed item is
+    reported in the manifest without failing the others.
+    """
+    if model not in ("core", "ultra"):
+        raise ValueError(f"Invalid model: '{model}'. Must be 'core' or 'ultra'.")
+    out = output_dir or _output_dir()
+    encoding = OutputEncoding(output_format, quality, effort)
+
+    async def run_item(index: int, spec: dict) -> dict:
+        spec = dict(spec)
+        filename = spec.pop("filename", None)
+        body = build_generate_body(**spec)
+        paths, seeds, info = await _invoke_and_save(
+            model,
+            body,
+            output_dir=out,
+            filename=filename,
+            encoding=encoding,
+        )
+        if SAVE_METADATA:
+            _save_metadata(
+                model,
+                {**spec, "model": model, "seeds": seeds},
+                output_dir=out,
+                filename=filename,
+            )
+        return {"paths": paths, "seeds": seeds, **info}
+
+    async def on_progress(done: int, total: int, entry: dict) -> None:
+        if ctx is not None:
+            await ctx.report_progress(
+                done, total, f"item {entry['index']}: {entry['status']}"
+            )
+
+    return await run_batch(prompts, run_item, on_progress=on_progress)
 
 
 @mcp.tool(name="remove_background")
 async def tool_remove_background(
     image_path: str = Field(description="Path to the image file"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Remove the background from an image."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_remove_background_body(image=image_b64)
-    response = _get_bedrock().invoke_model(
-        model_id=MODELS["remove_background"], body=body
+    paths, _, info = await _invoke_and_save(
+        "remove_background",
+        lambda images: build_remove_background_body(image=images["image"]),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="style_transfer")
@@ -168,24 +513,28 @@ async def tool_style_transfer(
     style_image_path: str = Field(description="Path to the style reference image"),
     negative_prompt: Optional[str] = Field(default=None, description="What to exclude"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Apply the style of a reference image to a source image."""
-    image_b64 = _read_image_as_b64(image_path)
-    style_b64 = _read_image_as_b64(style_image_path)
-    body = build_style_transfer_body(
-        prompt=prompt,
-        image=image_b64,
-        style_image=style_b64,
-        negative_prompt=negative_prompt,
+    paths, _, info = await _invoke_and_save(
+        "style_transfer",
+        lambda images: build_style_transfer_body(
+            prompt=prompt,
+            image=images["image"],
+            style_image=images["style_image"],
+            negative_prompt=negative_prompt,
+        ),
+        inputs={"image": image_path, "style_image": style_image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["style_transfer"], body=body)
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="search_and_recolor")
@@ -197,23 +546,28 @@ async def tool_search_and_recolor(
         description="New color/appearance for the selected element"
     ),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Recolor specific elements in an image."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_recolor_body(
-        image=image_b64,
-        prompt=prompt,
-        select_prompt=select_prompt,
-        recolor_prompt=recolor_prompt,
+    paths, _, info = await _invoke_and_save(
+        "recolor",
+        lambda images: build_recolor_body(
+            image=images["image"],
+            prompt=prompt,
+            select_prompt=select_prompt,
+            recolor_prompt=recolor_prompt,
+        ),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["recolor"], body=body)
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="outpaint")
@@ -225,20 +579,30 @@ async def tool_outpaint(
     top: int = Field(default=0, description="Pixels to extend top"),
     bottom: int = Field(default=0, description="Pixels to extend bottom"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Extend an image in any direction while maintaining visual consistency."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_outpaint_body(
-        image=image_b64, prompt=prompt, left=left, right=right, top=top, bottom=bottom
+    paths, _, info = await _invoke_and_save(
+        "outpaint",
+        lambda images: build_outpaint_body(
+            image=images["image"],
+            prompt=prompt,
+            left=left,
+            right=right,
+            top=top,
+            bottom=bottom,
+        ),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["outpaint"], body=body)
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="search_and_replace")
@@ -247,38 +611,138 @@ async def tool_search_and_replace(
     prompt: str = Field(description="What to replace with"),
     search_prompt: str = Field(description="What to find and replace"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Replace objects or elements in an image."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_search_replace_body(
-        image=image_b64, prompt=prompt, search_prompt=search_prompt
+    paths, _, info = await _invoke_and_save(
+        "search_replace",
+        lambda images: build_search_replace_body(
+            image=images["image"], prompt=prompt, search_prompt=search_prompt
+        ),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    response = _get_bedrock().invoke_model(model_id=MODELS["search_replace"], body=body)
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="upscale_fast")
 async def tool_upscale_fast(
     image_path: str = Field(description="Path to the image file"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
-    """Upscale image resolution by 4x."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_upscale_fast_body(image=image_b64)
-    response = _get_bedrock().invoke_model(model_id=MODELS["upscale_fast"], body=body)
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    """Upscale image resolution by 4x.
+
+    Images larger than the model accepts are upscaled as overlapping tiles
+    that are stitched back together locally.
+    """
+    from .tools.tiling import plan_upscale
+
+    encoding = OutputEncoding(output_format, quality, effort)
+    plan = await asyncio.to_thread(plan_upscale, image_path, LIMITS["upscale_fast"])
+    if plan is not None:
+        paths, info = await _upscale_tiled(
+            plan, image_path, output_dir or _output_dir(), filename, encoding
+        )
+        return {"status": "success", "paths": paths, **info}
+    paths, _, info = await _invoke_and_save(
+        "upscale_fast",
+        lambda images: build_upscale_fast_body(image=images["image"]),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=encoding,
+    )
+    return {"status": "success", "paths": paths, **info}
+
+
+async def _upscale_tiled(
+    plan: "TilePlan",
+    image_path: str,
+    out: str,
+    filename: str | None,
+    encoding: OutputEncoding,
+) -> tuple[list[str], dict]:
+    """Tiled upscale of ``image_path``, saved to ``out`` in ``encoding``."""
+    model_id = MODELS["upscale_fast"]
+    image, info = await _upscale_tiles(plan, image_path)
+    path = os.path.join(out, f"{filename or uuid.uuid4()}{encoding.extension}")
+    file = await asyncio.to_thread(encoding.save, image, path)
+    METRICS.stage(model_id, "encode", file["encode_s"])
+    return [file["path"]], {
+        "retries": info["retries"],
+        "cached": False,
+        "files": [file],
+        "tiles": info["tiles"],
+    }
+
+
+async def _upscale_tiles(
+    plan: "TilePlan", source: "str | bytes | Image.Image"
+) -> tuple["Image.Image", dict]:
+    """Upscale ``plan``'s tiles of ``source`` concurrently and stitch them
+    into one image; returns it with the retries and tile layout.
+
+    Tiles are streamed to a scratch directory and decoded one at a time
+    while stitching, so only the output canvas is held in full.
+    """
+    model_id = MODELS["upscale_fast"]
+    with METRICS.timer(model_id, "input_encode"):
+        tiles = await asyncio.to_thread(plan.encode_tiles, source)
+
+    with tempfile.TemporaryDirectory() as scratch:
+
+        async def upscale(index: int, tile: str) -> dict:
+            sinks: list[ImageFileSink] = []
+
+            def open_sink(_: int) -> ImageFileSink:
+                sinks.append(ImageFileSink(scratch, f"tile{index}"))
+                return sinks[-1]
+
+            response = await _get_bedrock().ainvoke_model(
+                model_id=model_id,
+                body=build_upscale_fast_body(image=tile),
+                open_sink=open_sink,
+                coalesce=True,
+            )
+            for sink in sinks:
+                METRICS.stage(model_id, "decode", sink.decode_s)
+                METRICS.stage(model_id, "write", sink.write_s)
+            return response
+
+        # Let every tile settle before the scratch directory goes away
+        responses = await asyncio.gather(
+            *(upscale(i, tile) for i, tile in enumerate(tiles)),
+            return_exceptions=True,
+        )
+        for response in responses:
+            if isinstance(response, BaseException):
+                raise response
+        with METRICS.timer(model_id, "stitch"):
+            image = await asyncio.to_thread(
+                plan.stitch, [r["images"][0] for r in responses]
+            )
+
+    return image, {
+        "retries": sum(r.get("retries", 0) for r in responses),
+        "tiles": {
+            "count": plan.count,
+            "grid": [len(plan.xs), len(plan.ys)],
+            "tile_size": list(plan.tile_size),
+        },
+    }
 
 
 @mcp.tool(name="upscale_creative")
@@ -287,22 +751,25 @@ async def tool_upscale_creative(
     prompt: str = Field(description="Description to guide creative upscaling"),
     negative_prompt: Optional[str] = Field(default=None, description="What to exclude"),
     filename: Optional[str] = Field(default=None, description="Output filename"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
     output_dir: Optional[str] = Field(
         default=None, description="Override output directory"
     ),
 ) -> dict:
     """Creatively upscale image up to 4K resolution."""
-    image_b64 = _read_image_as_b64(image_path)
-    body = build_upscale_creative_body(
-        image=image_b64, prompt=prompt, negative_prompt=negative_prompt
+    paths, _, info = await _invoke_and_save(
+        "upscale_creative",
+        lambda images: build_upscale_creative_body(
+            image=images["image"], prompt=prompt, negative_prompt=negative_prompt
+        ),
+        inputs={"image": image_path},
+        output_dir=output_dir,
+        filename=filename,
+        encoding=OutputEncoding(output_format, quality, effort),
     )
-    response = _get_bedrock().invoke_model(
-        model_id=MODELS["upscale_creative"], body=body
-    )
-    images, _ = parse_generate_response(response)
-    out = output_dir or _output_dir()
-    paths = [save_image(img, output_dir=out, filename=filename) for img in images]
-    return {"status": "success", "paths": paths}
+    return {"status": "success", "paths": paths, **info}
 
 
 @mcp.tool(name="compose_branded")
@@ -314,20 +781,437 @@ async def tool_compose_branded(
     logo_scale: float = Field(
         default=0.08, description="Logo size as fraction of image width"
     ),
+    placement: str = Field(
+        default="window",
+        description="'window' (best logo-sized window) or 'grid' (best grid cell)",
+    ),
+    stride: Optional[int] = Field(
+        default=None,
+        description="Window step in pixels (defaults to a quarter of the logo)",
+    ),
+    grid_rows: int = Field(default=3, description="Placement grid rows"),
+    grid_cols: int = Field(default=3, description="Placement grid columns"),
+    analysis_max_side: Optional[int] = Field(
+        default=ANALYSIS_MAX_SIDE,
+        description="Longest side of the thumbnail used for placement analysis "
+        "(null for full resolution)",
+    ),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
 ) -> dict:
     """Overlay logo with composition-aware placement."""
-    path = compose_branded_image(
+    from .tools.compose import brand_image
+
+    result = await asyncio.to_thread(
+        brand_image,
         image_path=image_path,
         logo_path=logo_path,
         output_path=output_path,
-        logo_variant=logo_variant,
         logo_scale=logo_scale,
+        rows=grid_rows,
+        cols=grid_cols,
+        analysis_max_side=analysis_max_side,
+        placement=placement,
+        stride=stride,
+        encoding=OutputEncoding(output_format, quality, effort),
+    )
+    file = {
+        "path": result["path"],
+        "format": result["format"],
+        "bytes": result["bytes"],
+        "encode_s": result["timings"]["encode_s"],
+    }
+    return {"status": "success", "path": result["path"], "files": [file]}
+
+
+@mcp.tool(name="compose_branded_batch")
+async def tool_compose_branded_batch(
+    images: list[str] | str = Field(
+        description="Source image paths, or a glob pattern such as 'out/*.png'"
+    ),
+    logo_path: str = Field(description="Path to the logo file (RGBA PNG)"),
+    output_format: OutputFormat = None,
+    quality: OutputQuality = None,
+    effort: OutputEffort = None,
+    output_dir: Optional[str] = Field(
+        default=None, description="Override output directory"
+    ),
+    logo_scale: float = Field(
+        default=0.08, description="Logo size as fraction of image width"
+    ),
+    placement: str = Field(
+        default="window",
+        description="'window' (best logo-sized window) or 'grid' (best grid cell)",
+    ),
+    stride: Optional[int] = Field(
+        default=None,
+        description="Window step in pixels (defaults to a quarter of the logo)",
+    ),
+    grid_rows: int = Field(default=3, description="Placement grid rows"),
+    grid_cols: int = Field(default=3, description="Placement grid columns"),
+    analysis_max_side: Optional[int] = Field(
+        default=ANALYSIS_MAX_SIDE,
+        description="Longest side of the thumbnail used for placement analysis "
+        "(null for full resolution)",
+    ),
+    max_workers: Optional[int] = Field(
+        default=None, description="Worker processes (defaults to COMPOSE_MAX_WORKERS)"
+    ),
+) -> dict:
+    """Overlay one logo on many images in parallel and return a manifest.
+
+    Each item reports its output path, placement decision and timings; a
+    failed image is reported without failing the others.
+    """
+    from .tools.compose import compose_branded_batch
+
+    return await asyncio.to_thread(
+        compose_branded_batch,
+        images,
+        logo_path,
+        output_dir or _output_dir(),
+        logo_scale=logo_scale,
+        rows=grid_rows,
+        cols=grid_cols,
+        analysis_max_side=analysis_max_side,
+        placement=placement,
+        stride=stride,
+        encoding=OutputEncoding(output_format, quality, effort),
+        max_workers=max_workers,
+    )
+
+
+JOB_TOOLS = {"submit_job", "job_status", "job_result", "cancel_job"}
+
+
+@mcp.tool(name="submit_job")
+async def tool_submit_job(
+    tool: str = Field(description="Name of the tool to run, e.g. 'upscale_creative'"),
+    args: dict = Field(description="Arguments for the tool, as for a direct call"),
+    priority: int = Field(default=0, description="Higher runs first among queued jobs"),
+    idempotency_key: Optional[str] = Field(
+        default=None,
+        description="Resubmitting with the same key returns the existing job "
+        "instead of paying for the call again",
+    ),
+) -> dict:
+    """Start a tool call in the background and return its job ID immediately.
+
+    Poll with job_status or job_result; stop it with cancel_job. Arguments are
+    validated up front, so a malformed call fails here rather than later.
+    Jobs are recorded on disk and resumed if the server restarts.
+    """
+    target = mcp._tool_manager.get_tool(tool)
+    if target is None or tool in JOB_TOOLS:
+        raise ValueError(f"Unknown tool for a job: '{tool}'")
+    target.fn_metadata.arg_model.model_validate(args)
+    job = _get_jobs().submit(tool, args, priority, idempotency_key)
+    return job.describe()
+
+
+@mcp.tool(name="job_status")
+async def tool_job_status(
+    job_id: str = Field(description="ID returned by submit_job"),
+) -> dict:
+    """Report a job's status, timing and error (if any)."""
+    return _get_jobs().get(job_id).describe()
+
+
+@mcp.tool(name="job_result")
+async def tool_job_result(
+    job_id: str = Field(description="ID returned by submit_job"),
+    wait: float = Field(
+        default=0, description="Seconds to wait for the job to finish before returning"
+    ),
+) -> dict:
+    """Return a finished job's tool result, or its current status if not done."""
+    job = await _get_jobs().wait(job_id, wait)
+    info = job.describe()
+    if job.status == SUCCEEDED:
+        info["result"] = job.result
+    return info
+
+
+@mcp.tool(name="cancel_job")
+async def tool_cancel_job(
+    job_id: str = Field(description="ID returned by submit_job"),
+) -> dict:
+    """Cancel a queued or running job."""
+    return _get_jobs().cancel(job_id).describe()
+
+
+@mcp.tool(name="run_pipeline")
+async def tool_run_pipeline(
+    steps: list[dict] = Field(
+        description=(
+            "Steps, each {id, tool, args, save?, filename?, output_format?, "
+            "quality?, effort?}. tool is a generate, edit or upscale tool or "
+            "compose_branded, and args are its arguments; an image argument "
+            "such as image_path may be '$<id>' to use an earlier step's output"
+        )
+    ),
+    save_intermediates: bool = Field(
+        default=False, description="Also save outputs that later steps use"
+    ),
+    output_dir: Optional[str] = Field(
+        default=None, description="Override output directory"
+    ),
+    ctx: Context = None,
+) -> dict:
+    """Run a multi-step edit in one call, passing images between steps in memory.
+
+    A step starts once the steps it reads from are done, so independent
+    branches run concurrently. Only final outputs, and intermediates if
+    asked, are saved. Returns a manifest with per-step status and timings.
+    """
+    plan = parse_pipeline(steps, save_intermediates)
+    out = output_dir or _output_dir()
+    run = uuid.uuid4().hex[:8]
+
+    async def run_step(step: Step, outputs: dict) -> tuple[object, dict]:
+        paths, values = {}, {}
+        for name, source in step.sources.items():
+            ref = step.reads(name)
+            if ref is None:
+                paths[name] = source
+            else:
+                values[name] = outputs[ref]
+        if step.tool in LOCAL_TOOLS:
+            output = await asyncio.to_thread(
+                compose_step,
+                step.args,
+                paths.get("image_path"),
+                values.get("image_path"),
+            )
+            fields = {}
+        else:
+            output, fields = await _pipeline_model_step(step, paths, values)
+        if step.persist:
+            file = await asyncio.to_thread(
+                save_output,
+                output,
+                out,
+                step.filename or f"{run}_{step.id}",
+                step.encoding,
+            )
+            fields.update(paths=[file["path"]], files=[file])
+        return output, fields
+
+    async def on_progress(done: int, total: int, entry: dict) -> None:
+        if ctx is not None:
+            await ctx.report_progress(
+                done, total, f"step {entry['id']}: {entry['status']}"
+            )
+
+    return await run_pipeline(plan, run_step, on_progress=on_progress)
+
+
+async def _pipeline_model_step(
+    step: Step, paths: dict[str, str], values: dict
+) -> tuple["str | Image.Image", dict]:
+    """Invoke a pipeline step's model; the output stays in memory, as base64
+    or, for a tiled upscale, as the stitched image."""
+    if step.tool == "upscale_fast":
+        tiled = await _pipeline_tiled_upscale(paths, values)
+        if tiled is not None:
+            return tiled
+    model_key, build, _ = MODEL_TOOLS[step.tool]
+    model_id = MODELS[model_key]
+    limits = LIMITS.get(model_key, DEFAULT_LIMITS)
+    encoder = _get_encoder()
+
+    def prepare(data: bytes) -> tuple[bytes | None, dict]:
+        return prepare_image(data, limits)
+
+    def encode(name: str) -> tuple[str, dict | None]:
+        if name in values:
+            return to_base64(values[name], prepare if PREFLIGHT else None)
+        if PREFLIGHT:
+            return encoder.prepared_b64(paths[name], model_key, prepare)
+        return encoder.b64(paths[name]), None
+
+    with METRICS.timer(model_id, "input_encode"):
+        encoded = await asyncio.to_thread(
+            lambda: {name: encode(name) for name in step.sources}
+        )
+    images = {name.removesuffix("_path"): b64 for name, (b64, _) in encoded.items()}
+    body = build(**step.args, **images)
+    response = await _get_bedrock().ainvoke_model(
+        model_id=model_id, body=body, coalesce=_is_cacheable(model_key, body)
+    )
+    if not response.get("images"):
+        raise ValueError(f"{step.tool} returned no image")
+    fields = {"retries": response.get("retries", 0)}
+    if response.get("seeds"):
+        fields["seeds"] = response["seeds"]
+    reports = {
+        name.removesuffix("_path"): report
+        for name, (_, report) in encoded.items()
+        if report
+    }
+    if reports:
+        fields["inputs"] = reports
+    return response["images"][0], fields
+
+
+async def _pipeline_tiled_upscale(
+    paths: dict[str, str], values: dict
+) -> "tuple[Image.Image, dict] | None":
+    """Tiled upscale for an upscale_fast step whose input is larger than the
+    model accepts, or None if it fits."""
+    from .tools.tiling import plan_upscale
+
+    source = values.get("image_path", paths.get("image_path"))
+    if isinstance(source, str) and "image_path" in values:
+        # An earlier model step's base64 output
+        source = await asyncio.to_thread(base64.b64decode, source)
+    plan = await asyncio.to_thread(plan_upscale, source, LIMITS["upscale_fast"])
+    if plan is None:
+        return None
+    return await _upscale_tiles(plan, source)
+
+
+@mcp.tool(name="server_stats")
+async def tool_server_stats() -> dict:
+    """Report where time goes in Bedrock calls, and cache and queue state.
+
+    ``models`` holds, per model ID, latency histograms for each stage of a
+    call (input_encode, serialize, queue_wait, network, parse, decode, write,
+    encode, metadata_write), request/response byte sizes and request, retry,
+    error and throttle counts.
+    """
+    stats = {
+        "uptime_s": round(time.time() - METRICS.started_at, 3),
+        "models": METRICS.snapshot(),
+        "caches": {
+            "result": _with_hit_rate(_get_cache().stats()),
+            "input": _with_hit_rate(_get_encoder().stats()),
+        },
+    }
+    if _bedrock is not None:
+        stats["regions"] = _bedrock.region_stats()
+        stats["coalescing"] = _bedrock.coalesce_stats()
+        stats["pool"] = _bedrock.pool_stats()
+    if _jobs is not None:
+        stats["jobs"] = _jobs.stats()
+    return stats
+
+
+def _with_hit_rate(stats: dict) -> dict:
+    lookups = stats["hits"] + stats["misses"]
+    return {**stats, "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0}
+
+
+def _collect_gauges():
+    """Cache, admission queue and job gauges for the Prometheus endpoint."""
+    caches = {"result": _cache, "input": _encoder}
+    for name, cache in caches.items():
+        if cache is not None:
+            for outcome in ("hits", "misses"):
+                value = cache.stats()[outcome]
+                yield f"cache_{outcome}", {"cache": name}, value
+    if _bedrock is not None:
+        for region, state in _bedrock.region_stats().items():
+            for model_id, limits in state["limits"].items():
+                labels = {"model": model_id, "region": region}
+                for field in ("in_flight", "queue_depth", "limit"):
+                    yield f"admission_{field}", labels, limits[field]
+        yield "coalesced_calls", {}, _bedrock.coalesce_stats()["coalesced"]
+    if _jobs is not None:
+        for status, count in _jobs.stats().items():
+            if status not in ("workers", "persistent"):
+                yield "jobs", {"status": status}, count
+
+
+METRICS.add_collector(_collect_gauges)
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="mcp-server-bedrock-image", description=INSTRUCTIONS.splitlines()[2]
+    )
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "streamable-http", "sse"),
+        default=TRANSPORT,
+        help="stdio for a single client; streamable-http or sse to serve many "
+        "clients from one process (default: MCP_TRANSPORT or stdio)",
+    )
+    parser.add_argument("--host", default=HOST, help="Bind address for HTTP/SSE")
+    parser.add_argument("--port", type=int, default=PORT, help="Port for HTTP/SSE")
+    parser.add_argument(
+        "--warmup",
+        action=argparse.BooleanOptionalAction,
+        default=WARMUP,
+        help="Create the Bedrock client in the background at startup (default: WARMUP)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Serve Prometheus metrics at /metrics on this port; 0 disables "
+        "(default: METRICS_PORT)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Threads running Bedrock calls, shared by all clients "
+        "(default: BEDROCK_MAX_WORKERS)",
+    )
+    return parser.parse_args(argv)
+
+
+_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+_WILDCARD_HOSTS = ("0.0.0.0", "::", "")
+
+
+def _transport_security(host: str) -> TransportSecuritySettings:
+    """DNS rebinding protection matching the HTTP bind address.
+
+    FastMCP only allows loopback Host headers by default, which refuses every
+    client of a server bound elsewhere. Loopback names, ``host`` itself and
+    MCP_ALLOWED_HOSTS are accepted. A wildcard bind has no name of its own,
+    so without MCP_ALLOWED_HOSTS only loopback clients get through: the
+    server has no auth, so the check is never turned off.
+    """
+    if host in _WILDCARD_HOSTS and not ALLOWED_HOSTS:
+        logger.warning(
+            "Bound to %r without MCP_ALLOWED_HOSTS: only loopback Host headers "
+            "are accepted. List the names remote clients use to reach them.",
+            host,
+        )
+    names = [*_LOOPBACK_HOSTS, *ALLOWED_HOSTS]
+    if host not in _WILDCARD_HOSTS:
+        names.append(f"[{host}]" if ":" in host else host)
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=[*names, *(f"{name}:*" for name in names)],
+        allowed_origins=[
+            f"{scheme}://{name}{port}"
+            for scheme in ("http", "https")
+            for name in names
+            for port in ("", ":*")
+        ],
     )
-    return {"status": "success", "path": path}
 
 
-def main():
-    mcp.run(transport="stdio")
+def main(argv: list[str] | None = None):
+    args = _parse_args(argv)
+    if args.workers:
+        _bedrock_options["max_workers"] = args.workers
+    if args.transport != "stdio":
+        # One process serves every client, sharing the Bedrock connection
+        # pool, rate limiters and caches
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        mcp.settings.transport_security = _transport_security(args.host)
+    if args.metrics_port:
+        serve_metrics(args.host, args.metrics_port)
+    if args.warmup:
+        threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    mcp.run(transport=args.transport)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+"""Concurrent fan-out of many image requests into a single manifest."""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from ..config import MAX_WORKERS
+
+
+async def run_batch(
+    items: list[dict],
+    run_item: Callable[[int, dict], Awaitable[dict]],
+    max_concurrency: int = MAX_WORKERS,
+    on_progress: Callable[[int, int, dict], Awaitable[None]] | None = None,
+) -> dict[str, Any]:
+    """Run ``run_item(index, item)`` for every item with bounded concurrency.
+
+    A failing item is recorded in the manifest instead of aborting the batch.
+    ``on_progress(done, total, entry)`` is awaited as each item finishes.
+
+    Returns a manifest: overall status ("success", "partial" or "error"),
+    counts, and one entry per item (in input order) with its status, latency
+    and either the fields returned by ``run_item`` or the error message.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    entries: list[dict] = [{} for _ in items]
+    done = 0
+
+    async def run(index: int, item: dict) -> None:
+        nonlocal done
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                entry = {"index": index, "status": "success"}
+                entry.update(await run_item(index, item))
+            except Exception as e:
+                entry = {"index": index, "status": "error", "error": f"{e}"}
+            entry["latency_s"] = round(time.perf_counter() - start, 3)
+        entries[index] = entry
+        done += 1
+        if on_progress is not None:
+            await on_progress(done, len(items), entry)
+
+    await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    return build_manifest(entries)
+
+
+def build_manifest(entries: list[dict]) -> dict[str, Any]:
+    """Summarize per-item entries (each with a "status") into a manifest."""
+    succeeded = sum(1 for e in entries if e["status"] == "success")
+    if succeeded == len(entries):
+        status = "success"
+    elif succeeded:
+        status = "partial"
+    else:
+        status = "error"
+    return {
+        "status": status,
+        "total": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "items": entries,
+    }
@@ -1,50 +1,241 @@
 """Branded image composition using Pillow — composition-aware logo placement."""
 
+import glob
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 
 import numpy as np
 from PIL import Image
 
+from ..config import ANALYSIS_MAX_SIDE, COMPOSE_MAX_WORKERS
+from ..encoding import OutputEncoding
+from .batch import build_manifest
 
-def analyze_quadrants(image_path: str) -> list[dict]:
-    """Divide image into 3x3 grid and score each quadrant for visual complexity."""
-    img = Image.open(image_path).convert("RGB")
-    arr = np.array(img)
-    h, w = arr.shape[:2]
-    qh, qw = h // 3, w // 3
-
-    quadrants = []
-    for row in range(3):
-        for col in range(3):
-            region = arr[row * qh : (row + 1) * qh, col * qw : (col + 1) * qw]
-            gray = np.mean(region, axis=2)
-            complexity = float(np.std(gray))
-            avg_brightness = float(np.mean(gray))
-            quadrants.append(
-                {
-                    "row": row,
-                    "col": col,
-                    "complexity": complexity,
-                    "avg_brightness": avg_brightness,
-                }
-            )
-    return quadrants
-
-
-def find_best_logo_quadrant(image_path: str) -> dict:
+ImageInput = str | Image.Image | np.ndarray
+
+# Batches smaller than this are branded in-process: starting spawn workers,
+# each importing numpy and Pillow, costs more than they save
+POOL_MIN_IMAGES = 4
+# With more than one window edge per this many pixels along an axis, the
+# integral image is built in full rather than band by band
+DENSE_BOUNDS = 4
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def to_luminance(image: ImageInput, max_side: int | None = None) -> np.ndarray:
+    """Return an 8-bit luminance array for a path, PIL image or RGB(A)/L array.
+
+    With ``max_side``, the image is shrunk by an integer factor until its
+    longest side is at most about ``max_side``. JPEG files are decoded
+    directly at reduced scale via ``draft``.
+    """
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2 and max_side is None:
+            return image
+        image = Image.fromarray(image)
+    elif isinstance(image, str):
+        image = Image.open(image)
+        if max_side and image.format == "JPEG":
+            image.draft("L", (max_side, max_side))
+    gray = image.convert("L")
+    if max_side:
+        factor = max(gray.size) // max_side
+        if factor > 1:
+            gray = gray.reduce(factor)
+    return np.asarray(gray)
+
+
+def analyze_quadrants(
+    image: ImageInput,
+    rows: int = 3,
+    cols: int = 3,
+    max_side: int | None = None,
+) -> list[dict]:
+    """Divide image into a rows x cols grid and score each cell's visual complexity.
+
+    ``image`` may be a path or an already-decoded PIL image or array, so
+    callers that hold the pixels don't decode the file twice. The image is
+    converted to 8-bit luminance once (optionally downsampled, see
+    ``to_luminance``), then every cell's mean and standard deviation come from
+    a single reshape-and-reduce over the grid.
+    """
+    return _grid_stats(to_luminance(image, max_side), rows, cols)
+
+
+def _grid_stats(gray: np.ndarray, rows: int, cols: int) -> list[dict]:
+    h, w = gray.shape
+    qh, qw = h // rows, w // cols
+    if qh == 0 or qw == 0:
+        raise ValueError(f"Image {w}x{h} is too small for a {rows}x{cols} grid")
+
+    # uint8 values square into uint16 without overflow (255**2 < 2**16)
+    cells = gray[: rows * qh, : cols * qw].reshape(rows, qh, cols, qw)
+    n = qh * qw
+    sums = cells.sum(axis=(1, 3), dtype=np.uint64)
+    squares = np.square(cells, dtype=np.uint16).sum(axis=(1, 3), dtype=np.uint64)
+    means = sums / n
+    stds = np.sqrt(np.maximum(squares / n - means**2, 0))
+
+    return [
+        {
+            "row": row,
+            "col": col,
+            "complexity": float(stds[row, col]),
+            "avg_brightness": float(means[row, col]),
+        }
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+def find_best_logo_quadrant(
+    image: ImageInput,
+    rows: int = 3,
+    cols: int = 3,
+    max_side: int | None = None,
+) -> dict:
     """Find the least complex quadrant and recommend logo variant."""
-    quadrants = analyze_quadrants(image_path)
+    quadrants = analyze_quadrants(image, rows=rows, cols=cols, max_side=max_side)
     best = min(quadrants, key=lambda q: q["complexity"])
     best["logo_variant"] = "light" if best["avg_brightness"] < 128 else "dark"
     return best
 
 
+def find_best_logo_position(
+    image: ImageInput,
+    logo_size: tuple[int, int],
+    stride: int | None = None,
+    margin: int = 10,
+    max_side: int | None = None,
+) -> dict:
+    """Find the logo-sized window with the lowest luminance variance.
+
+    Summed-area tables of luminance and luminance squared are built once, so
+    every candidate window (stepped by ``stride`` source pixels, default a
+    quarter of the logo's shorter side) is scored in constant time with its
+    exact variance. With ``max_side`` the search runs on a thumbnail and the
+    winning position is scaled back to source coordinates.
+
+    Returns the top-left ``x``/``y`` in source pixels, the window's
+    complexity and brightness, and the recommended logo variant.
+    """
+    width, height = _image_size(image)
+    logo_w, logo_h = logo_size
+    gray = to_luminance(image, max_side)
+    scale = gray.shape[1] / width
+
+    win_w = min(max(1, round(logo_w * scale)), gray.shape[1])
+    win_h = min(max(1, round(logo_h * scale)), gray.shape[0])
+    step = max(1, round((stride or max(1, min(logo_w, logo_h) // 4)) * scale))
+    pad = round(margin * scale)
+    xs = _window_starts(gray.shape[1], win_w, pad, step)
+    ys = _window_starts(gray.shape[0], win_h, pad, step)
+
+    # The integral images are only read at window edges, so they are built
+    # for those rows and columns alone: still exact, and much smaller than a
+    # full-resolution table once the stride is more than a few pixels.
+    rows = np.unique(np.concatenate((ys, ys + win_h)))
+    cols = np.unique(np.concatenate((xs, xs + win_w)))
+    sums = _summed_area_table(gray, rows, cols)
+    squares = _summed_area_table(np.square(gray, dtype=np.uint16), rows, cols)
+    y0 = np.searchsorted(rows, ys)[:, None]
+    y1 = np.searchsorted(rows, ys + win_h)[:, None]
+    x0 = np.searchsorted(cols, xs)[None, :]
+    x1 = np.searchsorted(cols, xs + win_w)[None, :]
+    n = win_w * win_h
+    totals = sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0]
+    sq_totals = squares[y1, x1] - squares[y0, x1] - squares[y1, x0] + squares[y0, x0]
+    means = totals / n
+    variances = np.maximum(sq_totals / n - means**2, 0)
+
+    row, col = np.unravel_index(np.argmin(variances), variances.shape)
+    x = round(int(xs[col]) / scale)
+    y = round(int(ys[row]) / scale)
+    x = max(margin, min(x, width - logo_w - margin))
+    y = max(margin, min(y, height - logo_h - margin))
+    brightness = float(means[row, col])
+    return {
+        "x": x,
+        "y": y,
+        "complexity": float(np.sqrt(variances[row, col])),
+        "avg_brightness": brightness,
+        "logo_variant": "light" if brightness < 128 else "dark",
+    }
+
+
+def _image_size(image: ImageInput) -> tuple[int, int]:
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    if isinstance(image, str):
+        with Image.open(image) as img:
+            return img.size
+    return image.size
+
+
+def _summed_area_table(
+    values: np.ndarray, rows: np.ndarray, cols: np.ndarray
+) -> np.ndarray:
+    """Integral image of ``values`` sampled at sorted, unique ``rows``/``cols``.
+
+    Entry ``[i, j]`` is the exact (int64) sum of ``values[:rows[i], :cols[j]]``.
+    """
+    return _prefix_sums_at(_prefix_sums_at(values, rows, axis=0), cols, axis=1)
+
+
+def _prefix_sums_at(values: np.ndarray, bounds: np.ndarray, axis: int) -> np.ndarray:
+    if len(bounds) * DENSE_BOUNDS > values.shape[axis]:
+        # At small strides a single cumulative sum beats looping over bands
+        shape = list(values.shape)
+        shape[axis] += 1
+        sums = np.zeros(shape, dtype=np.int64)
+        tail = [slice(None)] * values.ndim
+        tail[axis] = slice(1, None)
+        np.cumsum(values, axis=axis, dtype=np.int64, out=sums[tuple(tail)])
+        return sums.take(bounds, axis=axis)
+    # Sum each band between consecutive bounds, then accumulate the bands
+    values = np.moveaxis(values, axis, 0)
+    ends = bounds[bounds > 0]
+    starts = np.concatenate(([0], ends[:-1]))
+    bands = np.stack(
+        [values[a:b].sum(axis=0, dtype=np.int64) for a, b in zip(starts, ends)]
+    )
+    sums = np.cumsum(bands, axis=0)
+    if bounds[0] == 0:
+        sums = np.insert(sums, 0, 0, axis=0)
+    return np.moveaxis(sums, 0, axis)
+
+
+def _window_starts(total: int, size: int, margin: int, step: int) -> np.ndarray:
+    """Window offsets from ``margin`` to the far edge, always including the last."""
+    lo, hi = margin, total - size - margin
+    if hi < lo:
+        lo = hi = max(0, (total - size) // 2)
+    starts = np.arange(lo, hi + 1, step)
+    if starts[-1] != hi:
+        starts = np.append(starts, hi)
+    return starts
+
+
 def compose_branded_image(
     image_path: str,
     logo_path: str,
     output_path: str,
     logo_variant: str = "auto",
     logo_scale: float = 0.08,
+    rows: int = 3,
+    cols: int = 3,
+    analysis_max_side: int | None = ANALYSIS_MAX_SIDE,
+    placement: str = "window",
+    stride: int | None = None,
+    encoding: OutputEncoding | None = None,
 ) -> str:
     """Compose a branded image with composition-aware logo placement.
 
@@ -54,37 +245,285 @@ def compose_branded_image(
         output_path: Where to save the branded image.
         logo_variant: "light", "dark", or "auto" (auto-detect from image).
         logo_scale: Logo size as fraction of image width.
+        rows: Number of grid rows considered for "grid" placement.
+        cols: Number of grid columns considered for "grid" placement.
+        analysis_max_side: Longest side of the thumbnail used for placement
+            analysis, or None to analyze at full resolution.
+        placement: "window" searches every logo-sized window (see
+            find_best_logo_position); "grid" centers the logo in the least
+            complex rows x cols cell.
+        stride: Window step in source pixels for "window" placement.
+        encoding: Output format and quality (defaults to the OUTPUT_* settings);
+            the extension of output_path is adjusted to match the format.
 
     Returns:
         Absolute path to the branded image.
     """
-    img = Image.open(image_path).convert("RGBA")
+    return brand_image(
+        image_path,
+        logo_path,
+        output_path,
+        logo_scale=logo_scale,
+        rows=rows,
+        cols=cols,
+        analysis_max_side=analysis_max_side,
+        placement=placement,
+        stride=stride,
+        encoding=encoding,
+    )["path"]
+
+
+def compose_branded_batch(
+    images: list[str] | str,
+    logo_path: str,
+    output_dir: str,
+    logo_scale: float = 0.08,
+    rows: int = 3,
+    cols: int = 3,
+    analysis_max_side: int | None = ANALYSIS_MAX_SIDE,
+    placement: str = "window",
+    stride: int | None = None,
+    encoding: OutputEncoding | None = None,
+    max_workers: int | None = None,
+) -> dict:
+    """Brand many images with the same logo across a process pool.
+
+    ``images`` is a list of paths or a glob pattern. Each output is written to
+    ``output_dir`` as ``<name>_branded.<ext>``, under the source's folder
+    relative to the folder all sources share, so same-named images from
+    different folders don't overwrite each other. Batches of at least
+    ``POOL_MIN_IMAGES`` run on a spawn pool kept between calls; every worker
+    process loads the logo once and keeps one resized copy per target width.
+
+    Returns a manifest in the same shape as ``run_batch``; each item carries
+    the source path, output path, file size, placement decision and
+    per-stage timings. Raises ValueError if a glob matches nothing.
+    """
+    encoding = encoding or OutputEncoding()
+    if isinstance(images, str):
+        paths = sorted(glob.glob(images))
+        if not paths:
+            raise ValueError(f"No images match '{images}'")
+    else:
+        paths = list(images)
+    jobs = [
+        (
+            path,
+            logo_path,
+            output,
+            logo_scale,
+            rows,
+            cols,
+            analysis_max_side,
+            placement,
+            stride,
+            encoding,
+        )
+        for path, output in zip(
+            paths, _output_paths(paths, output_dir, encoding.extension)
+        )
+    ]
+    entries: list[dict] = [{} for _ in jobs]
+
+    workers = max(1, max_workers or COMPOSE_MAX_WORKERS)
+    if workers == 1 or len(jobs) < POOL_MIN_IMAGES:
+        for index, job in enumerate(jobs):
+            entries[index] = _batch_entry(index, job)
+        return build_manifest(entries)
+
+    pool = _get_pool(workers)
+    futures = {
+        pool.submit(_batch_entry, index, job): index for index, job in enumerate(jobs)
+    }
+    try:
+        for future in as_completed(futures):
+            entries[futures[future]] = future.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    return build_manifest(entries)
+
+
+def _output_paths(paths: list[str], output_dir: str, extension: str) -> list[str]:
+    """``<output_dir>/<folder>/<name>_branded<extension>`` per source, where
+    ``folder`` is relative to the sources' common folder; repeats of the
+    same source get a numeric suffix."""
+    folders = [os.path.dirname(os.path.abspath(path)) for path in paths]
+    try:
+        root = os.path.commonpath(folders) if folders else ""
+    except ValueError:  # sources on different drives
+        root = None
+    outputs, taken = [], set()
+    for path, folder in zip(paths, folders):
+        name = os.path.splitext(os.path.basename(path))[0] + "_branded"
+        if root is not None:
+            name = os.path.normpath(os.path.join(os.path.relpath(folder, root), name))
+        output, n = name, 1
+        while output in taken:
+            n += 1
+            output = f"{name}_{n}"
+        taken.add(output)
+        outputs.append(os.path.join(output_dir, output + extension))
+    return outputs
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by batches; replaced when ``workers`` changes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the server process runs an event loop and
+            # worker threads
+            context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _batch_entry(index: int, job: tuple) -> dict:
+    image_path = job[0]
+    start = time.perf_counter()
+    try:
+        entry = {"index": index, "status": "success", "image_path": image_path}
+        entry.update(brand_image(*job))
+    except Exception as e:
+        entry = {
+            "index": index,
+            "status": "error",
+            "image_path": image_path,
+            "error": f"{e}",
+        }
+    entry["latency_s"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+@lru_cache(maxsize=4)
+def _load_logo(logo_path: str, mtime_ns: int) -> Image.Image:
     logo = Image.open(logo_path).convert("RGBA")
+    logo.load()
+    return logo
+
 
-    # Scale logo
-    logo_w = int(img.width * logo_scale)
-    logo_h = int(logo.height * (logo_w / logo.width))
-    logo = logo.resize((logo_w, logo_h), Image.LANCZOS)
+@lru_cache(maxsize=32)
+def _scaled_logo(logo_path: str, mtime_ns: int, width: int) -> Image.Image:
+    logo = _load_logo(logo_path, mtime_ns)
+    height = int(logo.height * (width / logo.width))
+    return logo.resize((width, height), Image.LANCZOS)
 
-    # Find best quadrant
-    best = find_best_logo_quadrant(image_path)
-    qh, qw = img.height // 3, img.width // 3
 
-    # Position logo in center of best quadrant
+def brand_image(
+    image_path: str,
+    logo_path: str,
+    output_path: str,
+    logo_scale: float = 0.08,
+    rows: int = 3,
+    cols: int = 3,
+    analysis_max_side: int | None = ANALYSIS_MAX_SIDE,
+    placement: str = "window",
+    stride: int | None = None,
+    encoding: OutputEncoding | None = None,
+) -> dict:
+    """Brand one image like compose_branded_image, returning full details.
+
+    The result holds the output path, format and size in bytes, the
+    placement decision and per-stage timings in seconds.
+    """
+    timings = {}
+    start = time.perf_counter()
+    img = Image.open(image_path).convert("RGBA")
+    timings["decode_s"] = time.perf_counter() - start
+    img, best = place_logo(
+        img,
+        logo_path,
+        logo_scale=logo_scale,
+        rows=rows,
+        cols=cols,
+        analysis_max_side=analysis_max_side,
+        placement=placement,
+        stride=stride,
+        timings=timings,
+    )
+
+    # Save as RGB in the requested format
+    encoding = encoding or OutputEncoding()
+    start = time.perf_counter()
+    report = encoding.save(img.convert("RGB"), encoding.path_for(output_path))
+    timings["encode_s"] = time.perf_counter() - start
+
+    return {
+        "path": report["path"],
+        "format": report["format"],
+        "bytes": report["bytes"],
+        "placement": best,
+        "timings": {name: round(value, 4) for name, value in timings.items()},
+    }
+
+
+def place_logo(
+    img: Image.Image,
+    logo_path: str,
+    logo_scale: float = 0.08,
+    rows: int = 3,
+    cols: int = 3,
+    analysis_max_side: int | None = ANALYSIS_MAX_SIDE,
+    placement: str = "window",
+    stride: int | None = None,
+    timings: dict | None = None,
+) -> tuple[Image.Image, dict]:
+    """Composite the logo onto an RGBA image at the least busy spot.
+
+    Returns the image and the placement decision. Adds analyze_s and
+    composite_s to ``timings`` if given.
+    """
+    if placement not in ("window", "grid"):
+        raise ValueError(
+            f"Invalid placement: '{placement}'. Must be 'window' or 'grid'."
+        )
+    timings = {} if timings is None else timings
+    # Scale logo (cached per width for repeated use of the same logo)
+    logo = _scaled_logo(
+        logo_path, os.stat(logo_path).st_mtime_ns, int(img.width * logo_scale)
+    )
+    logo_w, logo_h = logo.size
+
     margin = 10
-    x = best["col"] * qw + (qw - logo_w) // 2
-    y = best["row"] * qh + (qh - logo_h) // 2
+    start = time.perf_counter()
+    if placement == "window":
+        best = find_best_logo_position(
+            img,
+            (logo_w, logo_h),
+            stride=stride,
+            margin=margin,
+            max_side=analysis_max_side,
+        )
+        x, y = best["x"], best["y"]
+    else:
+        best = find_best_logo_quadrant(
+            img, rows=rows, cols=cols, max_side=analysis_max_side
+        )
+        qh, qw = img.height // rows, img.width // cols
 
-    # Clamp to image bounds with margin
-    x = max(margin, min(x, img.width - logo_w - margin))
-    y = max(margin, min(y, img.height - logo_h - margin))
+        # Position logo in center of best quadrant
+        x = best["col"] * qw + (qw - logo_w) // 2
+        y = best["row"] * qh + (qh - logo_h) // 2
+
+        # Clamp to image bounds with margin
+        x = max(margin, min(x, img.width - logo_w - margin))
+        y = max(margin, min(y, img.height - logo_h - margin))
+    timings["analyze_s"] = time.perf_counter() - start
 
     # Composite
+    start = time.perf_counter()
     img.paste(logo, (x, y), logo)
-
-    # Save as RGB PNG
-    parent = os.path.dirname(output_path)
-    if parent:
-        os.makedirs(parent, exist_ok=True)
-    img.convert("RGB").save(output_path, "PNG")
-    return os.path.abspath(output_path)
+    timings["composite_s"] = time.perf_counter() - start
+    return img, {**best, "x": x, "y": y, "width": logo_w, "height": logo_h}
@@ -0,0 +1,277 @@
+"""Multi-step image pipelines that hand images from step to step in memory.
+
+A pipeline is a list of steps, each ``{"id", "tool", "args"}`` plus the
+optional ``save``, ``filename``, ``output_format``, ``quality`` and
+``effort``. The image arguments of a step (``image_path``,
+``style_image_path``) name either a file or, as ``"$<id>"``, the output of
+an earlier step. That output is passed on as Bedrock's base64 or as a
+decoded image, without going through disk. Each step starts as soon as the
+steps it reads from are done, so independent branches run concurrently.
+Only outputs that no other step reads, and steps marked ``save``, are
+written to disk.
+"""
+
+import asyncio
+import base64
+import inspect
+import io
+import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+from ..encoding import OutputEncoding
+from ..image_utils import save_image
+from .batch import build_manifest
+from .edit import (
+    build_outpaint_body,
+    build_recolor_body,
+    build_remove_background_body,
+    build_search_replace_body,
+    build_style_transfer_body,
+)
+from .generate import build_generate_body
+from .upscale import build_upscale_creative_body, build_upscale_fast_body
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+REF = "$"
+
+# Model-backed tools: MODELS key, request body builder and image parameters
+MODEL_TOOLS: dict[str, tuple[str, Callable[..., dict], tuple[str, ...]]] = {
+    "generate_image": ("ultra", build_generate_body, ()),
+    "generate_image_core": ("core", build_generate_body, ()),
+    "remove_background": (
+        "remove_background",
+        build_remove_background_body,
+        ("image",),
+    ),
+    "style_transfer": (
+        "style_transfer",
+        build_style_transfer_body,
+        ("image", "style_image"),
+    ),
+    "search_and_recolor": ("recolor", build_recolor_body, ("image",)),
+    "outpaint": ("outpaint", build_outpaint_body, ("image",)),
+    "search_and_replace": ("search_replace", build_search_replace_body, ("image",)),
+    "upscale_fast": ("upscale_fast", build_upscale_fast_body, ("image",)),
+    "upscale_creative": ("upscale_creative", build_upscale_creative_body, ("image",)),
+}
+# Local tools: accepted arguments, with required ones first
+LOCAL_TOOLS = {
+    "compose_branded": (
+        ("image_path", "logo_path"),
+        (
+            "logo_scale",
+            "placement",
+            "stride",
+            "grid_rows",
+            "grid_cols",
+            "analysis_max_side",
+        ),
+    ),
+}
+
+
+class Step:
+    """One validated pipeline step."""
+
+    def __init__(self, index: int, spec: dict, earlier: set[str]):
+        self.id = str(spec.get("id") or f"step{index}")
+        self.tool = spec.get("tool")
+        if self.tool not in MODEL_TOOLS and self.tool not in LOCAL_TOOLS:
+            raise ValueError(
+                f"Step '{self.id}': unknown tool '{self.tool}'. Must be one of "
+                f"{', '.join([*MODEL_TOOLS, *LOCAL_TOOLS])}."
+            )
+        self.args = dict(spec.get("args") or {})
+        self.save = bool(spec.get("save", False))
+        self.filename = spec.get("filename")
+        self.encoding = OutputEncoding(
+            spec.get("output_format"), spec.get("quality"), spec.get("effort")
+        )
+        required, optional = _parameters(self.tool)
+        unknown = sorted(set(self.args) - set(required) - set(optional))
+        missing = [name for name in required if name not in self.args]
+        problems = []
+        if unknown:
+            problems.append(f"unknown args {', '.join(unknown)}")
+        if missing:
+            problems.append(f"missing args {', '.join(missing)}")
+        if problems:
+            raise ValueError(f"Step '{self.id}' ({self.tool}): {'; '.join(problems)}.")
+        # Image arguments, by parameter name, and the steps they read from
+        self.sources = {
+            name: self.args.pop(name)
+            for name in _image_parameters(self.tool)
+            if name in self.args
+        }
+        self.depends = []
+        for source in self.sources.values():
+            if isinstance(source, str) and source.startswith(REF):
+                ref = source[len(REF) :]
+                if ref not in earlier:
+                    raise ValueError(
+                        f"Step '{self.id}' reads '{source}', which is not an "
+                        "earlier step."
+                    )
+                self.depends.append(ref)
+        self.persist = self.save
+
+    def reads(self, name: str) -> str | None:
+        """Step id the image argument ``name`` reads from, if any."""
+        source = self.sources.get(name)
+        if isinstance(source, str) and source.startswith(REF):
+            return source[len(REF) :]
+        return None
+
+
+def parse_pipeline(specs: list[dict], save_intermediates: bool = False) -> list[Step]:
+    """Validate step specs; raises ValueError before anything runs."""
+    if not specs:
+        raise ValueError("A pipeline needs at least one step.")
+    steps: list[Step] = []
+    for index, spec in enumerate(specs):
+        step = Step(index, spec, {s.id for s in steps})
+        if step.id in {s.id for s in steps}:
+            raise ValueError(f"Duplicate step id '{step.id}'.")
+        steps.append(step)
+    read = {ref for step in steps for ref in step.depends}
+    for step in steps:
+        step.persist = step.save or save_intermediates or step.id not in read
+    return steps
+
+
+async def run_pipeline(
+    steps: list[Step],
+    run_step: Callable[[Step, dict[str, Any]], Awaitable[tuple[Any, dict]]],
+    on_progress: Callable[[int, int, dict], Awaitable[None]] | None = None,
+) -> dict[str, Any]:
+    """Run every step once the steps it reads from are done.
+
+    ``run_step(step, inputs)`` gets the outputs of the steps it depends on by
+    id and returns its own output plus fields for its manifest entry. A
+    failed step fails the steps downstream of it; other branches go on.
+
+    Returns a manifest like run_batch's, with one entry per step giving its
+    status, when it started and how long it ran, plus the total time.
+    """
+    start = time.perf_counter()
+    tasks: dict[str, asyncio.Task] = {}
+    entries: list[dict] = [{} for _ in steps]
+    done = 0
+
+    async def run(index: int, step: Step) -> Any:
+        nonlocal done
+        entry = {"id": step.id, "tool": step.tool, "status": "success"}
+        try:
+            inputs = {}
+            for ref in step.depends:
+                try:
+                    inputs[ref] = await tasks[ref]
+                except Exception as e:
+                    raise _Upstream(ref) from e
+            began = time.perf_counter()
+            entry["started_s"] = round(began - start, 3)
+            output, fields = await run_step(step, inputs)
+            entry.update(fields)
+            entry["latency_s"] = round(time.perf_counter() - began, 3)
+            return output
+        except _Upstream as e:
+            entry.update(status="skipped", error=f"Step '{e}' failed")
+            raise
+        except Exception as e:
+            entry.update(status="error", error=f"{e}")
+            raise
+        finally:
+            entries[index] = entry
+            done += 1
+            if on_progress is not None:
+                await on_progress(done, len(steps), entry)
+
+    for index, step in enumerate(steps):
+        tasks[step.id] = asyncio.ensure_future(run(index, step))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    manifest = build_manifest(entries)
+    manifest["paths"] = [path for entry in entries for path in entry.get("paths", [])]
+    manifest["total_s"] = round(time.perf_counter() - start, 3)
+    return manifest
+
+
+def to_base64(
+    value: "str | Image.Image",
+    prepare: Callable[[bytes], tuple[bytes | None, dict]] | None = None,
+) -> tuple[str, dict | None]:
+    """Base64 of a step output for the next request, through ``prepare``
+    (see EncodedImageCache.prepared_b64) if given."""
+    if isinstance(value, str):
+        if prepare is None:
+            return value, None
+        data = base64.b64decode(value)
+    else:
+        buf = io.BytesIO()
+        value.save(buf, "PNG", compress_level=1)
+        data = buf.getvalue()
+    replacement, report = prepare(data) if prepare else (None, None)
+    if replacement is None and isinstance(value, str):
+        return value, report
+    return base64.b64encode(
+        data if replacement is None else replacement
+    ).decode(), report
+
+
+def compose_step(
+    args: dict, path: str | None = None, output: "str | Image.Image | None" = None
+) -> "Image.Image":
+    """compose_branded on a file or an earlier step's output."""
+    from PIL import Image
+
+    from .compose import place_logo
+
+    if path is not None:
+        img = Image.open(path)
+    elif isinstance(output, str):
+        img = Image.open(io.BytesIO(base64.b64decode(output)))
+    else:
+        img = output
+    options = {name: value for name, value in args.items() if name != "logo_path"}
+    for name, key in (("grid_rows", "rows"), ("grid_cols", "cols")):
+        if name in options:
+            options[key] = options.pop(name)
+    img, _ = place_logo(img.convert("RGBA"), args["logo_path"], **options)
+    return img.convert("RGB")
+
+
+def save_output(
+    value: "str | Image.Image", output_dir: str, filename: str, encoding: OutputEncoding
+) -> dict:
+    """Write a step output in ``encoding`` and return its file report."""
+    if isinstance(value, str):
+        # Bedrock steps return PNG
+        return encoding.finish(save_image(value, output_dir, filename))
+    return encoding.save(value, os.path.join(output_dir, filename + encoding.extension))
+
+
+class _Upstream(Exception):
+    """A step this one reads from failed."""
+
+
+def _image_parameters(tool: str) -> tuple[str, ...]:
+    if tool in LOCAL_TOOLS:
+        return ("image_path",)
+    return tuple(f"{name}_path" for name in MODEL_TOOLS[tool][2])
+
+
+def _parameters(tool: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """(required, optional) argument names of a step's tool."""
+    if tool in LOCAL_TOOLS:
+        return LOCAL_TOOLS[tool]
+    _, build, images = MODEL_TOOLS[tool]
+    required, optional = [f"{name}_path" for name in images], []
+    for name, parameter in inspect.signature(build).parameters.items():
+        if name in images or name == "output_format":
+            continue
+        empty = parameter.default is inspect.Parameter.empty
+        (required if empty else optional).append(name)
+    return tuple(required), tuple(optional)
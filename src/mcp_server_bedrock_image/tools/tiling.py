@@ -0,0 +1,159 @@
+"""Tiled upscaling for images larger than the upscale model accepts.
+
+The input is cut into overlapping tiles that each fit the model's limits.
+Every tile is upscaled on its own, and the results are stitched back onto a
+canvas ``scale`` times the input size. Each tile fades in over the tiles
+already placed across their overlap, so seams blend rather than show a cut.
+"""
+
+import base64
+import contextlib
+import io
+import math
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from ..config import UPSCALE_MAX_TILES, UPSCALE_TILE_OVERLAP
+from ..preflight import InputLimits, to_8bit
+
+# stable-fast-upscale output is four times the input on each side
+UPSCALE_FACTOR = 4
+
+# A path, encoded image bytes or a decoded image
+Source = str | bytes | Image.Image
+
+
+def tile_starts(length: int, tile: int, overlap: int) -> list[int]:
+    """Evenly spread tile offsets covering ``length``, overlapping by at
+    least ``overlap``."""
+    if length <= tile:
+        return [0]
+    if overlap >= tile:
+        raise ValueError(f"Tile overlap {overlap} must be less than the tile {tile}")
+    count = math.ceil((length - overlap) / (tile - overlap))
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+
+class TilePlan:
+    """Grid of overlapping tiles covering a ``width`` x ``height`` image."""
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        limits: InputLimits,
+        overlap: int = UPSCALE_TILE_OVERLAP,
+        mode: str = "RGB",
+    ):
+        side = math.isqrt(limits.max_pixels)
+        if limits.max_side:
+            side = min(side, limits.max_side)
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.tile_size = (min(side, width), min(side, height))
+        limits.check(*self.tile_size)
+        self.xs = tile_starts(width, self.tile_size[0], overlap)
+        self.ys = tile_starts(height, self.tile_size[1], overlap)
+
+    @property
+    def count(self) -> int:
+        return len(self.xs) * len(self.ys)
+
+    def boxes(self) -> list[tuple[int, int, int, int]]:
+        """Tile crop boxes in row-major order."""
+        tw, th = self.tile_size
+        return [(x, y, x + tw, y + th) for y in self.ys for x in self.xs]
+
+    def encode_tiles(self, source: Source) -> list[str]:
+        """Base64 PNG of each tile of the (EXIF-rotated) ``source``."""
+        img = _open_upright(source).convert(self.mode)
+        tiles = []
+        for box in self.boxes():
+            buf = io.BytesIO()
+            img.crop(box).save(buf, "PNG", compress_level=1)
+            tiles.append(base64.b64encode(buf.getvalue()).decode())
+        return tiles
+
+    def stitch(self, paths: list[str], scale: int = UPSCALE_FACTOR) -> Image.Image:
+        """Blend upscaled tiles, given in ``boxes()`` order, into one image."""
+        tw, th = self.tile_size[0] * scale, self.tile_size[1] * scale
+        bands = len(self.mode)
+        canvas = np.zeros((self.height * scale, self.width * scale, bands), np.uint8)
+        for (x, y, _, _), path in zip(self.boxes(), paths):
+            with Image.open(path) as tile:
+                tile = tile.convert(self.mode)
+                if tile.size != (tw, th):
+                    tile = tile.resize((tw, th), Image.Resampling.LANCZOS)
+                pixels = np.asarray(tile)
+            region = canvas[y * scale : y * scale + th, x * scale : x * scale + tw]
+            # The weight of a new tile over the tiles left of and above it
+            # ramps from 0 to 1 across each shared overlap and is 1 elsewhere,
+            # so only the overlap strips need blending
+            rows = _ramp(self.ys, y, self.tile_size[1], scale)
+            cols = _ramp(self.xs, x, self.tile_size[0], scale)
+            top, left = len(rows), len(cols)
+            region[top:, left:] = pixels[top:, left:]
+            full = np.ones(tw - left, np.float32)
+            blends = (
+                (np.s_[:top, :], np.outer(rows, np.concatenate((cols, full)))),
+                (np.s_[top:, :left], np.broadcast_to(cols, (th - top, left))),
+            )
+            for strip, weight in blends:
+                old = region[strip].astype(np.float32)
+                blended = old + (pixels[strip] - old) * weight[..., None]
+                region[strip] = np.rint(blended)
+        return Image.fromarray(canvas, self.mode)
+
+
+def plan_upscale(
+    source: Source,
+    limits: InputLimits,
+    overlap: int = UPSCALE_TILE_OVERLAP,
+    max_tiles: int = UPSCALE_MAX_TILES,
+) -> TilePlan | None:
+    """Tile plan for an image too large for ``limits``, or None if it fits.
+
+    Only the image header is read. Raises ValueError for unreadable images
+    and for images that would need more than ``max_tiles`` tiles.
+    """
+    try:
+        with _open(source) as img:
+            turned = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+            width, height = img.size[::-1] if turned else img.size
+            alpha = "A" in img.getbands() or "transparency" in img.info
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Not a usable input image: {e}") from e
+    if limits.fit(width, height) == (width, height):
+        return None
+    plan = TilePlan(width, height, limits, overlap, "RGBA" if alpha else "RGB")
+    if plan.count > max_tiles:
+        raise ValueError(
+            f"Image is too large to upscale: {width}x{height} needs {plan.count} "
+            f"tiles, more than the {max_tiles} allowed."
+        )
+    return plan
+
+
+def _open(source: Source):
+    if isinstance(source, Image.Image):
+        return contextlib.nullcontext(source)
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _open_upright(source: Source) -> Image.Image:
+    """``source`` with EXIF rotation applied, in 8-bit."""
+    try:
+        with _open(source) as img:
+            return to_8bit(ImageOps.exif_transpose(img))
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Not a usable input image: {e}") from e
+
+
+def _ramp(starts: list[int], start: int, tile: int, scale: int) -> np.ndarray:
+    """Weights rising from 0 to 1 across the overlap with the previous tile
+    (empty for the first tile)."""
+    index = starts.index(start)
+    shared = (starts[index - 1] + tile - start) * scale if index else 0
+    return (np.arange(shared, dtype=np.float32) + 0.5) / max(shared, 1)
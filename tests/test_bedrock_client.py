@@ -1,10 +1,20 @@
+import asyncio
 import base64
+import io
 import json
+import threading
+import time
 
 import pytest
 from unittest.mock import MagicMock, patch
 
+from botocore.exceptions import ClientError
+
 from mcp_server_bedrock_image.bedrock_client import BedrockImageClient
+from mcp_server_bedrock_image.image_utils import ImageFileSink
+from mcp_server_bedrock_image.limiter import RateLimiter
+from mcp_server_bedrock_image.metrics import Metrics
+from mcp_server_bedrock_image.retry import RetryPolicy
 
 
 @pytest.fixture
@@ -39,7 +49,7 @@ def test_boto3_mode_raises_on_error():
         )
 
 
-@patch("mcp_server_bedrock_image.bedrock_client.requests.post")
+@patch("mcp_server_bedrock_image.bedrock_client.requests.Session.post")
 def test_bearer_mode_calls_endpoint(mock_post):
     pixel = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 100).decode()
     mock_response = MagicMock()
@@ -61,10 +71,11 @@ def test_bearer_mode_calls_endpoint(mock_post):
     call_args = mock_post.call_args
     assert "Bearer test-token-123" in call_args[1]["headers"]["Authorization"]
     assert "stability.stable-image-ultra-v1:1" in call_args[0][0]
+    assert call_args[1]["timeout"] == bic.timeout
     assert "images" in result
 
 
-@patch("mcp_server_bedrock_image.bedrock_client.requests.post")
+@patch("mcp_server_bedrock_image.bedrock_client.requests.Session.post")
 def test_bearer_mode_raises_on_http_error(mock_post):
     mock_response = MagicMock()
     mock_response.status_code = 403
@@ -86,3 +97,419 @@ def test_bearer_mode_raises_on_http_error(mock_post):
 def test_invalid_auth_mode_raises():
     with pytest.raises(ValueError, match="auth_mode"):
         BedrockImageClient(auth_mode="invalid")
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_model_runs_calls_concurrently():
+    client = MagicMock()
+
+    def slow_invoke(**kwargs):
+        time.sleep(0.2)
+        body_mock = MagicMock()
+        body_mock.read.return_value = json.dumps({"images": ["x"]}).encode()
+        return {"body": body_mock}
+
+    client.invoke_model.side_effect = slow_invoke
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client, max_workers=4)
+
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *[bic.ainvoke_model(model_id="m", body={"prompt": str(i)}) for i in range(4)]
+    )
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 4
+    assert client.invoke_model.call_count == 4
+    assert elapsed < 0.6
+
+
+def test_bearer_mode_reuses_pooled_session():
+    session = MagicMock()
+    session.post.return_value.json.return_value = {"images": []}
+    bic = BedrockImageClient(
+        auth_mode="bearer",
+        bearer_token="t",
+        endpoint="https://bedrock-runtime.us-east-1.amazonaws.com",
+        session=session,
+    )
+    for _ in range(3):
+        bic.invoke_model(model_id="m", body={"prompt": "p"})
+    assert session.post.call_count == 3
+
+
+def test_pool_stats_reports_bearer_pool():
+    bic = BedrockImageClient(
+        auth_mode="bearer",
+        bearer_token="t",
+        endpoint="https://bedrock-runtime.us-east-1.amazonaws.com",
+        pool_size=4,
+    )
+    stats = bic.pool_stats()
+    assert stats["auth_mode"] == "bearer"
+    assert stats["pools"] == []
+
+    bic._session.get_adapter(bic._endpoint).poolmanager.connection_from_url(
+        bic._endpoint
+    )
+    (pool,) = bic.pool_stats()["pools"]
+    assert pool["host"] == "bedrock-runtime.us-east-1.amazonaws.com"
+    assert pool["maxsize"] == 4
+    assert pool["requests"] == 0
+
+
+def test_throttling_error_feeds_limiter():
+    client = MagicMock()
+    client.invoke_model.side_effect = ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "slow down"}},
+        "InvokeModel",
+    )
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=client,
+        limiter=RateLimiter(rate=0, max_in_flight=4),
+        retry_policy=RetryPolicy(max_attempts=1),
+    )
+    with pytest.raises(ClientError):
+        bic.invoke_model(model_id="m", body={"prompt": "p"})
+    stats = bic.limiter.stats()["m"]
+    assert stats["throttles"] == 1
+    assert stats["limit"] == 2
+    assert stats["in_flight"] == 0
+
+
+def _throttle():
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "slow down"}},
+        "InvokeModel",
+    )
+
+
+def test_retries_throttling_with_same_body(mock_boto3_client):
+    ok = mock_boto3_client.invoke_model.return_value
+    mock_boto3_client.invoke_model.side_effect = [_throttle(), _throttle(), ok]
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=mock_boto3_client,
+        limiter=RateLimiter(rate=0),
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.001),
+    )
+    result = bic.invoke_model(model_id="m", body={"prompt": "p"})
+    assert result["retries"] == 2
+    bodies = [c.kwargs["body"] for c in mock_boto3_client.invoke_model.call_args_list]
+    assert len(bodies) == 3
+    assert all(b is bodies[0] for b in bodies)
+
+
+@pytest.mark.asyncio
+async def test_async_backoff_does_not_hold_a_worker(monkeypatch):
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    ok = {"images": ["aGk="]}
+    outcomes = {"throttled": [_throttle(), ok], "other": [ok]}
+
+    def invoke(modelId, body):
+        outcome = outcomes[modelId].pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"body": io.BytesIO(json.dumps(outcome).encode())}
+
+    client = MagicMock()
+    client.invoke_model.side_effect = invoke
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=client,
+        max_workers=1,
+        limiter=RateLimiter(rate=0),
+        retry_policy=RetryPolicy(max_attempts=2, base_delay=0.5),
+        coalesce=False,
+    )
+
+    throttled = asyncio.ensure_future(bic.ainvoke_model("throttled", {}))
+    await asyncio.sleep(0.1)  # first attempt failed, now backing off
+    start = time.monotonic()
+    await bic.ainvoke_model("other", {})
+    # The only worker thread is free while the other call backs off
+    assert time.monotonic() - start < 0.3
+    assert not throttled.done()
+    assert (await throttled)["retries"] == 1
+
+
+def test_fatal_errors_are_not_retried():
+    client = MagicMock()
+    client.invoke_model.side_effect = ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "bad prompt"}},
+        "InvokeModel",
+    )
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=client,
+        retry_policy=RetryPolicy(max_attempts=4, base_delay=0.001),
+    )
+    with pytest.raises(ClientError):
+        bic.invoke_model(model_id="m", body={"prompt": "p"})
+    assert client.invoke_model.call_count == 1
+
+
+def test_boto3_mode_streams_images_to_sink(mock_boto3_client, tmp_path):
+    mock_boto3_client.invoke_model.return_value = {
+        "body": io.BytesIO(json.dumps({"images": ["aGVsbG8="], "seeds": [5]}).encode())
+    }
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=mock_boto3_client)
+    result = bic.invoke_model(
+        model_id="m",
+        body={"prompt": "p"},
+        open_sink=lambda i: ImageFileSink(str(tmp_path), f"img{i}"),
+    )
+    assert result["seeds"] == [5]
+    assert result["images"] == [str(tmp_path / "img0.png")]
+    assert (tmp_path / "img0.png").read_bytes() == b"hello"
+
+
+def test_bearer_mode_streams_from_raw_response(tmp_path):
+    session = MagicMock()
+    response = session.post.return_value
+    response.raw = io.BytesIO(json.dumps({"images": ["aGVsbG8="]}).encode())
+    bic = BedrockImageClient(
+        auth_mode="bearer",
+        bearer_token="t",
+        endpoint="https://bedrock-runtime.us-east-1.amazonaws.com",
+        session=session,
+    )
+    result = bic.invoke_model(
+        model_id="m",
+        body={"prompt": "p"},
+        open_sink=lambda i: ImageFileSink(str(tmp_path), "out"),
+    )
+    assert session.post.call_args.kwargs["stream"] is True
+    assert result["images"] == [str(tmp_path / "out.png")]
+    response.close.assert_called_once()
+
+
+def test_bearer_mode_releases_streamed_error_response(tmp_path):
+    session = MagicMock()
+    response = session.post.return_value
+    response.raise_for_status.side_effect = RuntimeError("429 Too Many Requests")
+    bic = BedrockImageClient(
+        auth_mode="bearer",
+        bearer_token="t",
+        endpoint="https://bedrock-runtime.us-east-1.amazonaws.com",
+        session=session,
+        retry_policy=RetryPolicy(max_attempts=1),
+    )
+    with pytest.raises(RuntimeError):
+        bic.invoke_model(
+            model_id="m",
+            body={"prompt": "p"},
+            open_sink=lambda i: ImageFileSink(str(tmp_path), "out"),
+        )
+    response.close.assert_called_once()
+
+
+def _slow_boto3(release, images=("aGVsbG8=",), error=None):
+    client = MagicMock()
+
+    def invoke_model(modelId, body):
+        release.wait(5)
+        if error is not None:
+            raise error
+        payload = json.dumps({"images": list(images), "seeds": [3]}).encode()
+        return {"body": io.BytesIO(payload)}
+
+    client.invoke_model.side_effect = invoke_model
+    return client
+
+
+@pytest.mark.asyncio
+async def test_calls_queued_on_a_busy_model_do_not_hold_workers():
+    release = threading.Event()
+    client = MagicMock()
+
+    def invoke_model(modelId, body):
+        if modelId == "busy":
+            release.wait(5)
+        return {"body": io.BytesIO(json.dumps({"images": ["aGk="]}).encode())}
+
+    client.invoke_model.side_effect = invoke_model
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=client,
+        max_workers=2,
+        limiter=RateLimiter(rate=0, max_in_flight=1),
+        coalesce=False,
+    )
+    busy = [
+        asyncio.ensure_future(bic.ainvoke_model("busy", {"prompt": str(n)}))
+        for n in range(4)
+    ]
+    await asyncio.sleep(0.1)
+
+    # Three calls wait for the busy model's single slot, yet a worker is free
+    assert bic.limiter.get("busy").waiting == 3
+    await asyncio.wait_for(bic.ainvoke_model("other", {}), 1)
+    release.set()
+    await asyncio.gather(*busy)
+    assert bic.limiter.get("busy").admitted == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_calls_keep_their_slot_until_the_send_finishes():
+    release = threading.Event()
+    client = MagicMock()
+
+    def invoke_model(modelId, body):
+        release.wait(5)
+        return {"body": io.BytesIO(json.dumps({"images": ["aGk="]}).encode())}
+
+    client.invoke_model.side_effect = invoke_model
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=client,
+        max_workers=4,
+        limiter=RateLimiter(rate=0, max_in_flight=1),
+        coalesce=False,
+    )
+    for n in range(4):
+        task = asyncio.ensure_future(bic.ainvoke_model("m", {"prompt": str(n)}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # Only the first request reached the wire; its slot is still held
+    assert client.invoke_model.call_count == 1
+    assert bic.limiter.get("m").in_flight == 1
+    release.set()
+    while bic.limiter.get("m").in_flight:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_request(tmp_path):
+    release = threading.Event()
+    client = _slow_boto3(release, images=[base64.b64encode(b"x" * 2_000_000).decode()])
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client, max_workers=4)
+
+    calls = [
+        bic.ainvoke_model(
+            "m",
+            {"prompt": "p", "seed": 1},
+            open_sink=lambda i, n=n: ImageFileSink(str(tmp_path), f"out{n}"),
+        )
+        for n in range(3)
+    ]
+    other = bic.ainvoke_model("m", {"prompt": "q"})
+    tasks = [asyncio.ensure_future(c) for c in (*calls, other)]
+    while bic.coalesce_stats()["coalesced"] < 2:
+        await asyncio.sleep(0.01)
+    release.set()
+    *shared, _ = await asyncio.gather(*tasks)
+
+    assert client.invoke_model.call_count == 2
+    assert sorted(r.get("coalesced", False) for r in shared) == [False, True, True]
+    for n, result in enumerate(shared):
+        assert result["images"] == [str(tmp_path / f"out{n}.png")]
+        assert result["seeds"] == [3]
+        assert (tmp_path / f"out{n}.png").read_bytes() == b"x" * 2_000_000
+    assert bic.coalesce_stats() == {"leaders": 1, "coalesced": 2, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_receive_the_leaders_error():
+    release = threading.Event()
+    error = ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "bad prompt"}},
+        "InvokeModel",
+    )
+    client = _slow_boto3(release, error=error)
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client)
+    tasks = [
+        asyncio.ensure_future(bic.ainvoke_model("m", {"prompt": "p", "seed": 1}))
+        for _ in range(2)
+    ]
+    while bic.coalesce_stats()["coalesced"] < 1:
+        await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, ClientError) for r in results)
+    assert client.invoke_model.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_followers_outlive_a_cancelled_leader():
+    release = threading.Event()
+    client = _slow_boto3(release)
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client, max_workers=4)
+    body = {"prompt": "p", "seed": 1}
+    leader, *followers = [
+        asyncio.ensure_future(bic.ainvoke_model("m", body)) for _ in range(3)
+    ]
+    while bic.coalesce_stats()["coalesced"] < 2:
+        await asyncio.sleep(0.01)
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    release.set()
+
+    # One follower re-sends the request and the other shares it
+    results = await asyncio.wait_for(asyncio.gather(*followers), 5)
+    assert sorted(r.get("coalesced", False) for r in results) == [False, True]
+    assert client.invoke_model.call_count == 2
+    assert bic.coalesce_stats() == {"leaders": 2, "coalesced": 1, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_unseeded_calls_are_not_coalesced():
+    release = threading.Event()
+    client = _slow_boto3(release)
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client, max_workers=4)
+    tasks = [
+        asyncio.ensure_future(bic.ainvoke_model("m", body))
+        for body in ({"prompt": "p"}, {"prompt": "p"}, {"prompt": "p", "seed": 0})
+    ]
+    # A deterministic model can opt in without a seed
+    tasks += [
+        asyncio.ensure_future(bic.ainvoke_model("d", {"image": "x"}, coalesce=True))
+        for _ in range(2)
+    ]
+    while bic.coalesce_stats()["coalesced"] < 1:
+        await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert client.invoke_model.call_count == 4
+    assert bic.coalesce_stats()["leaders"] == 1
+
+
+def test_coalescing_can_be_disabled():
+    release = threading.Event()
+    release.set()
+    client = _slow_boto3(release)
+    bic = BedrockImageClient(auth_mode="boto3", boto3_client=client, coalesce=False)
+    bic.invoke_model("m", {"prompt": "p"})
+    bic.invoke_model("m", {"prompt": "p"})
+    assert client.invoke_model.call_count == 2
+    assert bic.coalesce_stats()["leaders"] == 0
+
+
+def test_invocations_record_stage_metrics(mock_boto3_client, tmp_path):
+    ok = {"body": io.BytesIO(json.dumps({"images": ["aGVsbG8="]}).encode())}
+    mock_boto3_client.invoke_model.side_effect = [_throttle(), ok]
+    bic = BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=mock_boto3_client,
+        limiter=RateLimiter(rate=0),
+        retry_policy=RetryPolicy(max_attempts=2, base_delay=0.001),
+    )
+    with patch("mcp_server_bedrock_image.bedrock_client.METRICS", Metrics()) as m:
+        bic.invoke_model(
+            model_id="m",
+            body={"prompt": "p"},
+            open_sink=lambda i: ImageFileSink(str(tmp_path), f"img{i}"),
+        )
+    stats = m.snapshot()["m"]
+    assert stats["requests"] == 1
+    assert stats["retries"] == 1
+    assert stats["throttles"] == 1
+    assert stats["errors.ThrottlingException"] == 1
+    assert stats["request_bytes"]["sum"] == len(b'{"prompt": "p"}')
+    assert stats["response_bytes"]["sum"] == len(b'{"images": ["aGVsbG8="]}')
+    assert stats["stage_seconds.queue_wait"]["count"] == 2
+    assert stats["stage_seconds.network"]["count"] == 2
+    assert stats["stage_seconds.parse"]["count"] == 1
+    assert stats["stage_seconds.serialize"]["count"] == 1
@@ -0,0 +1,50 @@
+import os
+
+from mcp_server_bedrock_image.cache import ResultCache, cache_key
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_cache_key_is_canonical():
+    a = cache_key("m", {"prompt": "p", "seed": 1, "output_format": "png"})
+    b = cache_key("m", {"output_format": "png", "seed": 1, "prompt": "p"})
+    assert a == b
+    assert a != cache_key("other", {"prompt": "p", "seed": 1, "output_format": "png"})
+    assert a != cache_key("m", {"prompt": "p", "seed": 2, "output_format": "png"})
+
+
+def test_cache_key_depends_on_image_content():
+    a = cache_key("m", {"image": "AAAA"})
+    assert a == cache_key("m", {"image": "AAAA"})
+    assert a != cache_key("m", {"image": "BBBB"})
+
+
+def test_put_then_get(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    src = _write(tmp_path / "out.png", b"image-bytes")
+    assert cache.get("k1") is None
+    cache.put("k1", [src], [42])
+    hit = cache.get("k1")
+    assert hit["seeds"] == [42]
+    with open(hit["paths"][0], "rb") as f:
+        assert f.read() == b"image-bytes"
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=2500)
+    src = _write(tmp_path / "out.png", b"x" * 1000)
+    cache.put("old", [src], [])
+    cache.put("new", [src], [])
+    old_index = os.path.join(cache.directory, "old.json")
+    os.utime(old_index, (0, 0))
+    os.utime(os.path.join(cache.directory, "old_0.png"), (0, 0))
+    cache.put("newest", [src], [])
+
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+    assert cache.get("newest") is not None
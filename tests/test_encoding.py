@@ -0,0 +1,79 @@
+import os
+
+import pytest
+from PIL import Image, features
+
+from mcp_server_bedrock_image.encoding import OutputEncoding
+
+
+@pytest.fixture
+def png_path(tmp_path):
+    path = str(tmp_path / "img.png")
+    Image.new("RGBA", (64, 48), (200, 40, 40, 255)).save(path)
+    return path
+
+
+def test_request_format_prefers_bedrock_native():
+    assert OutputEncoding("webp").request_format() == "webp"
+    assert OutputEncoding("jpg").request_format() == "jpeg"
+    assert OutputEncoding("avif").request_format() == "png"
+    # Quality/effort need a local encode, so ask for a lossless source
+    assert OutputEncoding("jpeg", quality=60).request_format() == "png"
+    assert OutputEncoding("png", effort=9).request_format() == "png"
+
+
+def test_request_format_follows_the_models_native_formats():
+    assert OutputEncoding("webp").request_format("core") == "webp"
+    assert OutputEncoding("webp").request_format("sd35") == "png"
+    assert OutputEncoding("jpeg").request_format("sd35") == "jpeg"
+    assert OutputEncoding("jpeg").request_format("remove_background") == "png"
+    assert OutputEncoding("webp").request_format("remove_background") == "webp"
+
+
+def test_rejects_invalid_settings():
+    with pytest.raises(ValueError, match="Invalid output format"):
+        OutputEncoding("gif")
+    with pytest.raises(ValueError, match="quality"):
+        OutputEncoding("webp", quality=0)
+    with pytest.raises(ValueError, match="effort"):
+        OutputEncoding("png", effort=10)
+
+
+def test_rejects_avif_without_pillow_support(monkeypatch):
+    monkeypatch.setattr(features, "check", lambda name: name != "avif")
+    with pytest.raises(ValueError, match="Available formats: png, jpeg, webp"):
+        OutputEncoding("avif")
+    assert OutputEncoding("webp").format == "webp"
+
+
+def test_finish_keeps_matching_file(png_path):
+    report = OutputEncoding("png").finish(png_path)
+    assert report == {
+        "path": png_path,
+        "format": "png",
+        "bytes": os.path.getsize(png_path),
+        "encode_s": 0.0,
+    }
+
+
+def test_finish_transcodes_and_replaces_source(png_path):
+    report = OutputEncoding("jpeg", quality=70).finish(png_path)
+    assert report["path"] == png_path[: -len(".png")] + ".jpg"
+    assert not os.path.exists(png_path)
+    assert report["bytes"] == os.path.getsize(report["path"])
+    with Image.open(report["path"]) as img:
+        assert (img.format, img.mode, img.size) == ("JPEG", "RGB", (64, 48))
+
+
+def test_finish_reencodes_png_in_place(png_path):
+    report = OutputEncoding("png", effort=9).finish(png_path)
+    assert report["path"] == png_path
+    assert Image.open(png_path).format == "PNG"
+    assert not [f for f in os.listdir(os.path.dirname(png_path)) if f.endswith(".part")]
+
+
+@pytest.mark.skipif(not features.check("avif"), reason="Pillow built without AVIF")
+def test_finish_transcodes_to_avif(png_path):
+    report = OutputEncoding("avif", quality=50, effort=0).finish(png_path)
+    assert report["path"].endswith(".avif")
+    assert Image.open(report["path"]).format == "AVIF"
@@ -1,4 +1,5 @@
 import base64
+import hashlib
 import json
 import os
 import struct
@@ -6,7 +7,13 @@ import zlib
 
 import pytest
 
-from mcp_server_bedrock_image.image_utils import save_image, save_metadata
+from mcp_server_bedrock_image import image_utils
+from mcp_server_bedrock_image.image_utils import (
+    EncodedImageCache,
+    save_image,
+    save_image_stream,
+    save_metadata,
+)
 
 
 @pytest.fixture
@@ -57,3 +64,89 @@ def test_save_metadata_writes_json(tmp_output):
         data = json.load(f)
     assert data["prompt"] == "hotel lobby"
     assert "timestamp" in data
+
+
+def test_save_image_decodes_in_chunks(tmp_output, monkeypatch):
+    monkeypatch.setattr(image_utils, "DECODE_CHUNK_CHARS", 8)
+    raw = bytes(range(256)) * 3
+    path = save_image(base64.b64encode(raw).decode(), output_dir=tmp_output)
+    with open(path, "rb") as f:
+        assert f.read() == raw
+    assert os.listdir(tmp_output) == [os.path.basename(path)]
+
+
+def test_save_image_stream_handles_unaligned_chunks(tmp_output):
+    raw = os.urandom(1001)
+    b64 = base64.b64encode(raw)
+    chunks = [b64[i : i + 7] for i in range(0, len(b64), 7)]
+    path = save_image_stream(chunks, output_dir=tmp_output, filename="streamed")
+    with open(path, "rb") as f:
+        assert f.read() == raw
+
+
+def test_save_image_stream_truncated_leaves_no_file(tmp_output):
+    with pytest.raises(ValueError):
+        save_image_stream(["AAAA", "AA"], output_dir=tmp_output, filename="bad")
+    assert os.listdir(tmp_output) == []
+
+
+def test_encoded_image_cache_memoizes(tmp_path):
+    path = tmp_path / "in.png"
+    path.write_bytes(b"original")
+    cache = EncodedImageCache()
+    assert cache.b64(str(path)) == base64.b64encode(b"original").decode()
+    assert cache.b64(str(path)) == base64.b64encode(b"original").decode()
+    assert cache.stats()["hits"] == 1
+    assert cache.digest(str(path)) == hashlib.sha256(b"original").hexdigest()
+
+
+def test_encoded_image_cache_invalidates_on_change(tmp_path):
+    path = tmp_path / "in.png"
+    path.write_bytes(b"original")
+    cache = EncodedImageCache()
+    cache.b64(str(path))
+    path.write_bytes(b"edited!!!")
+    assert cache.b64(str(path)) == base64.b64encode(b"edited!!!").decode()
+
+
+def test_prepared_b64_is_memoized_per_variant(tmp_path):
+    path = tmp_path / "in.png"
+    path.write_bytes(b"original")
+    calls = []
+
+    def prepare(data):
+        calls.append(bytes(data))  # data may be a memory map
+        return calls[-1].upper(), {"sent_bytes": len(data)}
+
+    cache = EncodedImageCache()
+    for _ in range(2):
+        encoded, report = cache.prepared_b64(str(path), "a", prepare)
+    assert encoded == base64.b64encode(b"ORIGINAL").decode()
+    assert report == {"sent_bytes": 8}
+    assert cache.prepared_b64(str(path), "b", lambda data: (None, {}))[0] == (
+        base64.b64encode(b"original").decode()
+    )
+    assert calls == [b"original"]
+
+
+def test_encoded_image_cache_respects_budget(tmp_path):
+    cache = EncodedImageCache(max_bytes=20)
+    for i in range(3):
+        path = tmp_path / f"{i}.png"
+        path.write_bytes(b"x" * 9)  # 12 base64 chars each
+        cache.b64(str(path))
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= 20
+
+
+def test_digests_share_the_encodings_lru(tmp_path):
+    cache = EncodedImageCache(max_bytes=200)
+    for i in range(5):
+        path = tmp_path / f"{i}.png"
+        path.write_bytes(b"x" * 9)
+        cache.digest(str(path))  # 64 hex chars each
+        cache.b64(str(path))
+    assert cache.stats()["bytes"] <= 200
+    # The oldest files' digests went with their encodings
+    assert cache.stats()["entries"] < 10
+    assert cache.digest(str(tmp_path / "4.png")) == hashlib.sha256(b"x" * 9).hexdigest()
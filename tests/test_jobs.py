@@ -0,0 +1,217 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mcp_server_bedrock_image.jobs import Job, JobScheduler, JobStore, _boot_id
+
+
+def _runner(funcs: dict):
+    async def run(tool, args):
+        return await funcs[tool](**args)
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_by_priority_with_bounded_workers():
+    gate = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await gate.wait()
+
+    async def record(name):
+        order.append(name)
+        return name
+
+    scheduler = JobScheduler(_runner({"block": blocker, "rec": record}), workers=1)
+    scheduler.submit("block", {})
+    low = scheduler.submit("rec", {"name": "low"}, priority=0)
+    high = scheduler.submit("rec", {"name": "high"}, priority=5)
+    late = scheduler.submit("rec", {"name": "late"}, priority=5)
+    await asyncio.sleep(0)
+    assert scheduler.stats()["running"] == 1
+    assert scheduler.stats()["queued"] == 3
+
+    gate.set()
+    await scheduler.wait(low.id, timeout=1)
+    assert order == ["high", "late", "low"]
+    assert (high.status, high.result) == ("succeeded", "high")
+    assert scheduler.get(late.id).describe()["elapsed_s"] >= 0
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_jobs():
+    started = asyncio.Event()
+
+    async def forever():
+        started.set()
+        await asyncio.sleep(3600)
+
+    scheduler = JobScheduler(_runner({"forever": forever}), workers=1)
+    running = scheduler.submit("forever", {})
+    queued = scheduler.submit("forever", {})
+    await started.wait()
+
+    assert scheduler.cancel(queued.id).status == "cancelled"
+    scheduler.cancel(running.id)
+    await scheduler.wait(running.id, timeout=1)
+    assert running.status == "cancelled"
+    assert running.finished_at is not None
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error_and_history_is_bounded():
+    async def boom():
+        raise RuntimeError("model unavailable")
+
+    async def ok():
+        return {"status": "success"}
+
+    scheduler = JobScheduler(_runner({"boom": boom, "ok": ok}), workers=2, history=2)
+    failed = scheduler.submit("boom", {})
+    await scheduler.wait(failed.id, timeout=1)
+    assert failed.status == "failed"
+    assert failed.describe()["error"] == "model unavailable"
+
+    for _ in range(2):
+        job = scheduler.submit("ok", {})
+        await scheduler.wait(job.id, timeout=1)
+    with pytest.raises(ValueError, match="Unknown job"):
+        scheduler.get(failed.id)
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_unfinished_job_after_timeout():
+    async def forever():
+        await asyncio.sleep(3600)
+
+    scheduler = JobScheduler(_runner({"forever": forever}), workers=1)
+    job = scheduler.submit("forever", {})
+    assert (await scheduler.wait(job.id, timeout=0.01)).status == "running"
+    await scheduler.close()
+    # Shutdown interrupts the job rather than cancelling it
+    assert job.status == "running"
+
+
+@pytest.mark.asyncio
+async def test_store_resumes_interrupted_and_queued_jobs(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    started = asyncio.Event()
+    calls = []
+
+    async def render(prompt):
+        calls.append(prompt)
+        started.set()
+        await asyncio.sleep(3600)
+
+    first = JobScheduler(_runner({"render": render}), workers=1, store=JobStore(db))
+    interrupted = first.submit("render", {"prompt": "a"}, priority=1)
+    queued = first.submit("render", {"prompt": "b"})
+    await started.wait()
+    await first.close()  # shutdown while "a" is in flight
+    first.store.close()
+
+    async def quick(prompt):
+        calls.append(prompt)
+        return {"paths": [f"/out/{prompt}.png"]}
+
+    second = JobScheduler(_runner({"render": quick}), workers=1, store=JobStore(db))
+    resumed = second.resume()
+    assert [job.id for job in resumed] == [interrupted.id, queued.id]
+    done = await second.wait(queued.id, timeout=1)
+    assert done.result == {"paths": ["/out/b.png"]}
+    assert second.get(interrupted.id).attempts == 2
+    assert calls == ["a", "a", "b"]
+    await second.close()
+    second.store.close()
+
+    # A fresh process serves finished results from the record
+    third = JobScheduler(_runner({}), store=JobStore(db))
+    assert third.resume() == []
+    record = third.get(queued.id)
+    assert (record.status, record.result) == ("succeeded", {"paths": ["/out/b.png"]})
+    assert record.done.is_set()
+    third.store.close()
+
+
+@pytest.mark.asyncio
+async def test_resume_leaves_jobs_of_live_processes_alone(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    started = asyncio.Event()
+
+    async def render(prompt):
+        started.set()
+        await asyncio.sleep(3600)
+
+    async def quick(prompt):
+        return {"paths": [f"/out/{prompt}.png"]}
+
+    first = JobScheduler(
+        _runner({"render": render}), workers=1, store=JobStore(db, lease=0.3)
+    )
+    running = first.submit("render", {"prompt": "a"})
+    await started.wait()
+    second = JobScheduler(_runner({"render": quick}), store=JobStore(db, lease=0.3))
+    # The first process is alive and renewing its lease
+    await asyncio.sleep(0.5)
+    assert second.resume() == []
+    with pytest.raises(ValueError, match="another server process"):
+        second.cancel(running.id)
+
+    time.sleep(0.4)  # the first process hangs and its lease lapses
+    assert [job.id for job in second.resume()] == [running.id]
+    assert second.resume() == []
+    done = await second.wait(running.id, timeout=1)
+    assert done.result == {"paths": ["/out/a.png"]}
+    # The hung process can no longer overwrite the job it lost
+    assert not first.store.save(first.get(running.id))
+    for scheduler in (first, second):
+        await scheduler.close()
+        scheduler.store.close()
+
+
+def test_jobs_of_exited_processes_are_claimed_once(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    gone = JobStore(db, owner=f"{_boot_id()}:{exited.pid}:old")
+    job = Job("render", {"prompt": "a"})
+    gone.save(job)
+    first, second = JobStore(db), JobStore(db)
+
+    # The lease is still current, but its owner has exited
+    assert [j.id for j in first.unfinished()] == [job.id]
+    assert first.claim(job.id)
+    assert not second.claim(job.id)
+    assert second.unfinished() == []
+    for store in (gone, first, second):
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_returns_existing_job(tmp_path):
+    async def ok():
+        return {"status": "success"}
+
+    async def boom():
+        raise RuntimeError("throttled")
+
+    store = JobStore(str(tmp_path / "jobs.db"))
+    scheduler = JobScheduler(_runner({"ok": ok, "boom": boom}), store=store)
+    job = scheduler.submit("ok", {}, idempotency_key="req-1")
+    await scheduler.wait(job.id, timeout=1)
+    assert scheduler.submit("ok", {}, idempotency_key="req-1").id == job.id
+
+    failed = scheduler.submit("boom", {}, idempotency_key="req-2")
+    await scheduler.wait(failed.id, timeout=1)
+    # Failed attempts can be retried under the same key
+    assert scheduler.submit("ok", {}, idempotency_key="req-2").id != failed.id
+    await scheduler.close()
+    store.close()
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from mcp_server_bedrock_image.config import MODELS
+from mcp_server_bedrock_image.limiter import ModelLimiter, RateLimiter
+
+
+def test_max_in_flight_is_enforced():
+    limiter = ModelLimiter("m", rate=0, max_in_flight=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker():
+        with limiter.acquire():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 2
+    assert limiter.stats()["admitted"] == 6
+
+
+def test_token_bucket_delays_beyond_burst():
+    limiter = ModelLimiter("m", rate=20, max_in_flight=1)
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter.acquire():
+            pass
+    elapsed = time.monotonic() - start
+    # First request uses the burst token, the next two wait ~50ms each
+    assert elapsed >= 0.08
+    assert limiter.stats()["max_wait_s"] > 0
+
+
+def test_aimd_backs_off_and_recovers():
+    limiter = ModelLimiter("m", rate=2, max_in_flight=8)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    assert limiter.rate == 1
+    assert limiter.stats()["throttles"] == 1
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.limit == 8
+    assert limiter.rate == 2
+
+
+def test_acquire_times_out():
+    limiter = ModelLimiter("m", rate=0, max_in_flight=1)
+    with limiter.acquire():
+        try:
+            with limiter.acquire(timeout=0.05):
+                raise AssertionError("should not be admitted")
+        except TimeoutError:
+            pass
+
+
+@pytest.mark.asyncio
+async def test_aacquire_waits_on_the_loop_for_a_released_slot():
+    limiter = ModelLimiter("m", rate=0, max_in_flight=1)
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with limiter.acquire():
+            held.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    with pytest.raises(TimeoutError):
+        async with limiter.aacquire(timeout=0.05):
+            pass
+
+    slot = limiter.aacquire()
+    waiter = asyncio.ensure_future(slot.__aenter__())
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+    assert limiter.stats()["queue_depth"] == 1
+    done.set()  # released on another thread
+    assert await asyncio.wait_for(waiter, 1) > 0
+    assert limiter.stats()["in_flight"] == 1
+    await slot.__aexit__(None, None, None)
+    assert limiter.stats()["in_flight"] == 0
+    thread.join()
+
+
+def test_rate_limiter_is_keyed_off_models():
+    registry = RateLimiter(rate=1, max_in_flight=3, overrides={"ultra": {"rate": 0.5}})
+    stats = registry.stats()
+    assert set(MODELS.values()) <= set(stats)
+    assert registry.get(MODELS["ultra"]).max_rate == 0.5
+    assert registry.get(MODELS["core"]).max_rate == 1
+    assert registry.get("custom-model").max_in_flight == 3
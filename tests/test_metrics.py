@@ -0,0 +1,63 @@
+import urllib.request
+
+from mcp_server_bedrock_image.metrics import Histogram, Metrics, serve_metrics
+
+
+def test_histogram_summary_uses_bucket_bounds():
+    histogram = Histogram(buckets=(0.1, 1, 10))
+    for value in (0.05, 0.2, 0.3, 0.5, 4.0):
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary["count"] == 5
+    assert summary["sum"] == 5.05
+    assert summary["p50"] == 1
+    assert summary["p95"] == 4.0  # capped at the largest value seen
+    assert summary["max"] == 4.0
+
+
+def test_snapshot_groups_by_model():
+    metrics = Metrics()
+    metrics.inc("requests", model="m1")
+    metrics.inc("errors", model="m1", error="ThrottlingException")
+    metrics.stage("m1", "network", 0.2)
+    metrics.observe("request_bytes", 2048, model="m2")
+    with metrics.timer("m2", "parse"):
+        pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot["m1"]["requests"] == 1
+    assert snapshot["m1"]["errors.ThrottlingException"] == 1
+    assert snapshot["m1"]["stage_seconds.network"]["count"] == 1
+    assert snapshot["m2"]["request_bytes"]["max"] == 2048
+    assert snapshot["m2"]["stage_seconds.parse"]["count"] == 1
+
+
+def test_prometheus_text_format():
+    metrics = Metrics()
+    metrics.inc("throttles", model='a"b')
+    metrics.observe("request_bytes", 3000, model="m")
+    metrics.add_collector(lambda: [("cache_hits", {"cache": "result"}, 3)])
+
+    text = metrics.prometheus()
+    assert "# TYPE bedrock_image_throttles_total counter" in text
+    assert 'bedrock_image_throttles_total{model="a\\"b"} 1' in text
+    assert "# TYPE bedrock_image_request_bytes histogram" in text
+    assert 'bedrock_image_request_bytes_bucket{model="m",le="1024"} 0' in text
+    assert 'bedrock_image_request_bytes_bucket{model="m",le="4096"} 1' in text
+    assert 'bedrock_image_request_bytes_bucket{model="m",le="+Inf"} 1' in text
+    assert 'bedrock_image_request_bytes_count{model="m"} 1' in text
+    assert 'bedrock_image_cache_hits{cache="result"} 3' in text
+
+
+def test_serve_metrics_endpoint():
+    metrics = Metrics()
+    metrics.inc("requests", model="m")
+    httpd = serve_metrics("127.0.0.1", 0, metrics)
+    try:
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert 'bedrock_image_requests_total{model="m"} 1' in body
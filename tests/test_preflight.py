@@ -0,0 +1,138 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from mcp_server_bedrock_image.preflight import (
+    DEFAULT_LIMITS,
+    LIMITS,
+    InputLimits,
+    prepare_image,
+)
+
+
+def _encode(img: Image.Image, fmt: str = "PNG", **save) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **save)
+    return buf.getvalue()
+
+
+def _open(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data))
+
+
+def test_clean_small_png_is_sent_unchanged():
+    data = _encode(Image.new("RGB", (256, 256), "red"))
+
+    replacement, report = prepare_image(data)
+
+    assert replacement is None
+    assert report == {
+        "bytes": len(data),
+        "sent_bytes": len(data),
+        "saved_bytes": 0,
+        "changes": [],
+    }
+
+
+def test_oversized_image_is_scaled_into_pixel_limit():
+    data = _encode(Image.new("RGB", (2000, 1000), "blue"), "JPEG")
+    limits = InputLimits(max_pixels=500_000)
+
+    replacement, report = prepare_image(data, limits)
+
+    img = _open(replacement)
+    assert img.format == "JPEG"
+    assert img.size == (1000, 500)
+    assert report["changes"] == ["resized 2000x1000 to 1000x500"]
+    assert report["saved_bytes"] == len(data) - len(replacement)
+
+
+def test_upscale_fast_limits_cap_the_longest_side():
+    assert LIMITS["upscale_fast"].fit(1600, 640) == (1536, 614)
+    assert DEFAULT_LIMITS.fit(1600, 640) == (1600, 640)
+
+
+def test_exif_rotation_is_applied_and_metadata_stripped():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees clockwise
+    data = _encode(Image.new("RGB", (300, 200)), "JPEG", exif=exif)
+
+    replacement, report = prepare_image(data)
+
+    img = _open(replacement)
+    assert img.size == (200, 300)
+    assert not img.getexif()
+    assert "stripped metadata" in report["changes"]
+
+
+def test_cmyk_is_converted_and_png_text_dropped():
+    cmyk = _encode(Image.new("CMYK", (128, 128)), "JPEG")
+    assert _open(prepare_image(cmyk)[0]).mode == "RGB"
+
+    text = PngInfo()
+    text.add_text("parameters", "a prompt")
+    data = _encode(Image.new("RGBA", (128, 128)), pnginfo=text)
+    replacement, report = prepare_image(data)
+    assert _open(replacement).format == "PNG"
+    assert "parameters" not in _open(replacement).info
+    assert report["changes"] == ["stripped metadata"]
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "WEBP"])
+def test_metadata_is_stripped_without_reencoding(fmt):
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8))
+    exif = Image.Exif()
+    exif[0x010F] = "camera"
+    data = _encode(noise, fmt, quality=80, exif=exif, icc_profile=b"\0" * 4096)
+
+    replacement, report = prepare_image(data)
+
+    img = _open(replacement)
+    assert img.format == fmt
+    assert not img.getexif() and "icc_profile" not in img.info
+    assert np.array_equal(np.asarray(img), np.asarray(_open(data)))
+    assert report["changes"] == ["stripped metadata"]
+    assert 0 < report["saved_bytes"] == len(data) - len(replacement)
+
+
+def test_16_bit_grayscale_is_scaled_rather_than_clipped():
+    ramp = np.arange(128 * 128, dtype=np.uint16).reshape(128, 128) * 4
+    data = _encode(Image.fromarray(ramp))
+    assert _open(data).mode == "I;16"
+
+    replacement, report = prepare_image(data)
+
+    # WebP stores grayscale as RGB
+    pixels = np.asarray(_open(replacement).convert("L"))
+    assert report["changes"] == ["converted I;16 to L", "re-encoded png as webp"]
+    assert np.array_equal(pixels, (ramp >> 8).astype(np.uint8))
+
+
+def test_large_lossless_input_is_reencoded_only_when_smaller(monkeypatch):
+    monkeypatch.setattr(
+        "mcp_server_bedrock_image.preflight.PREFLIGHT_REENCODE_BYTES", 0
+    )
+    flat = _encode(Image.new("RGB", (512, 512), "green"), compress_level=0)
+
+    replacement, report = prepare_image(flat)
+
+    assert _open(replacement).format == "WEBP"
+    assert report["sent_bytes"] < report["bytes"]
+    assert report["changes"] == ["re-encoded png as webp"]
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (b"not an image", "Not a usable input image"),
+        (_encode(Image.new("RGB", (40, 400))), "too small"),
+        (_encode(Image.new("RGB", (1000, 200))), "aspect ratio"),
+    ],
+)
+def test_invalid_inputs_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        prepare_image(data)
@@ -0,0 +1,224 @@
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from mcp_server_bedrock_image.bedrock_client import BedrockImageClient
+from mcp_server_bedrock_image.image_utils import ImageFileSink
+from mcp_server_bedrock_image.limiter import RateLimiter
+from mcp_server_bedrock_image.regions import MultiRegionClient
+from mcp_server_bedrock_image.retry import RetryPolicy
+
+
+def _error(code: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": code},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        "InvokeModel",
+    )
+
+
+def _ok():
+    return {"body": io.BytesIO(json.dumps({"images": ["aGk="]}).encode())}
+
+
+def _region_client(*outcomes, max_in_flight: int = 4) -> BedrockImageClient:
+    boto3_client = MagicMock()
+    boto3_client.invoke_model.side_effect = [
+        o() if callable(o) else o for o in outcomes
+    ]
+    return BedrockImageClient(
+        auth_mode="boto3",
+        boto3_client=boto3_client,
+        limiter=RateLimiter(rate=0, max_in_flight=max_in_flight),
+        retry_policy=RetryPolicy(max_attempts=1),
+        coalesce=False,
+    )
+
+
+def _client(clients: dict, **options) -> MultiRegionClient:
+    return MultiRegionClient(
+        clients=clients,
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001),
+        coalesce=False,
+        **options,
+    )
+
+
+def test_routes_to_lowest_latency_region():
+    west = _region_client(*[_ok] * 3)
+    east = _region_client(*[_ok] * 3)
+    client = _client({"us-west-2": west, "us-east-1": east})
+    client.regions[0].latency["m"] = 2.0
+    client.regions[1].latency["m"] = 0.5
+
+    result = client.invoke_model(model_id="m", body={"prompt": "p"})
+
+    assert result["region"] == "us-east-1"
+    assert west._boto3_client.invoke_model.call_count == 0
+    stats = client.region_stats()
+    assert stats["us-east-1"]["successes"] == 1
+    assert stats["us-east-1"]["latency_ewma_s"]["m"] < 0.5
+
+
+def test_region_without_headroom_is_passed_over():
+    west = _region_client(_ok, max_in_flight=1)
+    east = _region_client(_ok)
+    client = _client({"us-west-2": west, "us-east-1": east})
+    client.regions[1].latency["m"] = 5.0
+    west.limiter.get("m").in_flight = 1  # west's only slot is taken
+
+    assert client.invoke_model(model_id="m", body={})["region"] == "us-east-1"
+
+
+def test_throttling_fails_over_without_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+    west = _region_client(_error("ThrottlingException", 429))
+    east = _region_client(_ok)
+    client = _client({"us-west-2": west, "us-east-1": east}, cooldown=30)
+
+    result = client.invoke_model(model_id="m", body={"prompt": "p"})
+
+    assert (result["region"], result["retries"]) == ("us-east-1", 1)
+    assert sleeps == []
+    stats = client.region_stats()
+    assert stats["us-west-2"]["throttles"] == 1
+    assert stats["us-west-2"]["failovers"] == 1
+    assert stats["us-west-2"]["cooling_s"] > 0
+    # The throttled region's limiter backed off as well
+    assert stats["us-west-2"]["limits"]["m"]["limit"] == 2
+
+
+def test_cooling_region_is_skipped_for_later_calls():
+    west = _region_client(_error("ServiceUnavailableException", 503), _ok)
+    east = _region_client(_ok, _ok)
+    client = _client({"us-west-2": west, "us-east-1": east}, cooldown=30)
+    client.invoke_model(model_id="m", body={"prompt": "a"})
+    client.regions[1].latency["m"] = 10.0  # slower, but west is cooling down
+
+    assert client.invoke_model(model_id="m", body={"prompt": "b"})["region"] == (
+        "us-east-1"
+    )
+    assert west._boto3_client.invoke_model.call_count == 1
+
+
+def test_fatal_error_is_not_failed_over():
+    west = _region_client(_error("ValidationException"))
+    east = _region_client(_ok)
+    client = _client({"us-west-2": west, "us-east-1": east})
+
+    with pytest.raises(ClientError):
+        client.invoke_model(model_id="m", body={"prompt": "p"})
+    assert east._boto3_client.invoke_model.call_count == 0
+
+
+def test_backs_off_once_every_region_failed(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+    throttle = _error("ThrottlingException", 429)
+    west = _region_client(throttle, throttle, _ok)
+    east = _region_client(throttle, throttle)
+    client = _client({"us-west-2": west, "us-east-1": east}, cooldown=0)
+
+    result = client.invoke_model(model_id="m", body={"prompt": "p"})
+
+    assert result["retries"] == 4
+    assert len(sleeps) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_backoff_waits_on_the_event_loop(monkeypatch):
+    def blocking_sleep(seconds):
+        raise AssertionError("backoff blocked a worker thread")
+
+    monkeypatch.setattr("time.sleep", blocking_sleep)
+    throttle = _error("ThrottlingException", 429)
+    west = _region_client(throttle, _ok)
+    east = _region_client(throttle)
+    client = _client({"us-west-2": west, "us-east-1": east}, cooldown=0)
+
+    result = await client.ainvoke_model(model_id="m", body={"prompt": "p"})
+
+    assert result["retries"] == 2
+
+
+class _FakeRegion(BaseHTTPRequestHandler):
+    status = 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"images": ["aGk="], "seeds": [1]}).encode()
+        self.send_response(self.status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Throttled(_FakeRegion):
+    status = 429
+
+
+@pytest.fixture
+def fake_endpoints():
+    servers = [
+        ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        for handler in (_Throttled, _FakeRegion)
+    ]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield {
+        region: f"http://127.0.0.1:{server.server_address[1]}"
+        for region, server in zip(("us-west-2", "us-east-1"), servers)
+    }
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_bearer_regions_use_their_own_endpoints(fake_endpoints, tmp_path):
+    client = MultiRegionClient(
+        ["us-west-2", "us-east-1"],
+        endpoints=fake_endpoints,
+        auth_mode="bearer",
+        bearer_token="t",
+        coalesce=False,
+    )
+    result = client.invoke_model(
+        model_id="stability.sd3-5-large-v1:0",
+        body={"prompt": "p"},
+        open_sink=lambda i: ImageFileSink(str(tmp_path), f"img{i}"),
+    )
+    client.close()
+
+    assert result["region"] == "us-east-1"
+    assert (tmp_path / "img0.png").read_bytes() == b"hi"
+    assert client.region_stats()["us-west-2"]["throttles"] == 1
+
+
+def test_region_clients_inherit_workers_and_limits():
+    client = MultiRegionClient(
+        ["us-west-2", "us-east-1"],
+        auth_mode="bearer",
+        bearer_token="t",
+        max_workers=32,
+        limiter=RateLimiter(rate=0, max_in_flight=2, overrides={"ultra": {"rate": 1}}),
+    )
+    west, east = (region.client for region in client.regions)
+    client.close()
+
+    assert west._max_workers == east._max_workers == 32
+    assert west.limiter is not east.limiter
+    for region_client in (west, east):
+        assert region_client.limiter.get("m").max_in_flight == 2
+        assert region_client.limiter.get("m").max_rate == 0
+        assert region_client.limiter.overrides == {"ultra": {"rate": 1}}
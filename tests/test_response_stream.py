@@ -0,0 +1,63 @@
+import base64
+import io
+import json
+import os
+
+import pytest
+
+from mcp_server_bedrock_image.response_stream import parse_image_response
+
+
+class BufferSink:
+    def __init__(self, index):
+        self.index = index
+        self.data = bytearray()
+        self.aborted = False
+
+    def write(self, chunk):
+        self.data.extend(chunk)
+
+    def close(self):
+        return bytes(self.data)
+
+    def abort(self):
+        self.aborted = True
+
+
+def _response(images, **fields):
+    return {"images": images, **fields}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 1 << 16])
+def test_streams_images_and_keeps_small_fields(chunk_size):
+    images = [base64.b64encode(os.urandom(3000)).decode() for _ in range(2)]
+    body = _response(images, seeds=[1, 2], finish_reasons=[None, "Filter: é"])
+    result = parse_image_response(
+        io.BytesIO(json.dumps(body, indent=1).encode()),
+        BufferSink,
+        chunk_size=chunk_size,
+    )
+    assert result["images"] == [img.encode() for img in images]
+    assert result["seeds"] == [1, 2]
+    assert result["finish_reasons"] == [None, "Filter: é"]
+
+
+def test_resolves_escaped_slashes():
+    image = base64.b64encode(b"\xff\xfe\xfd" * 50).decode()
+    assert "/" in image
+    raw = json.dumps(_response([image])).replace("/", "\\/").encode()
+    result = parse_image_response(io.BytesIO(raw), BufferSink, chunk_size=7)
+    assert result["images"] == [image.encode()]
+
+
+def test_truncated_response_aborts_sink():
+    sinks = []
+
+    def open_sink(i):
+        sinks.append(BufferSink(i))
+        return sinks[-1]
+
+    raw = b'{"images": ["AAAABBBB'
+    with pytest.raises(ValueError):
+        parse_image_response(io.BytesIO(raw), open_sink)
+    assert sinks[0].aborted
@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+import requests
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from mcp_server_bedrock_image.retry import (
+    RetryPolicy,
+    is_retryable_error,
+    is_throttling_error,
+)
+
+
+def _client_error(code, status=400):
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": "x"},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        "InvokeModel",
+    )
+
+
+def _http_error(status):
+    response = MagicMock()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_classifies_retryable_errors():
+    assert is_retryable_error(_client_error("ThrottlingException", 429))
+    assert is_retryable_error(_client_error("SomethingNew", 503))
+    assert is_retryable_error(EndpointConnectionError(endpoint_url="https://x"))
+    assert is_retryable_error(requests.ConnectionError())
+    assert is_retryable_error(_http_error(429))
+    assert is_retryable_error(_http_error(502))
+
+
+def test_classifies_fatal_errors():
+    assert not is_retryable_error(_client_error("ValidationException"))
+    assert not is_retryable_error(_client_error("AccessDeniedException", 403))
+    assert not is_retryable_error(_http_error(400))
+    assert not is_retryable_error(ValueError("bad input"))
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(_client_error("ThrottlingException", 429))
+    assert is_throttling_error(_http_error(429))
+    assert not is_throttling_error(_http_error(500))
+
+
+def test_backoff_is_full_jitter_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+    for attempt in range(1, 8):
+        delay = policy.backoff(attempt)
+        assert 0 <= delay <= min(4, 2 ** (attempt - 1))
+
+
+def test_next_delay_respects_attempts_and_deadline():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+    throttle = _client_error("ThrottlingException", 429)
+    assert policy.next_delay(throttle, attempt=1, remaining=10) is not None
+    assert policy.next_delay(throttle, attempt=3, remaining=10) is None
+    assert policy.next_delay(throttle, attempt=1, remaining=0) is None
+    assert policy.next_delay(ValueError(), attempt=1, remaining=10) is None
@@ -1,12 +1,49 @@
+import base64
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from PIL import Image
+
+from mcp_server_bedrock_image import server
+from mcp_server_bedrock_image.cache import ResultCache
+from mcp_server_bedrock_image.image_utils import EncodedImageCache
+from mcp_server_bedrock_image.metrics import Metrics
+from mcp_server_bedrock_image.preflight import InputLimits
 from mcp_server_bedrock_image.server import mcp
 
 
+def _fake_bedrock(response: dict) -> MagicMock:
+    """Bedrock stub that streams response images into the caller's sinks."""
+
+    async def ainvoke_model(model_id, body, open_sink=None, coalesce=None):
+        result = dict(response)
+        if open_sink is not None:
+            paths = []
+            for i, image in enumerate(response["images"]):
+                sink = open_sink(i)
+                sink.write(image)
+                paths.append(sink.close())
+            result["images"] = paths
+        return result
+
+    bedrock = MagicMock()
+    bedrock.ainvoke_model = AsyncMock(side_effect=ainvoke_model)
+    return bedrock
+
+
+def _png(path, size=(64, 64), **save):
+    Image.new("RGB", size, "red").save(path, **save)
+    return path
+
+
 def test_server_has_tools():
     """Verify all expected tools are registered."""
     tool_names = [t.name for t in mcp._tool_manager.list_tools()]
     expected = [
         "generate_image",
         "generate_image_core",
+        "generate_batch",
         "remove_background",
         "style_transfer",
         "search_and_recolor",
@@ -15,6 +52,543 @@ def test_server_has_tools():
         "upscale_fast",
         "upscale_creative",
         "compose_branded",
+        "compose_branded_batch",
+        "submit_job",
+        "job_status",
+        "job_result",
+        "cancel_job",
+        "run_pipeline",
+        "server_stats",
     ]
     for name in expected:
         assert name in tool_names, f"Missing tool: {name}"
+
+
+@pytest.mark.asyncio
+async def test_tool_reports_retries(tmp_path):
+    image = _png(tmp_path / "in.png")
+    bedrock = _fake_bedrock(
+        {"images": [base64.b64encode(b"png").decode()], "retries": 2}
+    )
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_cache", ResultCache(str(tmp_path / "cache"))),
+    ):
+        result = await server.tool_upscale_fast(
+            image_path=str(image), filename="out", output_dir=str(tmp_path)
+        )
+    assert result["status"] == "success"
+    assert result["retries"] == 2
+    assert result["paths"] == [str(tmp_path / "out.png")]
+
+
+@pytest.mark.asyncio
+async def test_seeded_generation_is_served_from_cache(tmp_path):
+    bedrock = _fake_bedrock(
+        {"images": [base64.b64encode(b"png").decode()], "seeds": [7]}
+    )
+    kwargs = dict(
+        prompt="lobby",
+        negative_prompt=None,
+        aspect_ratio=None,
+        seed=7,
+        output_dir=str(tmp_path),
+    )
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_cache", ResultCache(str(tmp_path / "cache"))),
+        patch.object(server, "SAVE_METADATA", False),
+    ):
+        first = await server.tool_generate_image_core(filename="a", **kwargs)
+        second = await server.tool_generate_image_core(filename="b", **kwargs)
+
+    assert bedrock.ainvoke_model.await_count == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["seeds"] == [7]
+    with open(second["paths"][0], "rb") as f:
+        assert f.read() == b"png"
+
+
+@pytest.mark.asyncio
+async def test_seed_zero_is_random_and_not_cached(tmp_path):
+    bedrock = _fake_bedrock(
+        {"images": [base64.b64encode(b"png").decode()], "seeds": [7]}
+    )
+    kwargs = dict(
+        prompt="lobby",
+        negative_prompt=None,
+        aspect_ratio=None,
+        seed=0,
+        output_dir=str(tmp_path),
+    )
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_cache", ResultCache(str(tmp_path / "cache"))),
+        patch.object(server, "SAVE_METADATA", False),
+    ):
+        first = await server.tool_generate_image_core(filename="a", **kwargs)
+        second = await server.tool_generate_image_core(filename="b", **kwargs)
+
+    assert bedrock.ainvoke_model.await_count == 2
+    assert (first["cached"], second["cached"]) == (False, False)
+
+
+@pytest.mark.asyncio
+async def test_cached_edit_skips_input_encoding(tmp_path):
+    image = _png(tmp_path / "in.png")
+    bedrock = _fake_bedrock({"images": [base64.b64encode(b"cut").decode()]})
+    encoder = EncodedImageCache()
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_cache", ResultCache(str(tmp_path / "cache"))),
+        patch.object(server, "_encoder", encoder),
+    ):
+        for name in ("a", "b"):
+            result = await server.tool_remove_background(
+                image_path=str(image), filename=name, output_dir=str(tmp_path)
+            )
+
+    assert result["cached"] is True
+    assert bedrock.ainvoke_model.await_count == 1
+    assert encoder.stats()["misses"] == 1
+    assert encoder.stats()["hits"] == 0
+    sent = bedrock.ainvoke_model.await_args.kwargs["body"]
+    assert sent["image"] == base64.b64encode(image.read_bytes()).decode()
+
+
+@pytest.mark.asyncio
+async def test_preflight_shrinks_inputs_and_reports_savings(tmp_path):
+    image = _png(tmp_path / "in.png", size=(2048, 1024), dpi=(300, 300))
+    bedrock = _fake_bedrock({"images": [base64.b64encode(b"big").decode()]})
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "RESULT_CACHE", False),
+        patch.object(server, "_encoder", EncodedImageCache()),
+    ):
+        result = await server.tool_upscale_creative(
+            image_path=str(image),
+            prompt="sharp",
+            negative_prompt=None,
+            filename="out",
+            output_dir=str(tmp_path),
+        )
+
+    report = result["inputs"]["image"]
+    assert report["changes"][0] == "resized 2048x1024 to 1448x724"
+    assert report["bytes"] == image.stat().st_size
+    sent = bedrock.ainvoke_model.await_args.kwargs["body"]["image"]
+    assert len(base64.b64decode(sent)) == report["sent_bytes"]
+    with Image.open(io.BytesIO(base64.b64decode(sent))) as img:
+        assert img.size == (1448, 724)
+
+
+@pytest.mark.asyncio
+async def test_preflight_rejects_invalid_input_before_invoking(tmp_path):
+    image = tmp_path / "in.png"
+    image.write_bytes(b"\x89PNG fake")
+    tiny = _png(tmp_path / "tiny.png", size=(16, 16))
+    bedrock = _fake_bedrock({"images": []})
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "RESULT_CACHE", False),
+        patch.object(server, "_encoder", EncodedImageCache()),
+    ):
+        with pytest.raises(ValueError, match="Not a usable input image"):
+            await server.tool_remove_background(
+                image_path=str(image), filename="a", output_dir=str(tmp_path)
+            )
+        with pytest.raises(ValueError, match="too small"):
+            await server.tool_upscale_fast(
+                image_path=str(tiny), filename="b", output_dir=str(tmp_path)
+            )
+    bedrock.ainvoke_model.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_oversized_upscale_fast_is_tiled_and_stitched(tmp_path):
+    image = _png(tmp_path / "in.png", size=(400, 300))
+    small_tiles = InputLimits(min_side=16, max_side=256, max_pixels=256 * 256)
+
+    async def ainvoke_model(model_id, body, open_sink=None, coalesce=None):
+        with Image.open(io.BytesIO(base64.b64decode(body["image"]))) as tile:
+            buf = io.BytesIO()
+            tile.resize((tile.width * 4, tile.height * 4)).save(buf, "PNG")
+        sink = open_sink(0)
+        sink.write(base64.b64encode(buf.getvalue()))
+        return {"images": [sink.close()], "retries": 1}
+
+    bedrock = MagicMock()
+    bedrock.ainvoke_model = AsyncMock(side_effect=ainvoke_model)
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.dict(server.LIMITS, {"upscale_fast": small_tiles}),
+    ):
+        result = await server.tool_upscale_fast(
+            image_path=str(image),
+            filename="big",
+            output_format="jpeg",
+            quality=None,
+            effort=None,
+            output_dir=str(tmp_path),
+        )
+
+    assert bedrock.ainvoke_model.await_count == 4
+    assert result["tiles"] == {"count": 4, "grid": [2, 2], "tile_size": [256, 256]}
+    assert result["retries"] == 4
+    assert result["paths"] == [str(tmp_path / "big.jpg")]
+    with Image.open(result["paths"][0]) as out:
+        assert out.size == (1600, 1200)
+        assert out.getpixel((800, 600))[0] > 250  # seams stay red
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_passes_images_in_memory(tmp_path):
+    logo = tmp_path / "logo.png"
+    Image.new("RGBA", (20, 10), (255, 255, 255, 255)).save(logo)
+    buf = io.BytesIO()
+    Image.new("RGB", (128, 128), "red").save(buf, "PNG")
+    generated = base64.b64encode(buf.getvalue()).decode()
+    bodies = {}
+
+    async def ainvoke_model(model_id, body, open_sink=None, coalesce=None):
+        assert open_sink is None
+        bodies[model_id] = body
+        if "image" not in body:
+            return {"images": [generated], "seeds": [3]}
+        with Image.open(io.BytesIO(base64.b64decode(body["image"]))) as img:
+            out = io.BytesIO()
+            img.resize((img.width * 2, img.height * 2)).save(out, "PNG")
+        return {"images": [base64.b64encode(out.getvalue()).decode()]}
+
+    bedrock = MagicMock()
+    bedrock.ainvoke_model = AsyncMock(side_effect=ainvoke_model)
+    steps = [
+        {"id": "gen", "tool": "generate_image_core", "args": {"prompt": "lobby"}},
+        {"id": "cut", "tool": "remove_background", "args": {"image_path": "$gen"}},
+        {"id": "big", "tool": "upscale_fast", "args": {"image_path": "$cut"}},
+        {
+            "id": "brand",
+            "tool": "compose_branded",
+            "args": {"image_path": "$big", "logo_path": str(logo)},
+            "filename": "final",
+            "output_format": "jpeg",
+        },
+    ]
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_encoder", EncodedImageCache()),
+    ):
+        manifest = await server.tool_run_pipeline(
+            steps=steps, save_intermediates=False, output_dir=str(tmp_path)
+        )
+
+    assert manifest["status"] == "success"
+    assert manifest["paths"] == [str(tmp_path / "final.jpg")]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["final.jpg", "logo.png"]
+    # The generated image reached the next model without a re-encode
+    assert bodies[server.MODELS["remove_background"]]["image"] == generated
+    with Image.open(tmp_path / "final.jpg") as img:
+        assert img.size == (512, 512)
+    items = {item["id"]: item for item in manifest["items"]}
+    assert items["gen"]["seeds"] == [3]
+    assert all(item["latency_s"] >= 0 for item in items.values())
+
+
+@pytest.mark.asyncio
+async def test_pipeline_tiles_oversized_upscale_fast_inputs(tmp_path):
+    buf = io.BytesIO()
+    Image.new("RGB", (400, 300), "red").save(buf, "PNG")
+    generated = base64.b64encode(buf.getvalue()).decode()
+    small_tiles = InputLimits(min_side=16, max_side=256, max_pixels=256 * 256)
+    tiles = []
+
+    async def ainvoke_model(model_id, body, open_sink=None, coalesce=None):
+        if "image" not in body:
+            return {"images": [generated], "seeds": [3]}
+        with Image.open(io.BytesIO(base64.b64decode(body["image"]))) as tile:
+            tiles.append(tile.size)
+            out = io.BytesIO()
+            tile.resize((tile.width * 4, tile.height * 4)).save(out, "PNG")
+        sink = open_sink(0)
+        sink.write(base64.b64encode(out.getvalue()))
+        return {"images": [sink.close()]}
+
+    bedrock = MagicMock()
+    bedrock.ainvoke_model = AsyncMock(side_effect=ainvoke_model)
+    steps = [
+        {"id": "gen", "tool": "generate_image_core", "args": {"prompt": "lobby"}},
+        {"id": "big", "tool": "upscale_fast", "args": {"image_path": "$gen"}},
+    ]
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.dict(server.LIMITS, {"upscale_fast": small_tiles}),
+    ):
+        manifest = await server.tool_run_pipeline(
+            steps=steps, save_intermediates=False, output_dir=str(tmp_path)
+        )
+
+    assert manifest["status"] == "success"
+    assert tiles == [(256, 256)] * 4
+    big = manifest["items"][1]
+    assert big["tiles"] == {"count": 4, "grid": [2, 2], "tile_size": [256, 256]}
+    with Image.open(manifest["paths"][0]) as img:
+        assert img.size == (1600, 1200)
+
+
+@pytest.mark.asyncio
+async def test_generate_batch_reports_partial_failure(tmp_path):
+    bedrock = _fake_bedrock({"images": [base64.b64encode(b"png").decode()]})
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "RESULT_CACHE", False),
+        patch.object(server, "SAVE_METADATA", False),
+    ):
+        manifest = await server.tool_generate_batch(
+            prompts=[
+                {"prompt": "a", "filename": "a"},
+                {"prompt": "b", "bogus": 1},
+                {"prompt": "c", "aspect_ratio": "16:9", "filename": "c"},
+                {"prompt": "c", "seed": 7, "filename": "d"},
+            ],
+            model="core",
+            output_dir=str(tmp_path),
+        )
+
+    # Unseeded items must each get a fresh image, not a shared one
+    coalesce = [c.kwargs["coalesce"] for c in bedrock.ainvoke_model.call_args_list]
+    assert sorted(coalesce) == [False, False, True]
+    assert manifest["status"] == "partial"
+    assert manifest["succeeded"] == 3
+    first, bad, last, _ = manifest["items"]
+    assert first["paths"] == [str(tmp_path / "a.png")]
+    assert bad["status"] == "error"
+    assert last["paths"] == [str(tmp_path / "c.png")]
+    assert all("latency_s" in item for item in manifest["items"])
+
+
+@pytest.mark.asyncio
+async def test_output_format_native_and_transcoded(tmp_path):
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), (10, 120, 200)).save(buf, "PNG")
+    bedrock = _fake_bedrock(
+        {"images": [base64.b64encode(buf.getvalue()).decode()], "seeds": [1]}
+    )
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "RESULT_CACHE", False),
+        patch.object(server, "SAVE_METADATA", False),
+    ):
+        native = await server.tool_generate_image_core(
+            prompt="sky",
+            negative_prompt=None,
+            aspect_ratio=None,
+            seed=None,
+            filename="native",
+            output_dir=str(tmp_path),
+            output_format="webp",
+        )
+        transcoded = await server.tool_generate_image_core(
+            prompt="sky",
+            negative_prompt=None,
+            aspect_ratio=None,
+            seed=None,
+            filename="small",
+            output_dir=str(tmp_path),
+            output_format="jpeg",
+            quality=60,
+        )
+        # remove_background cannot return JPEG, so it sends PNG to transcode
+        cutout = await server.tool_remove_background(
+            image_path=_png(tmp_path / "in.png"),
+            filename="cutout",
+            output_format="jpeg",
+            quality=None,
+            effort=None,
+            output_dir=str(tmp_path),
+        )
+
+    requested = [
+        c.kwargs["body"]["output_format"] for c in bedrock.ainvoke_model.call_args_list
+    ]
+    assert requested == ["webp", "png", "png"]
+    assert cutout["paths"] == [str(tmp_path / "cutout.jpg")]
+    assert native["paths"] == [str(tmp_path / "native.webp")]
+    assert native["files"][0]["encode_s"] == 0.0
+    (file,) = transcoded["files"]
+    assert file["path"] == str(tmp_path / "small.jpg")
+    assert file["format"] == "jpeg"
+    assert file["bytes"] == (tmp_path / "small.jpg").stat().st_size
+    assert not (tmp_path / "small.png").exists()
+
+
+def test_main_serves_http_with_shared_options(monkeypatch):
+    run = MagicMock()
+    monkeypatch.setattr(server.mcp, "run", run)
+    monkeypatch.setattr(server, "_bedrock_options", {})
+    monkeypatch.setattr(server.mcp.settings, "host", "127.0.0.1")
+    monkeypatch.setattr(server.mcp.settings, "port", 8000)
+    monkeypatch.setattr(
+        server.mcp.settings,
+        "transport_security",
+        server.mcp.settings.transport_security,
+    )
+
+    server.main(
+        ["--transport", "streamable-http", "--host", "0.0.0.0", "--port", "9100"]
+        + ["--workers", "32"]
+    )
+
+    run.assert_called_once_with(transport="streamable-http")
+    assert (server.mcp.settings.host, server.mcp.settings.port) == ("0.0.0.0", 9100)
+    assert server._bedrock_options == {"max_workers": 32}
+
+
+_INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-03-26",
+        "capabilities": {},
+        "clientInfo": {"name": "test", "version": "1"},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "bind, allowed, host_header, status",
+    [
+        ("0.0.0.0", [], "localhost:9100", 200),
+        ("0.0.0.0", [], "192.168.1.20:9100", 421),
+        ("0.0.0.0", ["192.168.1.20"], "192.168.1.20:9100", 200),
+        ("0.0.0.0", ["192.168.1.20"], "attacker.example:9100", 421),
+        ("192.168.1.20", [], "192.168.1.20:9100", 200),
+        ("192.168.1.20", [], "attacker.example:9100", 421),
+    ],
+)
+def test_http_transport_accepts_host_headers_for_its_bind(
+    monkeypatch, bind, allowed, host_header, status
+):
+    from starlette.testclient import TestClient
+
+    monkeypatch.setattr(server, "ALLOWED_HOSTS", allowed)
+    monkeypatch.setattr(server.mcp, "run", MagicMock())
+    monkeypatch.setattr(server.mcp, "_session_manager", None)
+    for name in ("host", "port", "transport_security"):
+        monkeypatch.setattr(
+            server.mcp.settings, name, getattr(server.mcp.settings, name)
+        )
+    monkeypatch.setattr(server, "JOB_STORE", False)
+    server.main(["--transport", "streamable-http", "--host", bind, "--port", "9100"])
+
+    with TestClient(server.mcp.streamable_http_app()) as client:
+        response = client.post(
+            "/mcp",
+            json=_INITIALIZE,
+            headers={
+                "Host": host_header,
+                "Accept": "application/json, text/event-stream",
+            },
+        )
+    assert response.status_code == status
+
+
+def test_wildcard_bind_without_allowed_hosts_warns(monkeypatch, caplog):
+    monkeypatch.setattr(server, "ALLOWED_HOSTS", [])
+    with caplog.at_level("WARNING"):
+        security = server._transport_security("0.0.0.0")
+    assert security.enable_dns_rebinding_protection
+    assert "MCP_ALLOWED_HOSTS" in caplog.text
+
+
+def test_main_defaults_to_stdio(monkeypatch):
+    run = MagicMock()
+    monkeypatch.setattr(server.mcp, "run", run)
+    server.main([])
+    run.assert_called_once_with(transport="stdio")
+
+
+@pytest.mark.asyncio
+async def test_submit_job_runs_tool_in_background(tmp_path):
+    image = _png(tmp_path / "in.png")
+    bedrock = _fake_bedrock({"images": [base64.b64encode(b"png").decode()]})
+    with (
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "RESULT_CACHE", False),
+        patch.object(server, "_jobs", None),
+        patch.object(server, "JOB_STORE", False),
+    ):
+        submitted = await server.tool_submit_job(
+            tool="upscale_fast",
+            args={"image_path": str(image), "output_dir": str(tmp_path)},
+            priority=1,
+            idempotency_key=None,
+        )
+        assert submitted["status"] == "queued"
+        done = await server.tool_job_result(job_id=submitted["job_id"], wait=5)
+        status = await server.tool_job_status(job_id=submitted["job_id"])
+        await server._jobs.close()
+
+    assert done["status"] == "succeeded"
+    assert done["result"]["status"] == "success"
+    assert status["status"] == "succeeded"
+    assert status["tool"] == "upscale_fast"
+
+
+@pytest.mark.asyncio
+async def test_submit_job_rejects_unknown_tool_and_bad_args():
+    with patch.object(server, "_jobs", None), patch.object(server, "JOB_STORE", False):
+        with pytest.raises(ValueError, match="Unknown tool"):
+            await server.tool_submit_job(
+                tool="submit_job", args={}, priority=0, idempotency_key=None
+            )
+        with pytest.raises(ValueError):
+            await server.tool_submit_job(
+                tool="upscale_fast", args={}, priority=0, idempotency_key=None
+            )
+
+
+@pytest.mark.asyncio
+async def test_lifespan_resumes_jobs_once():
+    jobs = MagicMock()
+    jobs.resume.return_value = []
+    with (
+        patch.object(server, "_jobs", jobs),
+        patch.object(server, "_resumed", False),
+        patch.object(server, "JOB_STORE", True),
+    ):
+        for _ in range(2):
+            async with server._lifespan(server.mcp):
+                pass
+    jobs.resume.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_server_stats_reports_stages_and_cache_hit_rate(tmp_path):
+    image = _png(tmp_path / "in.png")
+    bedrock = _fake_bedrock({"images": [base64.b64encode(b"cut").decode()]})
+    bedrock.region_stats.return_value = {"us-west-2": {"limits": {}}}
+    bedrock.coalesce_stats.return_value = {"coalesced": 0}
+    bedrock.pool_stats.return_value = {"pools": []}
+    metrics = Metrics()
+    with (
+        patch.object(server, "METRICS", metrics),
+        patch.object(server, "_bedrock", bedrock),
+        patch.object(server, "_get_bedrock", return_value=bedrock),
+        patch.object(server, "_cache", ResultCache(str(tmp_path / "cache"))),
+        patch.object(server, "_encoder", EncodedImageCache()),
+        patch.object(server, "_jobs", None),
+    ):
+        for name in ("a", "b"):
+            await server.tool_remove_background(
+                image_path=str(image), filename=name, output_dir=str(tmp_path)
+            )
+        stats = await server.tool_server_stats()
+
+    model = stats["models"][server.MODELS["remove_background"]]
+    for stage in ("input_encode", "decode", "write"):
+        assert model[f"stage_seconds.{stage}"]["count"] == 1
+    assert stats["caches"]["result"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert stats["coalescing"] == {"coalesced": 0}
+    assert "jobs" not in stats
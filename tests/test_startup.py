@@ -0,0 +1,63 @@
+"""Cold-start budget: the server must start without NumPy, Pillow or boto3."""
+
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+from mcp_server_bedrock_image import bedrock_client, server
+
+HEAVY = ("numpy", "PIL", "boto3", "botocore", "requests")
+
+# Self time of this package's modules under -X importtime, in microseconds.
+# Currently ~100ms; the budget leaves room for slow CI machines.
+IMPORT_BUDGET_US = 500_000
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-W", "ignore", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_list_tools_does_not_import_heavy_modules():
+    proc = _run(
+        "import asyncio, sys\n"
+        "from mcp_server_bedrock_image import server\n"
+        "asyncio.run(server.mcp.list_tools())\n"
+        f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    assert proc.stdout.strip() == ""
+
+
+def test_import_time_within_budget():
+    proc = _run("import mcp_server_bedrock_image.server", "-X", "importtime")
+    own = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if name.strip().startswith("mcp_server_bedrock_image"):
+            own += int(self_us)
+        assert name.strip().split(".")[0] not in HEAVY
+    assert 0 < own < IMPORT_BUDGET_US
+
+
+def test_warm_up_builds_client_once(monkeypatch):
+    client = MagicMock()
+    factory = MagicMock(return_value=client)
+    monkeypatch.setattr(bedrock_client, "BedrockImageClient", factory)
+    monkeypatch.setattr(server, "_bedrock", None)
+    server._warm_up()
+    assert server._get_bedrock() is client
+    factory.assert_called_once_with()
+
+
+def test_warm_up_failure_is_not_fatal(monkeypatch):
+    factory = MagicMock(side_effect=ValueError("Bearer token required"))
+    monkeypatch.setattr(bedrock_client, "BedrockImageClient", factory)
+    monkeypatch.setattr(server, "_bedrock", None)
+    server._warm_up()
+    assert server._bedrock is None
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from mcp_server_bedrock_image.tools.batch import run_batch
+
+
+@pytest.mark.asyncio
+async def test_run_batch_runs_items_concurrently():
+    async def run_item(index, item):
+        await asyncio.sleep(0.1)
+        return {"value": item["n"] * 2}
+
+    start = time.monotonic()
+    manifest = await run_batch([{"n": i} for i in range(5)], run_item)
+    elapsed = time.monotonic() - start
+
+    assert manifest["status"] == "success"
+    assert [item["value"] for item in manifest["items"]] == [0, 2, 4, 6, 8]
+    assert elapsed < 0.3
+
+
+@pytest.mark.asyncio
+async def test_run_batch_bounds_concurrency():
+    active = 0
+    peak = 0
+
+    async def run_item(index, item):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {}
+
+    await run_batch([{}] * 10, run_item, max_concurrency=3)
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_run_batch_partial_failure_and_progress():
+    progress = []
+
+    async def run_item(index, item):
+        if index == 1:
+            raise ValueError("boom")
+        return {"ok": True}
+
+    async def on_progress(done, total, entry):
+        progress.append((done, total))
+
+    manifest = await run_batch([{}, {}, {}], run_item, on_progress=on_progress)
+    assert manifest["status"] == "partial"
+    assert manifest["failed"] == 1
+    assert manifest["items"][1] == {
+        "index": 1,
+        "status": "error",
+        "error": "boom",
+        "latency_s": manifest["items"][1]["latency_s"],
+    }
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_all_failed():
+    async def run_item(index, item):
+        raise RuntimeError("down")
+
+    manifest = await run_batch([{}, {}], run_item)
+    assert manifest["status"] == "error"
@@ -4,10 +4,14 @@ import numpy as np
 import pytest
 from PIL import Image
 
+from mcp_server_bedrock_image.encoding import OutputEncoding
 from mcp_server_bedrock_image.tools.compose import (
     analyze_quadrants,
+    compose_branded_batch,
     compose_branded_image,
+    find_best_logo_position,
     find_best_logo_quadrant,
+    to_luminance,
 )
 
 
@@ -41,6 +45,50 @@ def test_analyze_quadrants(sample_image):
         assert "avg_brightness" in s
 
 
+def test_analyze_quadrants_custom_grid_matches_per_cell_stats(tmp_path):
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, size=(120, 200, 3), dtype=np.uint8)
+    path = str(tmp_path / "noise.png")
+    Image.fromarray(arr).save(path)
+    gray = np.asarray(Image.open(path).convert("L"), dtype=np.float64)
+
+    scores = analyze_quadrants(path, rows=4, cols=5)
+    assert len(scores) == 20
+    for s in scores:
+        cell = gray[
+            s["row"] * 30 : (s["row"] + 1) * 30, s["col"] * 40 : (s["col"] + 1) * 40
+        ]
+        assert s["complexity"] == pytest.approx(np.std(cell))
+        assert s["avg_brightness"] == pytest.approx(np.mean(cell))
+
+
+def test_analyze_quadrants_accepts_decoded_inputs(sample_image):
+    from_path = analyze_quadrants(sample_image)
+    img = Image.open(sample_image)
+    assert analyze_quadrants(img) == from_path
+    assert analyze_quadrants(np.asarray(img)) == from_path
+
+
+def test_analyze_quadrants_on_thumbnail(sample_image):
+    scores = analyze_quadrants(sample_image, max_side=100)
+    assert len(scores) == 9
+    assert min(scores, key=lambda q: q["complexity"])["col"] == 0
+    assert to_luminance(sample_image, max_side=100).shape == (100, 100)
+
+
+def test_compose_decodes_source_once(sample_image, sample_logo, tmp_path, monkeypatch):
+    opened = []
+    original_open = Image.open
+
+    def counting_open(fp, *args, **kwargs):
+        opened.append(fp)
+        return original_open(fp, *args, **kwargs)
+
+    monkeypatch.setattr(Image, "open", counting_open)
+    compose_branded_image(sample_image, sample_logo, str(tmp_path / "out.png"))
+    assert opened.count(sample_image) == 1
+
+
 def test_find_best_logo_quadrant(sample_image):
     quadrant = find_best_logo_quadrant(sample_image)
     assert quadrant["row"] in (0, 1, 2)
@@ -76,3 +124,155 @@ def test_compose_branded_image_creates_parent_dirs(sample_image, sample_logo, tm
         output_path=output,
     )
     assert os.path.exists(result)
+
+
+def test_compose_branded_batch_manifest(sample_image, sample_logo, tmp_path):
+    other = str(tmp_path / "other.png")
+    Image.new("RGB", (200, 100), (30, 30, 30)).save(other)
+    out_dir = str(tmp_path / "branded")
+    manifest = compose_branded_batch(
+        [sample_image, other, str(tmp_path / "missing.png")],
+        sample_logo,
+        out_dir,
+        max_workers=1,
+    )
+    assert manifest["status"] == "partial"
+    assert (manifest["succeeded"], manifest["failed"]) == (2, 1)
+    first, second, missing = manifest["items"]
+    assert first["path"] == os.path.join(out_dir, "test_branded.png")
+    assert first["placement"]["x"] + first["placement"]["width"] <= 150
+    assert set(first["timings"]) == {"decode_s", "analyze_s", "composite_s", "encode_s"}
+    assert Image.open(second["path"]).size == (200, 100)
+    assert missing["status"] == "error"
+
+
+def test_compose_branded_batch_glob_in_process_pool(
+    sample_image, sample_logo, tmp_path
+):
+    from mcp_server_bedrock_image.tools import compose
+
+    for i in range(4):
+        Image.open(sample_image).save(str(tmp_path / f"img{i}.png"))
+    manifests = [
+        compose_branded_batch(
+            str(tmp_path / "img*.png"),
+            sample_logo,
+            str(tmp_path / "out"),
+            max_workers=2,
+        )
+        for _ in range(2)
+    ]
+    manifest = manifests[0]
+    assert manifest["status"] == "success"
+    assert [os.path.basename(i["image_path"]) for i in manifest["items"]] == [
+        "img0.png",
+        "img1.png",
+        "img2.png",
+        "img3.png",
+    ]
+    assert all(os.path.exists(i["path"]) for i in manifest["items"])
+    # The second batch reused the first one's worker processes
+    assert compose._pool is not None and compose._pool_workers == 2
+
+
+def test_compose_branded_batch_keeps_same_named_images_apart(
+    sample_image, sample_logo, tmp_path
+):
+    for folder in ("a", "b"):
+        os.makedirs(tmp_path / "src" / folder)
+        Image.open(sample_image).save(str(tmp_path / "src" / folder / "shot.png"))
+    out_dir = str(tmp_path / "out")
+
+    manifest = compose_branded_batch(
+        str(tmp_path / "src" / "*" / "shot.png"), sample_logo, out_dir, max_workers=1
+    )
+
+    assert [i["path"] for i in manifest["items"]] == [
+        os.path.join(out_dir, "a", "shot_branded.png"),
+        os.path.join(out_dir, "b", "shot_branded.png"),
+    ]
+    assert all(os.path.exists(i["path"]) for i in manifest["items"])
+    repeated = compose_branded_batch(
+        [sample_image, sample_image], sample_logo, out_dir, max_workers=1
+    )
+    assert [os.path.basename(i["path"]) for i in repeated["items"]] == [
+        "test_branded.png",
+        "test_branded_2.png",
+    ]
+    with pytest.raises(ValueError, match="No images match"):
+        compose_branded_batch(str(tmp_path / "*.jpg"), sample_logo, out_dir)
+
+
+def test_scaled_logo_cached_per_width(sample_image, sample_logo, tmp_path):
+    from mcp_server_bedrock_image.tools import compose
+
+    compose._scaled_logo.cache_clear()
+    for i in range(3):
+        compose_branded_image(sample_image, sample_logo, str(tmp_path / f"{i}.png"))
+    info = compose._scaled_logo.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+
+def test_find_best_logo_position_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(1)
+    gray = rng.integers(0, 256, size=(60, 80), dtype=np.uint8)
+    gray[25:45, 37:61] = 90  # flat patch that no grid cell lines up with
+    best = find_best_logo_position(gray, (16, 12), stride=1, margin=0)
+    assert (best["x"], best["y"]) == (37, 25)
+    assert best["complexity"] == 0
+    assert best["logo_variant"] == "light"
+
+    variances = [
+        (gray[y : y + 12, x : x + 16].astype(np.float64).std(), x, y)
+        for y in [*range(0, 48, 5), 48]
+        for x in [*range(0, 64, 5), 64]
+    ]
+    lowest, _, _ = min(variances)
+    coarse = find_best_logo_position(gray, (16, 12), stride=5, margin=0)
+    assert coarse["complexity"] == pytest.approx(lowest, abs=1e-6)
+
+
+@pytest.mark.parametrize("step", [1, 7, 40])
+def test_summed_area_table_is_exact_for_sparse_and_dense_edges(step):
+    from mcp_server_bedrock_image.tools import compose
+
+    values = np.random.default_rng(3).integers(0, 256, (200, 300), dtype=np.uint8)
+    rows = np.arange(0, 201, step)
+    cols = np.unique([0, *range(5, 300, step), 300])
+    full = np.zeros((201, 301), dtype=np.int64)
+    full[1:, 1:] = values.astype(np.int64).cumsum(0).cumsum(1)
+
+    table = compose._summed_area_table(values, rows, cols)
+
+    assert np.array_equal(table, full[np.ix_(rows, cols)])
+
+
+def test_find_best_logo_position_on_thumbnail_and_margin(tmp_path):
+    arr = np.full((400, 800), 200, dtype=np.uint8)
+    arr[:, :700] = np.random.default_rng(2).integers(0, 256, (400, 700))
+    best = find_best_logo_position(arr, (60, 40), max_side=200)
+    assert best["x"] >= 700 - 10 and best["x"] + 60 <= 800 - 10
+    assert 10 <= best["y"] <= 400 - 40 - 10
+    assert best["logo_variant"] == "dark"
+
+
+def test_compose_grid_placement_still_available(sample_image, sample_logo, tmp_path):
+    result = compose_branded_image(
+        sample_image, sample_logo, str(tmp_path / "grid.png"), placement="grid"
+    )
+    assert os.path.exists(result)
+    with pytest.raises(ValueError, match="Invalid placement"):
+        compose_branded_image(
+            sample_image, sample_logo, str(tmp_path / "x.png"), placement="center"
+        )
+
+
+def test_compose_output_encoding(sample_image, sample_logo, tmp_path):
+    result = compose_branded_image(
+        sample_image,
+        sample_logo,
+        str(tmp_path / "branded.png"),
+        encoding=OutputEncoding("webp", quality=80),
+    )
+    assert result == str(tmp_path / "branded.webp")
+    assert Image.open(result).format == "WEBP"
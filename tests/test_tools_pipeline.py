@@ -0,0 +1,98 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from mcp_server_bedrock_image.tools.pipeline import (
+    parse_pipeline,
+    run_pipeline,
+    to_base64,
+)
+
+
+def _steps() -> list[dict]:
+    return [
+        {"id": "gen", "tool": "generate_image_core", "args": {"prompt": "lobby"}},
+        {"id": "cut", "tool": "remove_background", "args": {"image_path": "$gen"}},
+        {"id": "big", "tool": "upscale_fast", "args": {"image_path": "$gen"}},
+    ]
+
+
+def test_parse_pipeline_resolves_references_and_outputs():
+    gen, cut, big = parse_pipeline(_steps())
+
+    assert cut.depends == ["gen"] and cut.reads("image_path") == "gen"
+    assert "image_path" not in cut.args
+    assert [s.persist for s in (gen, cut, big)] == [False, True, True]
+    assert parse_pipeline(_steps(), save_intermediates=True)[0].persist
+
+
+@pytest.mark.parametrize(
+    "step, message",
+    [
+        ({"tool": "submit_job"}, "unknown tool"),
+        ({"tool": "outpaint", "args": {"image_path": "a.png"}}, "missing args prompt"),
+        (
+            {"tool": "upscale_fast", "args": {"image_path": "a", "x": 1}},
+            "unknown args x",
+        ),
+        ({"tool": "upscale_fast", "args": {"image_path": "$later"}}, "earlier step"),
+        ({"id": "gen", "tool": "generate_image", "args": {"prompt": "p"}}, "Duplicate"),
+    ],
+)
+def test_parse_pipeline_rejects_invalid_steps(step, message):
+    with pytest.raises(ValueError, match=message):
+        parse_pipeline([_steps()[0], step])
+
+
+@pytest.mark.asyncio
+async def test_branches_run_concurrently_and_failures_skip_downstream():
+    steps = parse_pipeline(
+        [
+            *_steps(),
+            {"id": "bad", "tool": "upscale_fast", "args": {"image_path": "x.png"}},
+            {
+                "id": "after",
+                "tool": "remove_background",
+                "args": {"image_path": "$bad"},
+            },
+        ]
+    )
+
+    async def run_step(step, inputs):
+        if step.id == "bad":
+            raise RuntimeError("boom")
+        await asyncio.sleep(0.05)
+        return f"{step.id}({','.join(inputs.values())})", {"paths": [step.id]}
+
+    manifest = await run_pipeline(steps, run_step)
+
+    entries = {e["id"]: e for e in manifest["items"]}
+    assert manifest["status"] == "partial"
+    assert (manifest["succeeded"], manifest["failed"]) == (3, 2)
+    assert entries["bad"]["error"] == "boom"
+    assert entries["after"] == {
+        "id": "after",
+        "tool": "remove_background",
+        "status": "skipped",
+        "error": "Step 'bad' failed",
+    }
+    # cut and big both only wait for gen, so they start together
+    assert abs(entries["cut"]["started_s"] - entries["big"]["started_s"]) < 0.03
+    assert entries["cut"]["started_s"] >= entries["gen"]["latency_s"]
+    assert manifest["paths"] == ["gen", "cut", "big"]
+
+
+def test_to_base64_passes_bedrock_output_through_unless_rewritten():
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, "PNG")
+    output = base64.b64encode(buf.getvalue()).decode()
+
+    assert to_base64(output) == (output, None)
+    assert to_base64(output, lambda data: (None, {"saved_bytes": 0}))[0] is output
+    shrunk, report = to_base64(output, lambda data: (b"small", {"saved_bytes": 1}))
+    assert base64.b64decode(shrunk) == b"small"
+    image_b64, _ = to_base64(Image.new("RGB", (8, 8)))
+    assert Image.open(io.BytesIO(base64.b64decode(image_b64))).size == (8, 8)
@@ -0,0 +1,87 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from mcp_server_bedrock_image.preflight import LIMITS, InputLimits
+from mcp_server_bedrock_image.tools.tiling import (
+    TilePlan,
+    plan_upscale,
+    tile_starts,
+)
+
+
+def _gradient(width: int, height: int) -> Image.Image:
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack(
+        np.broadcast_arrays(x + 0 * y, y + 0 * x, (x + y) / 2), axis=-1
+    ).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def test_tile_starts_cover_length_with_overlap():
+    starts = tile_starts(3000, 1024, 64)
+    assert starts[0] == 0 and starts[-1] + 1024 == 3000
+    assert all(b - a <= 1024 - 64 for a, b in zip(starts, starts[1:]))
+    assert tile_starts(800, 1024, 64) == [0]
+
+
+def test_plan_upscale_only_tiles_oversized_images(tmp_path):
+    small = tmp_path / "small.png"
+    _gradient(512, 512).save(small)
+    big = tmp_path / "big.png"
+    _gradient(2000, 1200).save(big)
+
+    assert plan_upscale(str(small), LIMITS["upscale_fast"]) is None
+    plan = plan_upscale(str(big), LIMITS["upscale_fast"])
+    assert plan.tile_size == (1024, 1024)
+    assert (len(plan.xs), len(plan.ys)) == (3, 2)
+    with pytest.raises(ValueError, match="too large to upscale"):
+        plan_upscale(str(big), LIMITS["upscale_fast"], max_tiles=4)
+
+
+def test_plan_rejects_tiles_outside_limits():
+    # Tiles of a long thin strip are as elongated as the strip is tall
+    with pytest.raises(ValueError, match="aspect ratio"):
+        TilePlan(5000, 40, LIMITS["upscale_fast"])
+
+
+def test_stitched_tiles_match_whole_image_upscale(tmp_path):
+    image = _gradient(300, 200)
+    source = tmp_path / "in.png"
+    image.save(source)
+    plan = TilePlan(300, 200, InputLimits(min_side=16, max_pixels=128 * 128), 16)
+    assert plan.count > 1
+
+    paths = []
+    for i, tile in enumerate(plan.encode_tiles(str(source))):
+        with Image.open(io.BytesIO(base64.b64decode(tile))) as img:
+            path = tmp_path / f"tile{i}.png"
+            img.resize((img.width * 2, img.height * 2), Image.Resampling.NEAREST).save(
+                path
+            )
+            paths.append(str(path))
+    stitched = plan.stitch(paths, scale=2)
+
+    expected = image.resize((600, 400), Image.Resampling.NEAREST)
+    assert stitched.size == (600, 400)
+    difference = np.abs(np.asarray(stitched, np.int16) - np.asarray(expected, np.int16))
+    assert difference.max() <= 1
+
+
+def test_16_bit_tiles_keep_their_pixel_values(tmp_path):
+    ramp = np.arange(300 * 200, dtype=np.uint16).reshape(200, 300)
+    source = tmp_path / "in.png"
+    Image.fromarray(ramp).save(source)
+    plan = plan_upscale(str(source), InputLimits(min_side=16, max_pixels=128 * 128))
+
+    tiles = plan.encode_tiles(str(source))
+
+    expected = np.stack([(ramp >> 8).astype(np.uint8)] * 3, axis=-1)
+    for (x, y, right, bottom), tile in zip(plan.boxes(), tiles):
+        with Image.open(io.BytesIO(base64.b64decode(tile))) as img:
+            assert img.mode == "RGB"
+            assert np.array_equal(np.asarray(img), expected[y:bottom, x:right])